@@ -23,49 +23,131 @@
 # Python 2 & 3 print function compatibility
 from __future__ import print_function
 
+from array import array
 from time import time
 from time import monotonic
 from time import sleep
-import RPi.GPIO as GPIO
+from threading import Event, RLock, Thread, Timer
+
+from .backends import get_backend
+from .buffer import RingBuffer
+from .stats import RunningStats, SampleStats, median, summarize
+from .units import UNITS, echo_factor, to_distances, unit_scale
+from .readings import Reading, ReadingColumns
+from .health import NO_ECHO, STUCK_HIGH
 
 GOOD = 0
 OUT_OF_RANGE = 1
 NOT_READY = 2
+CROSSTALK = 3 # Echo rejected as another sensor's ping, see EchoArray
+FAULT = 4 # Sensor quarantined by the health watchdog, not triggered
+
+WARM_UP = 0.5 # Settle time before the first trigger pulse
+EDGE_LATENCY = 0.01 # Time allowed for an edge callback to arrive
+
+# Echo capture modes
+POLL = 'poll'
+EDGE = 'edge'
+
+"""
+State of a non-blocking read started with Echo.trigger().
+"""
+class _Pending(object):
+    __slots__ = ('triggerTime', 'echoTimeout', 'echoStart', 'echoStop',
+                 'risen', 'timeout', 'done', 'fault')
+
+    def __init__(self, triggerTime, echoTimeout):
+        self.triggerTime = triggerTime
+        self.echoTimeout = echoTimeout
+        self.echoStart = triggerTime
+        self.echoStop = triggerTime
+        self.risen = False
+        self.timeout = False
+        self.done = False
+        self.fault = None # Set when the read ended before the trigger
 
 class Echo(object):
     # Use over 50ms measurement cycle. 
-    def __init__(self, trigger_pin, echo_pin, mPerSecond = 343):
+    def __init__(self, trigger_pin, echo_pin, mPerSecond = 343, capture = POLL,
+                 backend = None):
         self._trigger_pin = trigger_pin # Trigger Pin
         self._echo_pin = echo_pin # Echo Pin
+        self._gpio = get_backend(backend) # GPIO backend
 
         self._mPerSecond = mPerSecond
         self._sensor_rest = 0.06 # Sensor rest time between reads
         self._last_read_time = 0
-        self._last_read = 0
         self._maxScanDist = 0
         self._defaultUnit = 'cm'
+        self._update_factors() # Echo time to distance, per unit
         self._triggerTimeout = 0.06 # Trigger Timeout
         """ Set default maximum scan distance (3m) """
         self._maxDistanceTime = (1 / mPerSecond) * 6
         self._maxDistTimeOffset = 0.00067
         self._errorCode = 0
+        self._adaptive = None # Adaptive timing, when enabled
+        self._precise = None # Precision timing, when enabled
+        self._uncertainty = None # Of the last result, in seconds
+        self._metrics = None # Metrics, when enabled
+        self._preHooks = []
+        self._postHooks = []
+        self._environment = None # Speed of sound compensation
+        self._health = None # Health watchdog, when enabled
+        self._fault = None # Fault seen on the read in progress
+        self._watcher = None # Event mode, when enabled
+        self._pending = None # Non-blocking read in progress
+        if capture not in (POLL, EDGE):
+            raise RuntimeError("Incorrect Echo Capture Mode")
+        self._capture = capture
+        # Edge capture state, written by the GPIO event thread.
+        self._edgeCount = 0
+        self._edgeStart = 0.0
+        self._edgeStop = 0.0
+        self._edgeRise = Event()
+        self._edgeFall = Event()
+        self._edgeNotify = None # Called after the falling edge
+        self._aioBusy = False # An async read holds the sensor lock
+        # Streaming acquisition
+        self._stream = None
+        self._streamThread = None
+        self._streaming = False
+        # Held for a whole read, so threads can share a sensor.
+        self._lock = RLock()
+        self._stopped = False
+
+        # Warm up in the background. Until the warm up pulse is sent the
+        # sensor is not ready, and the first read waits for it.
+        self._warm = Event()
+        self._last_read_time = monotonic() + WARM_UP
+        self._warmer = Timer(WARM_UP, self._warm_up)
+        self._warmer.daemon = True
 
         # Configure GPIO Pins
         try:
-            # Use Broadcom (BCM) pin numbering for the GPIO pins.
-            GPIO.setmode(GPIO.BCM)
-            GPIO.setup(self._trigger_pin, GPIO.OUT)
-            GPIO.setup(self._echo_pin, GPIO.IN)      
-            # Trigger 10us pulse for initial sensor cycling.
-            GPIO.output(self._trigger_pin, False)
-            sleep(0.5)
-            GPIO.output(self._trigger_pin, True)
-            sleep(0.00001)
-            GPIO.output(self._trigger_pin, False)
+            self._gpio.acquire(self._trigger_pin, self._echo_pin)
+            self._gpio.output(self._trigger_pin, False)
+            self._warmer.start()
         except Exception as e:
             print(e)
+            self._warm.set()
 
-        self._last_read_time = monotonic()
+    """
+    Trigger 10us pulse for initial sensor cycling, once the trigger pin
+    has settled. Runs on a timer thread, so many sensors warm up at once
+    and constructing them does not block.
+    """
+    def _warm_up(self):
+        try:
+            self._gpio.output(self._trigger_pin, True)
+            sleep(0.00001)
+            self._gpio.output(self._trigger_pin, False)
+            self._last_read_time = monotonic()
+            if self._capture == EDGE:
+                self._start_edges()
+        except Exception as e:
+            print(e)
+        finally:
+            self._warm.set()
 
     """
     For one shot distance measuring, first set the prefered units of
@@ -74,7 +156,9 @@ class Echo(object):
     """
     def send(self):
         echoTime = self._read()
-        return self._valueToUnit(echoTime, self._defaultUnit)
+        if echoTime > 0:
+            return echoTime * self._defaultFactor
+        return 0
 
     """
     This method returns an average from multiple sensor readings.
@@ -84,24 +168,14 @@ class Echo(object):
     """
     def samples(self, samples = 10):
         # Take more than one sensor reads to get an average result.
-        samplesTotal = 0
-        goodSamples = 0
         if samples > 0:
-            for sample in range(0, samples):
-                echoResult = self._read()
-                if echoResult > 0:
-                    samplesTotal = samplesTotal + echoResult
-                    goodSamples = goodSamples + 1
-                    
-                sleep(self._sensor_rest) # Rest the sensor
-
-            if goodSamples > 0:
+            echoTimes, taken, status = self._collect(samples)
+            if len(echoTimes) > 0:
                 # Return the average of all the samples made.
-                return  self._valueToUnit((samplesTotal / goodSamples), self._defaultUnit), goodSamples
-            else:
-                return 0, 0
-        else:
-            return 0, 0
+                average = sum(echoTimes) / len(echoTimes)
+                return (self._valueToUnit(average, self._defaultUnit),
+                        len(echoTimes))
+        return 0, 0
             
     """
     You use this method for either one-shot distance measuring, or to 
@@ -109,140 +183,705 @@ class Echo(object):
     Pass in parameters to change units of measure and number of measuring
     samples to take.
     """
-    def read(self, unit = 'cm', samples = 1):
+    def read(self, unit = 'cm', samples = 1, record = False):
         if samples < 2: # Take one sensor reading
-            echoTime = self._read()
-            return self._valueToUnit(echoTime, unit)
+            echoTime, status, timestamp = self._measure()
+            # Failed reads have an echo time of 0, so need no test.
+            try:
+                distance = echoTime * self._unitFactors[unit]
+            except KeyError:
+                distance = self._valueToUnit(echoTime, unit)
+            if record:
+                return Reading(distance, echoTime, status, timestamp,
+                               1 if status == GOOD else 0,
+                               self.uncertainty(unit))
+            return distance
         
         # Take more than one sensor reads to get an average result.
-        samplesTotal = 0
-        goodSamples = 0
-        if samples > 1:
+        timestamp = monotonic()
+        echoTimes, taken, status = self._collect(samples)
+        echoTime = 0
+        if len(echoTimes) > 0:
+            # Return the average of all the samples made.
+            echoTime = sum(echoTimes) / len(echoTimes)
+        distance = self._valueToUnit(echoTime, unit)
+        if record:
+            return Reading(distance, echoTime, status, timestamp,
+                           len(echoTimes), self.uncertainty(unit))
+        return distance
+
+    """
+    Take count single readings, resting the sensor between them, and
+    return them as a readings.ReadingColumns with one array per field,
+    failed reads included.
+    """
+    def read_many(self, count, unit = None):
+        with self._lock:
+            unit = unit or self._defaultUnit
+            columns = ReadingColumns()
+            for reading in range(0, count):
+                self.wait_until_ready()
+                echoTime, status, timestamp = self._measure()
+                columns.append(self._valueToUnit(echoTime, unit), echoTime,
+                               status, timestamp, 1 if status == GOOD else 0)
+            return columns
+
+    """
+    Take a batch of readings and return a SampleStats summary with the
+    mean, median, trimmed mean and standard deviation of the good
+    readings, in the requested unit. trim is the fraction dropped from
+    each end for the trimmed mean. With a tolerance, sampling stops as
+    soon as the standard error of the mean falls below that fraction of
+    the mean (0.005 = 0.5%), after at least min_samples good readings.
+    """
+    def batch(self, samples = 10, unit = None, trim = 0.1, tolerance = None,
+              min_samples = 3):
+        unit = unit or self._defaultUnit
+        echoTimes, taken, status = self._collect(samples, tolerance,
+                                                 min_samples)
+        result = summarize(echoTimes, trim, taken)
+        return SampleStats(*[self._valueToUnit(value, unit)
+                             for value in result[:4]] + list(result[4:]))
+
+    """
+    Read the sensor up to samples times, resting it between reads, and
+    return the good echo times in an array('d'), the number of reads
+    taken and a status; GOOD if any read was good, otherwise the error
+    code of the last read. Stops early once the readings are stable to
+    within the tolerance. With precision timing on, good reads timed
+    much worse than the timing resolution are left out unless every
+    read was, and the uncertainty of the result is kept for
+    uncertainty().
+    """
+    def _collect(self, samples, tolerance = None, min_samples = 3):
+        with self._lock:
+            echoTimes = array('d')
+            rejected = array('d')
+            running = RunningStats()
+            taken = 0
+            status = NOT_READY
+            variance = 0.0
+            rejectedVariance = 0.0
             for sample in range(0, samples):
-                echoResult = self._read()
+                self.wait_until_ready() # Rest the sensor
+                echoResult, status, timestamp = self._measure()
+                taken += 1
                 if echoResult > 0:
-                    samplesTotal = samplesTotal + echoResult
-                    goodSamples = goodSamples + 1
-                    
-                sleep(self._sensor_rest) # Rest the sensor
+                    uncertainty = self._uncertainty
+                    if uncertainty is not None:
+                        if uncertainty > self._precise.limit:
+                            rejected.append(echoResult)
+                            rejectedVariance += uncertainty * uncertainty
+                            continue
+                        variance += uncertainty * uncertainty
+                    echoTimes.append(echoResult)
+                    if tolerance is not None:
+                        running.add(echoResult)
+                        if running.count >= min_samples and \
+                                running.relative_error <= tolerance:
+                            break
 
-            if goodSamples > 0:
-                # Return the average of all the samples made.
-                return  self._valueToUnit((samplesTotal / goodSamples), unit)
-            else:
-                return 0
+            if len(echoTimes) == 0 and len(rejected) > 0:
+                echoTimes = rejected
+                variance = rejectedVariance
+            self._uncertainty = None
+            if len(echoTimes) > 0:
+                status = GOOD
+                if self._precise is not None:
+                    self._uncertainty = variance ** 0.5 / len(echoTimes)
+            return echoTimes, taken, status
 
     """
-    Activate the sensor and return a new echo period.
+    Sleep for exactly the rest time left, so the next read will not
+    return Not Ready. Returns at once if the sensor is already rested.
     """
-    def _read(self):
-        # Check if enough time has passed before triggering device.
-        if (monotonic() - self._last_read_time) > self._sensor_rest:
-            # Reset values
-            timeout = False
-            echoStart = 0.0
-            echoStop = 0.0
+    def wait_until_ready(self):
+        if not self._warm.is_set():
+            self._warm.wait()
+        rest = self._last_read_time + self._sensor_rest - monotonic()
+        if rest > 0:
+            sleep(rest)
+
+    """
+    Non-blocking read, in three steps. trigger() sends the trigger
+    pulse and returns straight away; False means the sensor was not
+    rested, is still busy or is quarantined by the watchdog. poll()
+    checks the echo once and returns True when the reading is
+    complete. collect() returns the Reading once complete, otherwise
+    None. One thread can keep many sensors busy this way, triggering
+    each as its next_ready_at comes round.
+
+    In poll capture mode the echo pin is only sampled when poll() is
+    called, so the polling interval sets the timing resolution. Edge
+    capture timestamps the echo independently of poll() calls.
+    """
+    def trigger(self):
+        with self._lock:
+            if self._pending is not None or not self._warm.is_set() or \
+                    (monotonic() - self._last_read_time) < self._sensor_rest:
+                return False
+            if self._health is not None and not self._health.allow():
+                return False
+            for hook in self._preHooks:
+                hook(self)
+            if self._gpio.input(self._echo_pin) == 1:
+                # Echo pin high before the trigger; no echo could be
+                # timed, so the read is complete at once, not ready.
+                self._last_read_time = monotonic()
+                self._pending = _Pending(self._last_read_time, 0)
+                self._pending.done = self._pending.timeout = True
+                self._pending.fault = STUCK_HIGH
+                return True
+            if self._capture == EDGE:
+                self._arm_edges()
             # Trigger 10us pulse
-            GPIO.output(self._trigger_pin, True)
+            self._gpio.output(self._trigger_pin, True)
             sleep(0.00001)
-            GPIO.output(self._trigger_pin, False)
-            echoTimeout = self._maxDistanceTime + self._maxDistTimeOffset
+            self._gpio.output(self._trigger_pin, False)
             self._last_read_time = monotonic()
-            # Get most recent time before pin rises.
-            while GPIO.input(self._echo_pin) == 0:
-                echoStart = monotonic()
-                if (monotonic() - self._last_read_time) > self._triggerTimeout:
-                    timeout = True
-                    break
-
-            # Get most recent time before pin falls.
-            while GPIO.input(self._echo_pin) == 1:
-                echoStop = monotonic()
-                if (monotonic() - self._last_read_time) > echoTimeout:
-                    timeout = True
-                    break
-
-            if timeout == True:
-                # No object was detected
+            self._pending = _Pending(
+                self._last_read_time,
+                self._maxDistanceTime + self._maxDistTimeOffset)
+            return True
+
+    def poll(self):
+        with self._lock:
+            pending = self._pending
+            if pending is None:
+                return False
+            if pending.done:
+                return True
+            now = monotonic()
+            elapsed = now - pending.triggerTime
+            if self._capture == EDGE:
+                pending.done = self._edgeFall.is_set() or \
+                    elapsed > max(self._triggerTimeout, pending.echoTimeout)
+            elif self._gpio.input(self._echo_pin) == 1:
+                pending.risen = True
+                pending.echoStop = now
+                if elapsed > pending.echoTimeout:
+                    pending.done = pending.timeout = True
+            elif not pending.risen:
+                pending.echoStart = now
+                if elapsed > self._triggerTimeout:
+                    pending.done = pending.timeout = True
+            else:
+                # Pin fell, echo complete.
+                pending.done = True
+            return pending.done
+
+    def collect(self, unit = None):
+        with self._lock:
+            if not self.poll():
+                return None
+            pending = self._pending
+            self._pending = None
+            if pending.fault is not None:
                 echoTime = 0
-                self._errorCode = OUT_OF_RANGE
+                status = NOT_READY
+                self._fault = pending.fault
+                self._record(echoTime, status)
+            elif self._capture == EDGE:
+                echoTime, status = self._edge_result(pending.echoTimeout)
             else:
-                # Calculate pulse length.
-                echoTime = echoStop - echoStart
-                self._errorCode = GOOD
+                if pending.timeout:
+                    echoTime = 0
+                    status = OUT_OF_RANGE
+                    if not pending.risen:
+                        self._fault = NO_ECHO
+                else:
+                    echoTime = pending.echoStop - pending.echoStart
+                    status = GOOD
+                self._record(echoTime, status)
+            unit = unit or self._defaultUnit
+            return Reading(self._valueToUnit(echoTime, unit),
+                           echoTime, status, pending.triggerTime,
+                           1 if status == GOOD else 0)
 
-        else:
-            # Device not rested enough, use last value.
-            echoTime = 0
-            self._errorCode = NOT_READY
+    """
+    Activate the sensor and return a new echo period.
+    """
+    def _read(self):
+        return self._measure()[0]
+
+    """
+    Activate the sensor and return the echo period, error code and
+    trigger time of this read. The error code is returned rather than
+    taken from error_code, which another read may already have changed.
+    """
+    def _measure(self):
+        with self._lock:
+            if not self._warm.is_set():
+                self.wait_until_ready()
+            health = self._health
+            if health is not None and not health.allow():
+                # Quarantined; skip the trigger and its timeout.
+                self._uncertainty = None
+                self._record(0, FAULT)
+                return 0, FAULT, monotonic()
+            for hook in self._preHooks:
+                hook(self)
+            # Check if enough time has passed before triggering device.
+            if (monotonic() - self._last_read_time) >= self._sensor_rest:
+                # Reset values
+                timeout = False
+                metrics = self._metrics
+                if metrics is not None:
+                    polls = 0
+                    triggerStart = monotonic()
+                if self._capture == EDGE:
+                    self._arm_edges()
+                gpio = self._gpio
+                if gpio.input(self._echo_pin) == 1:
+                    # Echo pin still high from the last ping, or stuck,
+                    # so no echo could be timed. Not ready; the watchdog
+                    # counts it as a fault.
+                    self._fault = STUCK_HIGH
+                    self._uncertainty = None
+                    triggerTime = self._last_read_time = monotonic()
+                    self._record(0, NOT_READY)
+                    return 0, NOT_READY, triggerTime
+                # Trigger 10us pulse
+                gpio.output(self._trigger_pin, True)
+                sleep(0.00001)
+                gpio.output(self._trigger_pin, False)
+                echoTimeout = self._maxDistanceTime + self._maxDistTimeOffset
+                triggerTime = self._last_read_time = monotonic()
+                echoStart = echoStop = triggerTime
+                self._uncertainty = None
+                if self._capture == EDGE:
+                    echoTime, status = self._wait_edges(echoTimeout)
+                    if metrics is not None:
+                        metrics.phases(triggerTime - triggerStart,
+                                       self._edgeStart - triggerTime,
+                                       self._edgeStop - self._edgeStart, 0)
+                    return echoTime, status, triggerTime
+                if self._precise is not None:
+                    echoTime, timeout, uncertainty, rise, polls = \
+                        self._precise.measure(echoTimeout,
+                                              self._triggerTimeout,
+                                              triggerTime)
+                    if metrics is not None:
+                        metrics.phases(triggerTime - triggerStart, rise,
+                                       echoTime, polls)
+                    if timeout:
+                        echoTime = 0
+                        status = OUT_OF_RANGE
+                        if rise == 0:
+                            self._fault = NO_ECHO
+                    else:
+                        status = GOOD
+                        self._uncertainty = uncertainty
+                    self._record(echoTime, status)
+                    return echoTime, status, triggerTime
+                if metrics is None:
+                    # Get most recent time before pin rises.
+                    while gpio.input(self._echo_pin) == 0:
+                        echoStart = monotonic()
+                        if (monotonic() - triggerTime) > self._triggerTimeout:
+                            timeout = True
+                            self._fault = NO_ECHO
+                            break
+
+                    # Get most recent time before pin falls.
+                    while gpio.input(self._echo_pin) == 1:
+                        echoStop = monotonic()
+                        if (monotonic() - triggerTime) > echoTimeout:
+                            timeout = True
+                            break
+                else:
+                    # The same loops, counting polls for the metrics.
+                    while gpio.input(self._echo_pin) == 0:
+                        polls += 1
+                        echoStart = monotonic()
+                        if (monotonic() - triggerTime) > self._triggerTimeout:
+                            timeout = True
+                            self._fault = NO_ECHO
+                            break
+
+                    while gpio.input(self._echo_pin) == 1:
+                        polls += 1
+                        echoStop = monotonic()
+                        if (monotonic() - triggerTime) > echoTimeout:
+                            timeout = True
+                            break
+
+                    metrics.phases(triggerTime - triggerStart,
+                                   echoStart - triggerTime,
+                                   echoStop - echoStart, polls)
+
+                if timeout == True:
+                    # No object was detected
+                    echoTime = 0
+                    status = OUT_OF_RANGE
+                else:
+                    # Calculate pulse length.
+                    echoTime = echoStop - echoStart
+                    status = GOOD
+
+            else:
+                # Device not rested enough, use last value.
+                echoTime = 0
+                status = NOT_READY
+                triggerTime = monotonic()
+                self._uncertainty = None
         
-        # Return reading
-        return echoTime
+            self._record(echoTime, status)
+            # Return reading
+            return echoTime, status, triggerTime
+
+    """
+    Store the outcome of a sensor read. Every read path ends here.
+    """
+    def _record(self, echoTime, errorCode):
+        self._errorCode = errorCode
+        if self._health is not None and \
+                (errorCode in (GOOD, OUT_OF_RANGE) or self._fault is not None):
+            self._health.update(errorCode == GOOD, self._fault)
+        self._fault = None
+        if self._adaptive is not None:
+            self._adaptive.update(echoTime, errorCode)
+        if self._metrics is not None:
+            self._metrics.record(echoTime, errorCode, self._last_read_time)
+        for hook in self._postHooks:
+            hook(self, echoTime, errorCode)
+
+    """
+    Metrics are off by default. Once enabled, every read updates the
+    outcome counts, echo time and polling histograms and phase timings
+    in the metrics property. See metrics.EchoMetrics.
+    """
+    def enable_metrics(self, enabled = True):
+        if not enabled:
+            self._metrics = None
+        elif self._metrics is None:
+            from .metrics import EchoMetrics
+            self._metrics = EchoMetrics()
+        return self._metrics
+
+    """
+    Add a callback run around every sensor read. 'pre' hooks are called
+    as hook(echo) before the trigger, 'post' hooks as
+    hook(echo, echoTime, errorCode) once the outcome is stored.
+    """
+    def add_hook(self, hook, when = 'post'):
+        self._hooks(when).append(hook)
+
+    def remove_hook(self, hook, when = 'post'):
+        self._hooks(when).remove(hook)
+
+    def _hooks(self, when):
+        if when == 'pre':
+            return self._preHooks
+        if when == 'post':
+            return self._postHooks
+        raise RuntimeError("Incorrect Hook Type: {}".format(when))
+
+    """
+    Switch to edge capture and let the GPIO event thread timestamp both
+    echo edges.
+    """
+    def _start_edges(self):
+        self._gpio.add_edge_callback(self._echo_pin, self._on_edge)
+        self._capture = EDGE
+
+    """
+    Edge capture mode. Clear the edge state before the trigger pulse so
+    the first edge seen afterwards is taken as the echo rising edge.
+    """
+    def _arm_edges(self):
+        self._edgeRise.clear()
+        self._edgeFall.clear()
+        self._edgeStart = 0.0
+        self._edgeStop = 0.0
+        self._edgeCount = 0
+
+    """
+    GPIO event callback. Edges are counted rather than read back from
+    the pin, since a short echo pulse may have ended before the
+    callback runs.
+    """
+    def _on_edge(self, channel, now):
+        self._edgeCount += 1
+        if self._edgeCount == 1:
+            self._edgeStart = now
+            self._edgeRise.set()
+        elif self._edgeCount == 2:
+            self._edgeStop = now
+            self._edgeFall.set()
+            notify = self._edgeNotify
+            if notify is not None:
+                notify()
+
+    """
+    Block on the edge events instead of spinning on the echo pin. The
+    rising edge must come within the trigger timeout and the falling
+    edge within the echo timeout, both counted from the trigger time.
+    The edge timestamps decide that; the wait runs EDGE_LATENCY longer,
+    so a callback delivered late is not taken for a timeout.
+    """
+    def _wait_edges(self, echoTimeout, record = True):
+        if self._edgeRise.wait(self._triggerTimeout):
+            remaining = self._last_read_time + echoTimeout - monotonic()
+            self._edgeFall.wait(max(remaining, 0) + EDGE_LATENCY)
+
+        return self._edge_result(echoTimeout, record)
+
+    """
+    Work out the echo period and error code from the captured edges
+    without waiting. Without record, the caller records the outcome.
+    """
+    def _edge_result(self, echoTimeout, record = True):
+        triggerTime = self._last_read_time
+        if not self._edgeFall.is_set() or \
+                (self._edgeStart - triggerTime) > self._triggerTimeout or \
+                (self._edgeStop - triggerTime) > echoTimeout:
+            # No object was detected
+            echoTime = 0
+            status = OUT_OF_RANGE
+            if not self._edgeRise.is_set():
+                self._fault = NO_ECHO
+        else:
+            # Calculate pulse length.
+            echoTime = self._edgeStop - self._edgeStart
+            status = GOOD
+
+        if record:
+            self._record(echoTime, status)
+        return echoTime, status
+
+    """
+    Uncertainty of the last result, as a standard deviation in the unit
+    asked for. None unless precision timing is on and the read was good.
+    """
+    def uncertainty(self, unit = None):
+        if self._uncertainty is None:
+            return None
+        return self._valueToUnit(self._uncertainty, unit or self._defaultUnit)
 
     """
     Convert echo time to distance unit of measure.
     """
     def _valueToUnit(self, value = 0.0, unit = 'cm'):
         if value > 0:
-            if unit == 'mm':
-                # return mm
-                distance = (value * self._mPerSecond * 1000) / 2
-            elif unit == 'cm':
-                # return cm
-                distance = (value * self._mPerSecond * 100) / 2
-            elif unit == 'm':
-                # return m
-                distance = (value * self._mPerSecond) / 2
-            elif unit == 'inch':
-                # return inch
-                distance = (value * self._mPerSecond * 39.3701) / 2
-        else:
-            distance = 0
-            
-        return distance
+            try:
+                return value * self._unitFactors[unit]
+            except KeyError:
+                # A unit registered since the factors were worked out.
+                factor = self._unitFactors[unit] = echo_factor(
+                    self._mPerSecond, unit)
+                return value * factor
+        return 0
+
+    """
+    Refresh the precomputed unit factors after a speed or unit change.
+    Every registered unit is filled in, so a conversion is one lookup
+    and one multiply.
+    """
+    def _update_factors(self):
+        self._unitFactors = dict((unit, echo_factor(self._mPerSecond, unit))
+                                 for unit in UNITS)
+        self._defaultFactor = self._unitFactors[self._defaultUnit]
+
+    """
+    Convert a buffer of raw echo times to distances in one pass and
+    return them as an array('d'). Failed readings stay 0.
+    """
+    def to_distances(self, echoTimes, unit = None):
+        return to_distances(echoTimes, self._mPerSecond,
+                            unit or self._defaultUnit)
 
     
+    """
+    Streaming mode. Start a background thread that reads the sensor as
+    fast as the rest period allows, storing every raw echo time with
+    its trigger timestamp and error code in a ring buffer. Collect the
+    readings with latest() and drain(), which never wait on the sensor.
+    Avoid calling the blocking read methods while streaming.
+    """
+    def start_stream(self, buffer_size = 256):
+        if self._streamThread is None:
+            self._stream = RingBuffer(buffer_size)
+            self._streaming = True
+            self._streamThread = Thread(target=self._stream_loop)
+            self._streamThread.daemon = True
+            self._streamThread.start()
+        return self._stream
+
+    def _stream_loop(self):
+        stream = self._stream
+        while self._streaming:
+            self.wait_until_ready()
+            echoTime, status, timestamp = self._measure()
+            stream.append(timestamp, echoTime, status)
+
+    def stop_stream(self):
+        self._streaming = False
+        if self._streamThread is not None:
+            self._streamThread.join()
+            self._streamThread = None
+
+    """
+    Return the newest streamed reading as (timestamp, distance, error
+    code), or None if nothing has been read yet. Timestamps are
+    time.monotonic() trigger times.
+    """
+    def latest(self, unit = None):
+        if self._stream is None:
+            return None
+        reading = self._stream.latest
+        if reading is None:
+            return None
+        return (reading[0],
+                self._valueToUnit(reading[1], unit or self._defaultUnit),
+                reading[2])
+
+    """
+    Return every streamed reading since the last drain, oldest first,
+    as a list of (timestamp, distance, error code) tuples, or as a
+    readings.ReadingColumns when columns is True.
+    """
+    def drain(self, unit = None, limit = None, columns = False):
+        unit = unit or self._defaultUnit
+        readings = self._stream.drain(limit) if self._stream else []
+        if columns:
+            result = ReadingColumns()
+            for timestamp, echoTime, code in readings:
+                result.append(self._valueToUnit(echoTime, unit), echoTime,
+                              code, timestamp, 1 if code == GOOD else 0)
+            return result
+        return [(timestamp, self._valueToUnit(echoTime, unit), code)
+                for timestamp, echoTime, code in readings]
+
+    """
+    Asyncio counterpart of read(). Rest periods and echo waits are
+    awaited, so one event loop can service many sensors. The sensor
+    must use edge capture, Echo(..., capture='edge').
+    """
+    def aread(self, unit = 'cm', samples = 1):
+        from .aio import aread
+        return aread(self, unit, samples)
+
+    """
+    Async iterator of (timestamp, distance, error code) readings taken
+    as fast as the rest period allows.
+    """
+    def areadings(self, unit = None, count = None):
+        from .aio import areadings
+        return areadings(self, unit or self._defaultUnit, count)
+
+    """
+    True while the streaming thread is running.
+    """
+    @property
+    def streaming(self):
+        return self._streamThread is not None
+
+    """
+    Stop the sensor and release its pins. Pins still used by other Echo
+    instances stay set up; the rest are cleaned up. Safe to call more
+    than once.
+    """
     def stop(self):
-        # Reset GPIO settings
-        GPIO.cleanup()
-        
+        self.stop_stream()
+        self._warmer.cancel()
+        if self._warmer.is_alive():
+            self._warmer.join()
+        self._warm.set()
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            # Reset GPIO settings
+            if self._capture == EDGE:
+                self._gpio.remove_edge_callback(self._echo_pin)
+            self._gpio.release(self._trigger_pin, self._echo_pin)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
     """
     Calculate the speed of sound by measuring a known distance with the
-    sensor.
+    sensor. The median echo time of the good samples is used, so a few
+    stray echoes do not spoil the result. If no sample is good, the
+    speed is left unchanged and error_code holds the reason. With
+    compensation on, it is rebased on the calibrated speed.
     """
     def calibrate(self, dValue = 200, unit = 'mm', samples = 10):
-        distance = self.read(unit, samples)
-        if unit == 'mm':
-            multiplier = 1000
-        elif unit == 'cm':
-            multiplier = 100
-        else: # Must be inch then
-            multiplier = 39.3701
-            
-        self._mPerSecond = ((dValue * 2) / multiplier / self._last_read)
+        multiplier = unit_scale(unit)
+        echoTimes, taken, status = self._collect(samples)
+        if len(echoTimes) == 0:
+            return self._mPerSecond
+
+        self.speed = ((dValue * 2) / multiplier / median(sorted(echoTimes)))
+        if self._environment is not None:
+            self._environment.rebase(self._mPerSecond)
         return self._mPerSecond
 
+    """
+    Environmental compensation. Pass a function returning the air
+    temperature in Celsius, or a (temperature, humidity) pair, and the
+    speed of sound is kept up to date from it before each read. Options
+    are passed to environment.Environment. Call with no source to stop.
+    """
+    def compensate(self, source = None, **options):
+        if self._environment is not None:
+            self.remove_hook(self._environment, 'pre')
+            self._environment = None
+        if source is not None:
+            from .environment import Environment
+            self._environment = Environment(source, **options)
+            self.add_hook(self._environment, 'pre')
+            self._environment(self)
+        return self._environment
+
+    """
+    Health watchdog. Sensors whose echo pin is stuck, or that stop
+    answering, are quarantined: reads return 0 at once with the FAULT
+    error code instead of waiting out the timeouts, and the sensor is
+    probed again with exponential backoff. Options are passed to
+    health.HealthMonitor, which is returned. Call with enabled False to
+    stop.
+    """
+    def watchdog(self, enabled = True, **options):
+        self._health = None
+        if enabled:
+            from .health import HealthMonitor
+            self._health = HealthMonitor(**options)
+        return self._health
+
+    """
+    Event mode. Returns an events.EventWatcher that checks its zone,
+    delta and out of range rules on every reading and queues events
+    only when something changes. Options are passed to the watcher.
+    Call with enabled False to stop.
+    """
+    def watch(self, enabled = True, **options):
+        if self._watcher is not None:
+            self.remove_hook(self._watcher)
+            self._watcher = None
+        if enabled:
+            from .events import EventWatcher
+            self._watcher = EventWatcher(self, **options)
+            self.add_hook(self._watcher)
+        return self._watcher
+
     """
     You can set the maximum distance boundary you want to measure. Smaller
     the sensor detection boundary, quicker the sensor operates. If the
     sensor reaches beyond this range setting, the method returns a 0
     measurement and will produce an out of range error code (1).
-    Supported scan distance units are: mm, cm, m and inch.
+    Supported scan distance units are: mm, cm, m, inch and any unit
+    added with units.register_unit().
     """
     def max_distance(self, value = 3, unit = 'm'):
         timePerM = 1 / self._mPerSecond
         if value > 0:
-            if unit == 'mm':
-                self._maxScanDist = value / 1000
-                self._maxDistanceTime = self._maxScanDist * timePerM * 2
-            elif unit == 'cm':
-                self._maxScanDist = value / 100
-                self._maxDistanceTime = self._maxScanDist * timePerM * 2
-            elif unit == 'm':
-                self._maxScanDist = value
-                self._maxDistanceTime = self._maxScanDist * timePerM * 2
-            elif unit == 'inch':
-                self._maxScanDist = (value * 2.54) / 100
+            if unit in UNITS:
+                self._maxScanDist = value / UNITS[unit]
                 self._maxDistanceTime = self._maxScanDist * timePerM * 2
             else:
                 # Bad values passed by user
@@ -252,6 +891,79 @@ class Echo(object):
             # Bad values passed by user
             pass
 
+        self._retime()
+
+    """
+    Adaptive timing shrinks the echo timeout and rest period to suit
+    the distances being measured, so close targets can be read several
+    times faster. The rest, echo_timeout and max_distance settings are
+    kept as upper limits. Options are passed to timing.AdaptiveTiming.
+    """
+    def adaptive_timing(self, enabled = True, **options):
+        if self._adaptive is not None:
+            self._adaptive.restore()
+            self._adaptive = None
+        if enabled:
+            from .timing import AdaptiveTiming
+            self._adaptive = AdaptiveTiming(self, **options)
+
+    """
+    Precision timing times poll capture reads in integer nanoseconds
+    with a calibrated loop, and gives every good read an uncertainty;
+    see uncertainty() and Reading.uncertainty. Options are passed to
+    precision.PrecisionTiming. Edge capture is not affected.
+    """
+    def precise_timing(self, enabled = True, **options):
+        self._precise = None
+        if enabled:
+            from .precision import PrecisionTiming
+            self._precise = PrecisionTiming(self, **options)
+        return self._precise
+
+    """
+    Change several settings at once. Pass a config.SensorSettings table,
+    or any of the settings config.sensor_settings() takes, which are
+    merged over the current ones. The new table is swapped in between
+    two reads, so a reading never sees half of the change.
+    """
+    def configure(self, settings = None, **options):
+        if settings is None:
+            from .config import sensor_settings
+            current = {
+                'speed': self._mPerSecond,
+                'rest': self._sensor_rest,
+                'trigger_timeout': self._triggerTimeout,
+                'echo_return_offset': self._maxDistTimeOffset,
+                'default_unit': self._defaultUnit,
+            }
+            if self._maxScanDist > 0:
+                current['max_distance'] = self._maxScanDist
+            else:
+                current['echo_timeout'] = self._maxDistanceTime
+            if 'max_distance' in options or 'speed' in options:
+                current.pop('echo_timeout', None)
+            current.update(options)
+            settings = sensor_settings(**current)
+        with self._lock:
+            self._mPerSecond = settings.speed
+            self._sensor_rest = settings.rest
+            self._triggerTimeout = settings.trigger_timeout
+            self._maxDistanceTime = settings.echo_timeout
+            self._maxDistTimeOffset = settings.echo_return_offset
+            self._maxScanDist = settings.max_distance
+            self._defaultUnit = settings.unit
+            self._unitFactors = dict(settings.factors)
+            self._defaultFactor = settings.factors[settings.unit]
+            self._retime()
+        return settings
+
+    """
+    Restart adaptive timing from new sensor settings.
+    """
+    def _retime(self):
+        if self._adaptive is not None:
+            self._adaptive.rebase()
+
     """
     You can poll the sensor to check that the sensor is ready
     to take the next distance measurement. This property either
@@ -259,22 +971,62 @@ class Echo(object):
     """
     @property
     def is_ready(self):
-        if (monotonic() - self._last_read_time) > self._sensor_rest:
+        if (monotonic() - self._last_read_time) >= self._sensor_rest:
             return True
         else:
             return False
+
+    """
+    The time.monotonic() time at which the sensor will next be ready.
+    Sleep until then, or use it to schedule many sensors from one
+    thread, rather than polling is_ready.
+    """
+    @property
+    def next_ready_at(self):
+        return self._last_read_time + self._sensor_rest
     
     """
     poll to return error code for the last sensor reading.
-    0 = Good, 1 = Out of range and 2 = Not ready.
+    0 = Good, 1 = Out of range, 2 = Not ready, 3 = Crosstalk and
+    4 = Fault.
     """
     @property
     def error_code(self):
         return self._errorCode
 
+    """
+    Health watchdog of this sensor, or None while it is off.
+    """
+    @property
+    def health(self):
+        return self._health
+
+    """
+    Metrics of this sensor, or None while metrics are disabled.
+    """
+    @property
+    def metrics(self):
+        return self._metrics
+
+    """
+    Echo capture mode chosen at initialisation. 'poll' spins on the
+    echo pin, 'edge' waits on GPIO edge interrupts and leaves the CPU
+    free while the echo is in flight.
+    """
+    @property
+    def capture(self):
+        return self._capture
+
+    """
+    The GPIO backend this sensor is driven through.
+    """
+    @property
+    def backend(self):
+        return self._gpio
+
     """
     You can adjust the speed of sound to suit environmental conditions.
-    Integer value in m/s.
+    Value in m/s. See also compensate() and calibrate().
     """
     @property
     def speed(self):
@@ -283,11 +1035,19 @@ class Echo(object):
     
     @speed.setter
     def speed(self, speedOfSound):
+        oldSpeed = self._mPerSecond
         self._mPerSecond = speedOfSound
+        self._update_factors()
         if self._maxScanDist > 0:
             self.max_distance(self._maxScanDist, 'm')
         else:
-            self._maxDistanceTime = (1 / self._mPerSecond) * 6
+            # Keep the echo timeout covering the same distance, whether
+            # it is the default or was set through echo_timeout. Scale
+            # the setting, not a timeout shrunk by adaptive timing.
+            if self._adaptive is not None:
+                self._adaptive.restore()
+            self._maxDistanceTime *= oldSpeed / speedOfSound
+            self._retime()
 
     """
     The sensor hardware needs a rest period between each trigger
@@ -296,12 +1056,15 @@ class Echo(object):
     """
     @property
     def rest(self):
+        if self._adaptive is not None:
+            return self._adaptive.rest
         return self._sensor_rest
 
     
     @rest.setter
     def rest(self, sDelay):
         self._sensor_rest = sDelay
+        self._retime()
 
     """
     This property exists just in case. This timeout feature prevents
@@ -325,12 +1088,37 @@ class Echo(object):
     """
     @property
     def echo_timeout(self):
+        if self._adaptive is not None:
+            return self._adaptive.echo_timeout
         return self._maxDistanceTime
 
         
     @echo_timeout.setter
     def echo_timeout(self, timeout):
         self._maxDistanceTime = timeout
+        self._retime()
+
+    """
+    Rest period and echo timeout in use right now. These only differ
+    from rest and echo_timeout while adaptive timing is on.
+    """
+    @property
+    def effective_rest(self):
+        return self._sensor_rest
+
+    @property
+    def effective_echo_timeout(self):
+        return self._maxDistanceTime
+
+    """
+    Highest measurement rate, in readings per second, the current
+    timing allows.
+    """
+    @property
+    def effective_rate(self):
+        cycle = max(self._sensor_rest,
+                    self._maxDistanceTime + self._maxDistTimeOffset)
+        return 1 / cycle
     
     """
     This offset adds a bit of time to the Max distance setting time.
@@ -360,17 +1148,8 @@ class Echo(object):
     
     @default_unit.setter
     def default_unit(self, unit):
-        unitPass = False
-        if unit == 'mm':
-            unitPass = True
-        elif unit == 'cm':
-            unitPass = True
-        elif unit == 'm':
-            unitPass = True
-        elif unit == 'inch':
-            unitPass = True
-
-        if unitPass == True:
+        if unit in UNITS:
             self._defaultUnit = unit
+            self._update_factors()
         else:
             raise RuntimeError("Incorrect Unit for Default Unit")
@@ -1,2 +1,49 @@
 __author__ = 'Mark A Heywood'
 from .Bluetin_Echo import *
+
+from importlib import import_module
+
+# Everything beyond the Echo class is imported on first use, so the
+# package imports quickly and without asyncio or multiprocessing.
+_LAZY = {
+    'EchoArray': 'echo_array',
+    'RingBuffer': 'buffer',
+    'agather': 'aio',
+    'SampleStats': 'stats',
+    'summarize': 'stats',
+    'register_unit': 'units',
+    'prometheus_text': 'metrics',
+    'Reading': 'readings',
+    'ReadingColumns': 'readings',
+    'speed_of_sound': 'environment',
+    'SensorService': 'service',
+    'SharedReadings': 'service',
+    'Recorder': 'recording',
+    'Recording': 'recording',
+    'ReplayBackend': 'recording',
+    'CrosstalkDetector': 'crosstalk',
+    'SensorPose': 'mapping',
+    'OccupancyGrid': 'mapping',
+    'ArrayMapper': 'mapping',
+    'EventWatcher': 'events',
+    'SensorEvent': 'events',
+    'Fleet': 'config',
+    'load_config': 'config',
+    'FrameServer': 'net',
+    'FrameClient': 'net',
+    'HealthMonitor': 'health',
+}
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(
+            "module {!r} has no attribute {!r}".format(__name__, name))
+    value = getattr(import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,121 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Command line entry point.
+
+    python -m Bluetin_Echo serve --sensor 16:12 --sensor 26:19 --tcp :5005
+    python -m Bluetin_Echo serve --config fleet.toml --udp 0.0.0.0:5005
+    python -m Bluetin_Echo serve --sensor 16:12 --unix /tmp/echo.sock
+"""
+
+import argparse
+import sys
+
+
+def _address(text):
+    host, sep, port = text.rpartition(':')
+    if not sep:
+        raise argparse.ArgumentTypeError("Use host:port")
+    return (host or '0.0.0.0', int(port))
+
+
+def _pins(text):
+    try:
+        trigger, echo = text.split(':')
+        return int(trigger), int(echo)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Use trigger_pin:echo_pin")
+
+
+def _arguments(argv):
+    parser = argparse.ArgumentParser(prog='python -m Bluetin_Echo')
+    commands = parser.add_subparsers(dest='command')
+    serve = commands.add_parser(
+        'serve', help="stream sensor frames over the network")
+    source = serve.add_mutually_exclusive_group(required=True)
+    source.add_argument('--config', help="fleet JSON or TOML file")
+    source.add_argument('--sensor', type=_pins, action='append',
+                        help="trigger_pin:echo_pin, once per sensor")
+    target = serve.add_mutually_exclusive_group(required=True)
+    target.add_argument('--tcp', type=_address, metavar='HOST:PORT')
+    target.add_argument('--udp', type=_address, metavar='HOST:PORT')
+    target.add_argument('--unix', metavar='PATH')
+    serve.add_argument('--backend', help="GPIO backend: rpi, lgpio or sim")
+    serve.add_argument('--batch', type=int, default=1,
+                       help="frames per message (default 1)")
+    serve.add_argument('--gap', type=float,
+                       help="seconds between sensor groups (default 0.01); "
+                            "with --config set gap in the file")
+    arguments = parser.parse_args(argv)
+    if arguments.command is None:
+        parser.print_help()
+        sys.exit(2)
+    if arguments.config and arguments.gap is not None:
+        serve.error("--gap cannot be used with --config")
+    return arguments
+
+
+def serve(arguments):
+    from .net import FrameServer
+
+    if arguments.config:
+        from .config import Fleet
+        fleet = Fleet(arguments.config, arguments.backend)
+        array = fleet.array
+    else:
+        from .Bluetin_Echo import Echo
+        from .backends import get_backend
+        from .echo_array import EchoArray
+        backend = get_backend(arguments.backend)
+        options = {}
+        if arguments.gap is not None:
+            options['gap'] = arguments.gap
+        fleet = EchoArray([Echo(trigger, echo, backend=backend)
+                           for trigger, echo in arguments.sensor], **options)
+        array = fleet
+
+    for transport in ('tcp', 'udp', 'unix'):
+        address = getattr(arguments, transport)
+        if address:
+            break
+    server = FrameServer(array, address, transport, arguments.batch)
+    print('Serving {} sensors over {} at {}'.format(
+        len(array.sensors), transport, server.address))
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        fleet.stop()
+
+
+def main(argv = None):
+    arguments = _arguments(argv)
+    if arguments.command == 'serve':
+        serve(arguments)
+
+
+if __name__ == '__main__':
+    main()
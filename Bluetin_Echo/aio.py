@@ -0,0 +1,170 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Asyncio API. Sensor rest periods are awaited with asyncio.sleep() and
+the echo is captured with GPIO edge callbacks that resolve a future on
+the event loop, so no call here blocks the loop for longer than the
+10us trigger pulse and no thread is needed per sensor. Sensors must be
+created with capture='edge'. A read holds the sensor lock, so threads
+and coroutines can share a sensor.
+"""
+
+import asyncio
+from time import monotonic
+from time import sleep
+
+from .Bluetin_Echo import EDGE, FAULT, NOT_READY
+from .health import STUCK_HIGH
+
+"""
+Await the rest period of a sensor.
+"""
+async def _arest(echo):
+    rest = echo.next_ready_at - monotonic()
+    if rest > 0:
+        await asyncio.sleep(rest)
+    # Warm up pulse running late.
+    while not echo._warm.is_set():
+        await asyncio.sleep(0.001)
+    rest = echo.next_ready_at - monotonic()
+    if rest > 0:
+        await asyncio.sleep(rest)
+
+
+"""
+Take the sensor lock for a read without blocking the event loop. The
+lock is reentrant, so _aioBusy keeps out other coroutines on the loop
+thread, which would otherwise be let straight in.
+"""
+async def _alock(echo):
+    while echo._aioBusy or not echo._lock.acquire(blocking=False):
+        await asyncio.sleep(0.001)
+    echo._aioBusy = True
+
+
+def _aunlock(echo):
+    echo._aioBusy = False
+    echo._lock.release()
+
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
+
+"""
+Trigger the sensor once and await its echo. Returns the echo period,
+or 0 on a timeout, the error code and the trigger time of the read.
+"""
+async def _aread_once(echo):
+    if echo._capture != EDGE:
+        raise RuntimeError("Async Reads Need Edge Capture")
+    await _alock(echo)
+    try:
+        if echo._health is not None and not echo._health.allow():
+            # Quarantined by the watchdog.
+            echo._record(0, FAULT)
+            return 0, FAULT, monotonic()
+        for hook in echo._preHooks:
+            hook(echo)
+        await _arest(echo)
+        if echo._gpio.input(echo._echo_pin) == 1:
+            # Echo pin still high, from the last ping or stuck.
+            echo._fault = STUCK_HIGH
+            triggerTime = echo._last_read_time = monotonic()
+            echo._record(0, NOT_READY)
+            return 0, NOT_READY, triggerTime
+
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+        echo._arm_edges()
+        echo._edgeNotify = lambda: loop.call_soon_threadsafe(_resolve, done)
+        try:
+            # Trigger 10us pulse
+            echo._gpio.output(echo._trigger_pin, True)
+            sleep(0.00001)
+            echo._gpio.output(echo._trigger_pin, False)
+            triggerTime = echo._last_read_time = monotonic()
+            echoTimeout = echo._maxDistanceTime + echo._maxDistTimeOffset
+            try:
+                await asyncio.wait_for(
+                    done, max(echo._triggerTimeout, echoTimeout))
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            echo._edgeNotify = None
+
+        return echo._edge_result(echoTimeout) + (triggerTime,)
+    finally:
+        _aunlock(echo)
+
+"""
+Async read(). Takes one reading, or the average of the good readings
+when more than one sample is asked for.
+"""
+async def aread(echo, unit = 'cm', samples = 1):
+    if samples < 2:
+        echoTime, status, triggerTime = await _aread_once(echo)
+        return echo._valueToUnit(echoTime, unit)
+
+    samplesTotal = 0
+    goodSamples = 0
+    for sample in range(0, samples):
+        echoResult, status, triggerTime = await _aread_once(echo)
+        if echoResult > 0:
+            samplesTotal = samplesTotal + echoResult
+            goodSamples = goodSamples + 1
+
+    if goodSamples > 0:
+        return echo._valueToUnit((samplesTotal / goodSamples), unit)
+    return 0
+
+"""
+Async iterator of (timestamp, distance, error code) readings. Runs
+forever unless a count is given.
+"""
+async def areadings(echo, unit = 'cm', count = None):
+    readings = 0
+    while count is None or readings < count:
+        echoTime, status, triggerTime = await _aread_once(echo)
+        yield (triggerTime, echo._valueToUnit(echoTime, unit), status)
+        readings += 1
+
+"""
+Read many sensors at once from one event loop and return their
+distances in sensor order. Pass an EchoArray to fire only the sensors
+its crosstalk map allows together, one group at a time.
+"""
+async def agather(sensors, unit = 'cm', samples = 1):
+    groups = getattr(sensors, 'groups', None)
+    if groups is None:
+        return list(await asyncio.gather(
+            *[aread(echo, unit, samples) for echo in sensors]))
+
+    sensors = sensors.sensors
+    frame = [0] * len(sensors)
+    for group in groups:
+        results = await asyncio.gather(
+            *[aread(sensors[index], unit, samples) for index in group])
+        for index, distance in zip(group, results):
+            frame[index] = distance
+    return frame
@@ -0,0 +1,505 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+GPIO backends used by the Echo class. Every backend exposes the same
+small set of methods, so Echo never talks to a GPIO library directly.
+The hardware libraries are only imported when a backend is created.
+"""
+
+import heapq
+import os
+import random
+from time import monotonic
+from threading import Condition, Lock, Thread
+
+"""
+Backend interface. Edge callbacks are called as callback(pin, timestamp)
+where timestamp is on the time.monotonic() clock.
+"""
+class Backend(object):
+    name = None
+
+    def __init__(self):
+        self._pinLock = Lock()
+        self._pinUsers = {} # Pin to number of Echo instances using it
+
+    def setup(self, trigger_pin, echo_pin):
+        raise NotImplementedError
+
+    def output(self, pin, value):
+        raise NotImplementedError
+
+    def input(self, pin):
+        raise NotImplementedError
+
+    def add_edge_callback(self, pin, callback):
+        raise NotImplementedError
+
+    def remove_edge_callback(self, pin):
+        raise NotImplementedError
+
+    """
+    Release the given pins, or every pin the backend set up when no
+    pins are passed.
+    """
+    def cleanup(self, pins = None):
+        raise NotImplementedError
+
+    """
+    Reference counted pin setup for Echo instances. Pins are set up by
+    their first user, and a pin shared by several sensors, such as a
+    common trigger line, is only released by release() once its last
+    user lets it go.
+    """
+    def acquire(self, trigger_pin, echo_pin):
+        with self._pinLock:
+            if trigger_pin not in self._pinUsers or \
+                    echo_pin not in self._pinUsers:
+                self.setup(trigger_pin, echo_pin)
+            for pin in (trigger_pin, echo_pin):
+                self._pinUsers[pin] = self._pinUsers.get(pin, 0) + 1
+
+    """
+    Let go of pins taken with acquire() and clean up those no longer
+    in use. Returns the pins cleaned up.
+    """
+    def release(self, *pins):
+        with self._pinLock:
+            free = []
+            for pin in pins:
+                users = self._pinUsers.get(pin, 0) - 1
+                if users > 0:
+                    self._pinUsers[pin] = users
+                else:
+                    self._pinUsers.pop(pin, None)
+                    free.append(pin)
+            if free:
+                self.cleanup(free)
+            return free
+
+    """
+    Number of Echo instances using a pin.
+    """
+    def users(self, pin):
+        return self._pinUsers.get(pin, 0)
+
+
+"""
+RPi.GPIO backend using Broadcom (BCM) pin numbering.
+"""
+class RPiGPIOBackend(Backend):
+    name = 'rpi'
+
+    def __init__(self):
+        Backend.__init__(self)
+        try:
+            import RPi.GPIO as GPIO
+        except ImportError:
+            raise RuntimeError("RPi.GPIO Not Installed: "
+                               "pip install Bluetin_Echo[rpi]")
+        self._GPIO = GPIO
+        GPIO.setmode(GPIO.BCM)
+
+    def setup(self, trigger_pin, echo_pin):
+        self._GPIO.setup(trigger_pin, self._GPIO.OUT)
+        self._GPIO.setup(echo_pin, self._GPIO.IN)
+
+    def output(self, pin, value):
+        self._GPIO.output(pin, value)
+
+    def input(self, pin):
+        return self._GPIO.input(pin)
+
+    def add_edge_callback(self, pin, callback):
+        self._GPIO.add_event_detect(
+            pin, self._GPIO.BOTH,
+            callback=lambda channel: callback(channel, monotonic()))
+
+    def remove_edge_callback(self, pin):
+        self._GPIO.remove_event_detect(pin)
+
+    def cleanup(self, pins = None):
+        if pins is None:
+            self._GPIO.cleanup()
+        else:
+            self._GPIO.cleanup(list(pins))
+
+
+"""
+lgpio backend for the Linux GPIO character device (/dev/gpiochipN).
+Works on the Raspberry Pi 5 and other boards where RPi.GPIO does not.
+"""
+class LgpioBackend(Backend):
+    name = 'lgpio'
+
+    def __init__(self, chip = 0):
+        Backend.__init__(self)
+        try:
+            import lgpio
+        except ImportError:
+            raise RuntimeError("lgpio Not Installed: "
+                               "pip install Bluetin_Echo[lgpio]")
+        self._lgpio = lgpio
+        self._handle = lgpio.gpiochip_open(chip)
+        self._pins = set()
+        self._callbacks = {}
+
+    def setup(self, trigger_pin, echo_pin):
+        self._lgpio.gpio_claim_output(self._handle, trigger_pin, 0)
+        self._lgpio.gpio_claim_input(self._handle, echo_pin)
+        self._pins.update((trigger_pin, echo_pin))
+
+    def output(self, pin, value):
+        self._lgpio.gpio_write(self._handle, pin, 1 if value else 0)
+
+    def input(self, pin):
+        return self._lgpio.gpio_read(self._handle, pin)
+
+    def add_edge_callback(self, pin, callback):
+        lgpio = self._lgpio
+        lgpio.gpio_claim_alert(self._handle, pin, lgpio.BOTH_EDGES)
+        self._callbacks[pin] = lgpio.callback(
+            self._handle, pin, lgpio.BOTH_EDGES,
+            lambda chip, gpio, level, tick: callback(gpio, monotonic()))
+
+    def remove_edge_callback(self, pin):
+        cb = self._callbacks.pop(pin, None)
+        if cb is not None:
+            cb.cancel()
+
+    def cleanup(self, pins = None):
+        for pin in list(self._pins) if pins is None else pins:
+            self.remove_edge_callback(pin)
+            self._lgpio.gpio_free(self._handle, pin)
+            self._pins.discard(pin)
+
+
+"""
+Model of a single HC-SR04 for the simulated backend.
+
+distance is in metres and can be a number, a callable taking the
+seconds since the backend started, or a sequence of distances that is
+stepped through one ping at a time. noise is the standard deviation of
+the distance in metres and dropout the probability that a ping gets no
+echo back. Pings beyond max_range, or dropped, return the long no-echo
+pulse of a real sensor. A seed makes the noise and dropouts repeatable.
+An environment such as environment.SimulatedEnvironment makes the speed
+of sound follow the simulated air instead of the fixed speed. fault
+breaks the sensor: 'dead' never raises the echo pin, and 'stuck_high'
+holds it high from the next ping on. It can be changed at any time.
+"""
+class SimulatedSensor(object):
+    def __init__(self, distance = 1.0, noise = 0.0, dropout = 0.0,
+                 speed = 343, latency = 0.00045, max_range = 4.0,
+                 no_echo_pulse = 0.038, seed = None, environment = None,
+                 fault = None):
+        self.distance = distance
+        self.fault = fault
+        self.environment = environment
+        self.noise = noise
+        self.dropout = dropout
+        self.speed = speed
+        self.latency = latency
+        self.max_range = max_range
+        self.no_echo_pulse = no_echo_pulse
+        self._random = random.Random(seed)
+        self._step = 0
+
+    """
+    Return the true distance at time t, before noise is added.
+    """
+    def distance_at(self, t):
+        distance = self.distance
+        if callable(distance):
+            return distance(t)
+        if isinstance(distance, (list, tuple)):
+            value = distance[self._step % len(distance)]
+            self._step += 1
+            return value
+        return distance
+
+    """
+    Return the (delay, width) of the echo pulse for a ping at time t,
+    or None when a dead sensor sends no pulse. delay is counted from
+    the end of the trigger pulse.
+    """
+    def ping(self, t):
+        if self.fault == 'dead':
+            return None
+        distance = self.distance_at(t)
+        if self.noise > 0:
+            distance += self._random.gauss(0, self.noise)
+        if self._random.random() < self.dropout or \
+                not 0 < distance <= self.max_range:
+            return self.latency, self.no_echo_pulse
+        speed = self.environment.speed if self.environment else self.speed
+        return self.latency, (distance * 2) / speed
+
+
+"""
+Pure Python backend that plays simulated echo pulses on the echo pins.
+Sensors are attached per trigger pin; pins set up by Echo without an
+attached sensor get a default SimulatedSensor. Edge callbacks are
+delivered from a scheduler thread with the exact simulated edge time,
+so edge capture is repeatable on any Linux box.
+
+Crosstalk is modelled with leak(). The ping of one sensor reaches
+another after travelling a set path, and ends the echo pulse of that
+sensor early if it arrives while the sensor waits for its own echo.
+"""
+class SimulatedBackend(Backend):
+    name = 'sim'
+
+    def __init__(self, sensors = None, default = None, seed = None):
+        Backend.__init__(self)
+        self._sensors = dict(sensors or {})
+        self._default = default
+        self._random = random.Random(seed)
+        self._leaks = {} # Trigger pin to [(trigger pin, path, probability)]
+        self._arrivals = {} # Echo pin to arrival times of leaked pings
+        self._leaked = {} # Echo pin to True when its pulse was cut short
+        self._echoPins = {} # Trigger pin to the echo pins it drives
+        self._echoSensors = {} # Echo pin to its own sensor, if attached
+        self._stuck = {} # Echo pin to its sensor, once stuck high
+        self._levels = {}
+        self._pulses = {}
+        self._callbacks = {}
+        self._events = []
+        self._cond = Condition()
+        self._thread = None
+        self._start = monotonic()
+
+    """
+    Attach a SimulatedSensor to the trigger pin of an Echo instance.
+    Sensors sharing a trigger pin hear the same sensor, unless one is
+    attached to an echo_pin of its own.
+    """
+    def attach(self, trigger_pin, sensor, echo_pin = None):
+        if echo_pin is not None:
+            self._echoSensors[echo_pin] = sensor
+        else:
+            self._sensors[trigger_pin] = sensor
+        return sensor
+
+    def sensor(self, trigger_pin):
+        return self._sensors.get(trigger_pin)
+
+    """
+    Let the pings of the sensor on source reach the sensor on dest
+    after travelling path metres, for example off a shared target, with
+    the given probability per ping.
+    """
+    def leak(self, source, dest, path, probability = 1.0):
+        self._leaks.setdefault(source, []).append((dest, path, probability))
+
+    """
+    True when the latest echo pulse of the sensor on trigger_pin was cut
+    short by another sensor's ping.
+    """
+    def leaked(self, trigger_pin):
+        return any(self._leaked.get(echoPin, False)
+                   for echoPin in self._echoPins.get(trigger_pin, ()))
+
+    def setup(self, trigger_pin, echo_pin):
+        echoPins = self._echoPins.setdefault(trigger_pin, [])
+        if echo_pin not in echoPins:
+            echoPins.append(echo_pin)
+        self._levels[trigger_pin] = 0
+        self._pulses[echo_pin] = (0.0, 0.0)
+        if trigger_pin not in self._sensors:
+            self._sensors[trigger_pin] = self._default or SimulatedSensor()
+
+    def output(self, pin, value):
+        level = 1 if value else 0
+        previous = self._levels.get(pin, 0)
+        self._levels[pin] = level
+        # A ping is sent on the falling edge of the trigger pulse.
+        if previous == 1 and level == 0 and pin in self._echoPins:
+            now = monotonic()
+            for echoPin in self._echoPins[pin]:
+                sensor = self._echoSensors.get(echoPin, self._sensors[pin])
+                self._ping(pin, echoPin, sensor, now)
+
+    def _ping(self, pin, echoPin, sensor, now):
+        self._leaked[echoPin] = False
+        if getattr(sensor, 'fault', None) == 'stuck_high':
+            # The pin goes high with no edge events, and stays high
+            # while the fault lasts; see input().
+            self._stuck[echoPin] = sensor
+            return
+        result = sensor.ping(now - self._start)
+        if result is None:
+            self._pulses[echoPin] = (now, now)
+            return
+        delay, width = result
+        rise = now + delay
+        fall = rise + width
+        # A ping from another sensor heard first ends the echo.
+        arrivals = [arrival for arrival in self._arrivals.get(echoPin, ())
+                    if arrival > now - 0.1]
+        self._arrivals[echoPin] = arrivals
+        heard = [arrival for arrival in arrivals if rise < arrival < fall]
+        self._leaked[echoPin] = bool(heard)
+        self._play(echoPin, rise, min(heard + [fall]) - rise)
+        if pin in self._leaks:
+            self._send_leaks(pin, sensor, rise)
+
+    def _send_leaks(self, pin, sensor, rise):
+        speed = sensor.environment.speed if sensor.environment else \
+            sensor.speed
+        for dest, path, probability in self._leaks[pin]:
+            echoPins = self._echoPins.get(dest)
+            if not echoPins or self._random.random() >= probability:
+                continue
+            arrival = rise + path / speed
+            for echoPin in echoPins:
+                self._arrivals.setdefault(echoPin, []).append(arrival)
+                pulse = self._pulses.get(echoPin)
+                if pulse is not None and pulse[0] < arrival < pulse[1]:
+                    self._leaked[echoPin] = True
+                    self._cut(echoPin, arrival)
+
+    def _play(self, echo_pin, rise, width):
+        fall = rise + width
+        self._pulses[echo_pin] = (rise, fall)
+        if echo_pin in self._callbacks:
+            with self._cond:
+                heapq.heappush(self._events, (rise, echo_pin))
+                heapq.heappush(self._events, (fall, echo_pin))
+                self._cond.notify()
+
+    """
+    End the current pulse on an echo pin early.
+    """
+    def _cut(self, echo_pin, fall):
+        self._pulses[echo_pin] = (self._pulses[echo_pin][0], fall)
+        if echo_pin in self._callbacks:
+            with self._cond:
+                heapq.heappush(self._events, (fall, echo_pin))
+                self._cond.notify()
+
+    def input(self, pin):
+        sensor = self._stuck.get(pin)
+        if sensor is not None:
+            if sensor.fault == 'stuck_high':
+                return 1
+            del self._stuck[pin]
+        pulse = self._pulses.get(pin)
+        if pulse is None:
+            return self._levels.get(pin, 0)
+        return 1 if pulse[0] <= monotonic() < pulse[1] else 0
+
+    def add_edge_callback(self, pin, callback):
+        self._callbacks[pin] = callback
+        if self._thread is None:
+            self._thread = Thread(target=self._dispatch, daemon=True)
+            self._thread.start()
+
+    def remove_edge_callback(self, pin):
+        self._callbacks.pop(pin, None)
+
+    """
+    Scheduler thread. Sleeps until just before the next edge, then
+    spins for the last fraction of a millisecond to keep callback
+    latency low.
+    """
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while not self._events:
+                    self._cond.wait()
+                when, pin = self._events[0]
+                wait = when - monotonic()
+                if wait > 0.0005:
+                    self._cond.wait(wait - 0.0005)
+                    continue
+                heapq.heappop(self._events)
+            while monotonic() < when:
+                pass
+            # Skip the old falling edge of a pulse that was cut short.
+            if when not in self._pulses.get(pin, (when,)):
+                continue
+            callback = self._callbacks.get(pin)
+            if callback is not None:
+                callback(pin, when)
+
+    def cleanup(self, pins = None):
+        if pins is None:
+            pins = list(self._levels) + list(self._pulses)
+        for pin in pins:
+            self._callbacks.pop(pin, None)
+            self._levels.pop(pin, None)
+            self._pulses.pop(pin, None)
+            self._echoPins.pop(pin, None)
+            self._stuck.pop(pin, None)
+            for echoPins in self._echoPins.values():
+                if pin in echoPins:
+                    echoPins.remove(pin)
+
+
+BACKENDS = {
+    RPiGPIOBackend.name: RPiGPIOBackend,
+    LgpioBackend.name: LgpioBackend,
+    SimulatedBackend.name: SimulatedBackend,
+}
+
+_default_backend = None
+_named = {} # Backend name to its shared instance
+_namedLock = Lock()
+
+"""
+Return a backend instance. Pass a backend instance, a backend name
+('rpi', 'lgpio' or 'sim'), or None for the shared default backend.
+The default is named by the BLUETIN_ECHO_BACKEND environment variable
+and falls back to RPi.GPIO. Each name gives one shared instance, so
+every Echo using it shares the pin reference counts, and with 'sim'
+the same simulated world.
+"""
+def get_backend(backend = None):
+    global _default_backend
+    if isinstance(backend, Backend):
+        return backend
+    if backend is not None:
+        with _namedLock:
+            instance = _named.get(backend)
+            if instance is None:
+                try:
+                    factory = BACKENDS[backend]
+                except KeyError:
+                    raise RuntimeError(
+                        "Unknown GPIO Backend: {}".format(backend))
+                instance = _named[backend] = factory()
+        return instance
+    if _default_backend is None:
+        _default_backend = get_backend(
+            os.environ.get('BLUETIN_ECHO_BACKEND', RPiGPIOBackend.name))
+    return _default_backend
+
+"""
+Replace the shared default backend used by Echo instances created
+without a backend argument.
+"""
+def set_default_backend(backend):
+    global _default_backend
+    _default_backend = get_backend(backend)
+    return _default_backend
@@ -0,0 +1,105 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from array import array
+
+"""
+Fixed size ring buffer of timestamped sensor readings, for one writer
+thread and one reader. Readings are kept in preallocated arrays, so
+appending never allocates. The writer publishes the newest reading as
+a single tuple assignment, which the reader can pick up at any time
+without a lock. If the writer laps the reader, the oldest readings are
+lost and counted in dropped.
+"""
+class RingBuffer(object):
+    def __init__(self, size = 256):
+        if size < 1:
+            raise RuntimeError("Ring Buffer Size Must Be Positive")
+        self._size = size
+        self._times = array('d', [0.0]) * size
+        self._values = array('d', [0.0]) * size
+        self._codes = array('b', [0]) * size
+        self._head = 0 # Readings written
+        self._tail = 0 # Readings drained
+        self._dropped = 0
+        self._latest = None
+
+    """
+    Writer side. Store a reading, overwriting the oldest when full.
+    """
+    def append(self, timestamp, value, code):
+        slot = self._head % self._size
+        self._times[slot] = timestamp
+        self._values[slot] = value
+        self._codes[slot] = code
+        self._latest = (timestamp, value, code)
+        self._head += 1
+
+    """
+    Reader side. Return every reading not yet drained as a list of
+    (timestamp, value, code) tuples, oldest first. A limit caps the
+    number of readings returned.
+    """
+    def drain(self, limit = None):
+        head = self._head
+        start = max(self._tail, head - self._size)
+        self._dropped += start - self._tail
+        if limit is not None:
+            head = min(head, start + limit)
+
+        readings = []
+        for position in range(start, head):
+            slot = position % self._size
+            readings.append((self._times[slot], self._values[slot],
+                             self._codes[slot]))
+
+        # Discard anything the writer overwrote while we were copying.
+        overwritten = self._head - self._size - start
+        if overwritten > 0:
+            readings = readings[overwritten:]
+            self._dropped += overwritten
+        self._tail = head
+        return readings
+
+    """
+    Newest (timestamp, value, code) reading, or None before the first.
+    """
+    @property
+    def latest(self):
+        return self._latest
+
+    @property
+    def size(self):
+        return self._size
+
+    """
+    Number of readings waiting to be drained.
+    """
+    def __len__(self):
+        return min(self._head - self._tail, self._size)
+
+    """
+    Readings lost because the writer lapped the reader.
+    """
+    @property
+    def dropped(self):
+        return self._dropped
@@ -0,0 +1,405 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Sensor fleet configuration. A whole fleet of sensors, with its pins,
+timing, units, firing groups and filters, is described in one JSON or
+TOML file:
+
+    backend = "sim"
+
+    [defaults]
+    max_distance = 2.5
+    rest = 0.06
+
+    [[sensors]]
+    name = "front"
+    trigger = 16
+    echo = 12
+    filters = [{type = "RollingMedian", window = 5}]
+
+    [[sensors]]
+    name = "rear"
+    trigger = 26
+    echo = 19
+    default_unit = "mm"
+
+    [array]
+    groups = [["front"], ["rear"]]
+
+The whole file is checked before anything is built: unknown settings,
+bad units and pins used twice are all reported up front. Several
+sensors may share a trigger pin, but as they all ping together they
+must be fired in the same group; echo pins are never shared. Every
+timing value and unit conversion factor is worked out once per sensor
+into a SensorSettings table. A running fleet takes a changed file
+through Fleet.apply(), which checks it the same way and then swaps
+each sensor's table in between two of its reads, so nothing is rebuilt
+and acquisition carries on.
+
+Settings of a sensor, any of which can go in defaults:
+    speed              speed of sound, m/s
+    rest               rest period between reads, s
+    trigger_timeout    s
+    max_distance       m, or [value, unit]
+    echo_timeout       s, overrides max_distance
+    echo_return_offset s
+    default_unit       unit name
+    capture            'poll' or 'edge', fixed once built
+    filters            list of {type = stage class name, options...}
+
+Array settings: groups (lists of sensor names fired together) or
+crosstalk (name to list of neighbour names), gap, jitter and seed.
+"""
+
+import json
+from collections import namedtuple
+
+from . import filters as filterStages
+from .Bluetin_Echo import Echo, POLL, EDGE
+from .echo_array import EchoArray
+from .units import UNITS, echo_factor, unit_scale
+
+DEFAULTS = {
+    'speed': 343,
+    'rest': 0.06,
+    'trigger_timeout': 0.06,
+    'max_distance': None,
+    'echo_timeout': None,
+    'echo_return_offset': 0.00067,
+    'default_unit': 'cm',
+    'capture': POLL,
+    'filters': None,
+}
+
+ARRAY_SETTINGS = ('groups', 'crosstalk', 'gap', 'jitter', 'seed')
+ARRAY_DEFAULTS = {'gap': 0.01, 'jitter': 0.0} # As EchoArray
+
+"""
+Precomputed timing and conversion table of one sensor. max_distance is
+in metres, 0 when the echo timeout was given directly, and factors maps
+every unit to its echo time to distance multiplier.
+"""
+SensorSettings = namedtuple('SensorSettings',
+                            'speed rest trigger_timeout echo_timeout '
+                            'echo_return_offset max_distance unit factors')
+
+"""
+Work out the settings table of one sensor from the settings above.
+Missing settings take the library defaults.
+"""
+def sensor_settings(**settings):
+    unknown = set(settings) - set(DEFAULTS)
+    if unknown:
+        raise RuntimeError("Unknown Sensor Setting: {}".format(
+            ', '.join(sorted(unknown))))
+    values = dict(DEFAULTS)
+    values.update(settings)
+
+    speed = float(values['speed'])
+    if speed <= 0:
+        raise RuntimeError("Speed Of Sound Must Be Positive")
+    unit = values['default_unit']
+    unit_scale(unit)
+    maxDistance = values['max_distance']
+    if isinstance(maxDistance, (list, tuple)):
+        maxDistance = maxDistance[0] / unit_scale(maxDistance[1])
+    if values['echo_timeout'] is not None:
+        echoTimeout = float(values['echo_timeout'])
+        maxDistance = 0.0
+    elif maxDistance:
+        echoTimeout = maxDistance * 2 / speed
+    else:
+        # Echo's own default, 3m.
+        echoTimeout = (1 / speed) * 6
+        maxDistance = 0.0
+    for name in ('rest', 'trigger_timeout', 'echo_return_offset'):
+        if values[name] < 0:
+            raise RuntimeError("Negative Setting: {}".format(name))
+    if echoTimeout <= 0:
+        raise RuntimeError("Echo Timeout Must Be Positive")
+
+    factors = dict((name, echo_factor(speed, name)) for name in UNITS)
+    return SensorSettings(speed, float(values['rest']),
+                          float(values['trigger_timeout']), echoTimeout,
+                          float(values['echo_return_offset']),
+                          float(maxDistance), unit, factors)
+
+
+"""
+Read a JSON or TOML configuration file into a dict. TOML is chosen by
+the .toml extension and needs Python 3.11, or the tomli package.
+"""
+def load_config(path):
+    if str(path).endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise RuntimeError("TOML Needs Python 3.11 Or tomli")
+        with open(path, 'rb') as configFile:
+            return tomllib.load(configFile)
+    with open(path) as configFile:
+        return json.load(configFile)
+
+
+"""
+Check a configuration and work out everything needed to build or
+update a fleet from it. Returns the sensor names, pins, capture modes,
+settings tables, filter specs and EchoArray options.
+"""
+def _plan(config):
+    if not isinstance(config, dict):
+        config = load_config(config)
+    unknown = set(config) - {'backend', 'defaults', 'sensors', 'array'}
+    if unknown:
+        raise RuntimeError("Unknown Config Section: {}".format(
+            ', '.join(sorted(unknown))))
+    defaults = dict(config.get('defaults', {}))
+    specs = config.get('sensors', [])
+    if not specs:
+        raise RuntimeError("No Sensors Configured")
+
+    names = []
+    pins = []
+    captures = []
+    settings = []
+    filterSpecs = []
+    triggers = {}
+    echoes = {}
+    shared = []
+    for index, spec in enumerate(specs):
+        spec = dict(spec)
+        name = str(spec.pop('name', index))
+        if name in names:
+            raise RuntimeError("Duplicate Sensor Name: {}".format(name))
+        try:
+            trigger = spec.pop('trigger')
+            echo = spec.pop('echo')
+        except KeyError:
+            raise RuntimeError("Sensor Needs Trigger And Echo Pins: {}".format(
+                name))
+        # A trigger pin may drive several sensors, an echo pin only one.
+        for pin, owner in ((trigger, echoes.get(trigger)),
+                           (echo, echoes.get(echo, triggers.get(echo)))):
+            if owner is not None:
+                raise RuntimeError("Pin Conflict: {} used by {} and {}".format(
+                    pin, owner, name))
+        if trigger == echo:
+            raise RuntimeError("Pin Conflict: {} used by {} and {}".format(
+                echo, name, name))
+        if trigger in triggers:
+            shared.append((triggers[trigger], name))
+        else:
+            triggers[trigger] = name
+        echoes[echo] = name
+        values = dict(defaults)
+        values.update(spec)
+        capture = values.pop('capture', POLL)
+        if capture not in (POLL, EDGE):
+            raise RuntimeError("Incorrect Echo Capture Mode")
+        stages = values.pop('filters', None)
+        _stages(stages)
+        names.append(name)
+        pins.append((trigger, echo))
+        captures.append(capture)
+        settings.append(sensor_settings(**values))
+        filterSpecs.append(stages)
+
+    arrayOptions = dict(config.get('array', {}))
+    unknown = set(arrayOptions) - set(ARRAY_SETTINGS)
+    if unknown:
+        raise RuntimeError("Unknown Array Setting: {}".format(
+            ', '.join(sorted(unknown))))
+    arrayOptions['crosstalk'] = _crosstalk(
+        names, arrayOptions.pop('groups', None),
+        arrayOptions.get('crosstalk'))
+    # Sensors on one trigger pin all ping whenever any of them is
+    # triggered, so they have to be fired in the same group.
+    for first, second in shared:
+        first, second = names.index(first), names.index(second)
+        if second in arrayOptions['crosstalk'].get(first, ()) or \
+                first in arrayOptions['crosstalk'].get(second, ()):
+            raise RuntimeError(
+                "Sensors Sharing A Trigger Must Fire Together: {} and {}"
+                .format(names[first], names[second]))
+    return names, pins, captures, settings, filterSpecs, arrayOptions
+
+
+"""
+Filter stages from a list of {type, options...} specs, checked against
+the stages in the filters module.
+"""
+def _stages(specs):
+    stages = []
+    for spec in specs or []:
+        spec = dict(spec)
+        name = str(spec.pop('type', ''))
+        stage = getattr(filterStages, name, None)
+        if not isinstance(stage, type) or not hasattr(stage, 'update'):
+            raise RuntimeError("Unknown Filter Stage: {}".format(name))
+        try:
+            stages.append(stage(**spec))
+        except TypeError as e:
+            raise RuntimeError("Bad Filter Options: {}".format(e))
+    return stages
+
+
+"""
+EchoArray crosstalk map by sensor index, from groups of sensor names
+fired together or a map of sensor names to neighbour names.
+"""
+def _crosstalk(names, groups, crosstalk):
+    index = dict((name, count) for count, name in enumerate(names))
+
+    def lookup(name):
+        try:
+            return index[str(name)]
+        except KeyError:
+            raise RuntimeError("Unknown Sensor In Array: {}".format(name))
+
+    result = {}
+    if groups is not None:
+        members = [[lookup(name) for name in group] for group in groups]
+        listed = [sensor for group in members for sensor in group]
+        if sorted(listed) != list(range(len(names))):
+            raise RuntimeError("Groups Must List Every Sensor Once")
+        # Each sensor conflicts with every sensor outside its group.
+        for group in members:
+            others = [sensor for sensor in listed if sensor not in group]
+            for sensor in group:
+                result[sensor] = list(others)
+    for name, neighbours in (crosstalk or {}).items():
+        result.setdefault(lookup(name), []).extend(
+            lookup(neighbour) for neighbour in neighbours)
+    return result
+
+
+"""
+A configured sensor fleet. config is a configuration dict or the path
+of a JSON or TOML file. All sensors are built in one pass and driven
+together through array, an EchoArray. backend overrides the backend
+named in the configuration.
+"""
+class Fleet(object):
+    def __init__(self, config, backend = None):
+        if not isinstance(config, dict):
+            config = load_config(config)
+        names, pins, captures, settings, filterSpecs, arrayOptions = \
+            _plan(config)
+        if backend is None:
+            backend = config.get('backend')
+        self._names = names
+        self._pins = pins
+        self._captures = captures
+        self._settings = settings
+        self._sensors = []
+        try:
+            for (trigger, echo), capture, table in zip(pins, captures,
+                                                       settings):
+                sensor = Echo(trigger, echo, table.speed, capture, backend)
+                sensor.configure(table)
+                self._sensors.append(sensor)
+        except Exception:
+            self.stop()
+            raise
+        self.array = EchoArray(self._sensors,
+                               filters=self._filters(filterSpecs),
+                               **arrayOptions)
+
+    """
+    Function building the filter pipeline of each sensor for
+    EchoArray, or None when no sensor is filtered.
+    """
+    def _filters(self, filterSpecs):
+        if not any(filterSpecs):
+            return None
+        pipelines = dict(
+            (id(sensor), filterStages.Pipeline(sensor, *_stages(spec)))
+            for sensor, spec in zip(self._sensors, filterSpecs))
+        return lambda sensor: pipelines[id(sensor)]
+
+    """
+    Apply a changed configuration to the running fleet. The whole
+    configuration is checked first, and nothing changes if it fails.
+    Sensor names, pins and capture modes must stay the same. Every
+    sensor table and the array's groups and filters are then swapped
+    together in between two frames. Array settings left out of the
+    configuration go back to their defaults.
+    """
+    def apply(self, config):
+        names, pins, captures, settings, filterSpecs, arrayOptions = \
+            _plan(config)
+        if names != self._names or pins != self._pins:
+            raise RuntimeError("Sensor Or Pin Changes Need A New Fleet")
+        if captures != self._captures:
+            raise RuntimeError("Capture Mode Changes Need A New Fleet")
+        filters = self._filters(filterSpecs)
+        options = dict(ARRAY_DEFAULTS)
+        options.update(arrayOptions)
+        with self.array._lock:
+            for sensor, table in zip(self._sensors, settings):
+                sensor.configure(table)
+            self._settings = settings
+            # False rather than None, so dropping every filter removes
+            # them.
+            self.array.configure(filters=filters or False, **options)
+
+    """
+    Sensor by name.
+    """
+    def __getitem__(self, name):
+        try:
+            return self._sensors[self._names.index(name)]
+        except ValueError:
+            raise KeyError(name)
+
+    def __len__(self):
+        return len(self._sensors)
+
+    @property
+    def names(self):
+        return list(self._names)
+
+    @property
+    def sensors(self):
+        return list(self._sensors)
+
+    """
+    Settings table of each sensor, in sensor order.
+    """
+    @property
+    def settings(self):
+        return list(self._settings)
+
+    def stop(self):
+        for sensor in self._sensors:
+            sensor.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
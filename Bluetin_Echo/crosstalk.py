@@ -0,0 +1,118 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Crosstalk detection for sensor arrays. When sensors in a group fire
+with a small random or coded offset between their trigger pulses, a
+true echo keeps the same time of flight from its own trigger from
+frame to frame, while a ping caught from a neighbour keeps the same
+time of flight from the neighbour's trigger instead. An echo that lines
+up with more recent readings on a neighbour's trigger schedule than on
+its own is flagged.
+"""
+
+from collections import deque
+
+"""
+Flags echoes that arrived in a neighbour's timing window. window is
+the time of flight tolerance in seconds; targets moving faster than
+window times the speed of sound per frame look like crosstalk.
+history is the number of past readings compared per sensor and per
+neighbour. neighbours maps a sensor index to the indices it can hear,
+as the EchoArray crosstalk map does; by default every sensor in a
+group is a neighbour of the rest.
+"""
+class CrosstalkDetector(object):
+    def __init__(self, window = 0.0002, history = 4, neighbours = None):
+        self._window = window
+        self._history = history
+        self._neighbours = None
+        if neighbours is not None:
+            self._neighbours = {}
+            for index, others in neighbours.items():
+                for other in others:
+                    self._neighbours.setdefault(index, set()).add(other)
+                    self._neighbours.setdefault(other, set()).add(index)
+        self._own = {} # Index to recent times of flight of true echoes
+        self._cross = {} # (index, neighbour) to recent (flight, offset)
+        self.checked = 0
+        self.flagged = 0
+
+    """
+    Check the outcome of one group. outcomes maps the index of every
+    sensor fired to its (trigger time, echo end time), with an end time
+    of None when there was no good echo. Returns the set of indices
+    whose echo looks like crosstalk.
+    """
+    def check(self, outcomes):
+        flagged = set()
+        window = self._window
+        checked = 0
+        for index, (triggerTime, echoEnd) in outcomes.items():
+            if echoEnd is None:
+                continue
+            checked += 1
+            flight = echoEnd - triggerTime
+            own = self._own.setdefault(
+                index, deque(maxlen=self._history))
+            ownMatches = sum(1 for past in own if abs(flight - past) <= window)
+            heard = False
+            for other, (otherTrigger, otherEnd) in outcomes.items():
+                if other == index or (self._neighbours is not None and
+                        other not in self._neighbours.get(index, ())):
+                    continue
+                crossFlight = echoEnd - otherTrigger
+                offset = triggerTime - otherTrigger
+                cross = self._cross.setdefault(
+                    (index, other), deque(maxlen=self._history))
+                # Only readings fired at a different offset tell the
+                # two apart.
+                crossMatches = sum(
+                    1 for pastFlight, pastOffset in cross
+                    if abs(crossFlight - pastFlight) <= window and
+                    abs(offset - pastOffset) > window)
+                if crossMatches > ownMatches:
+                    heard = True
+                cross.append((crossFlight, offset))
+            if heard:
+                flagged.add(index)
+            else:
+                own.append(flight)
+        self.checked += checked
+        self.flagged += len(flagged)
+        return flagged
+
+    """
+    Fraction of the good echoes checked that were flagged.
+    """
+    @property
+    def rejection_rate(self):
+        if self.checked == 0:
+            return 0.0
+        return self.flagged / self.checked
+
+    def reset(self):
+        self._own.clear()
+        self._cross.clear()
+        self.checked = 0
+        self.flagged = 0
@@ -0,0 +1,430 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+import random
+from collections import deque
+from threading import RLock
+from time import monotonic
+from time import sleep
+
+from .Bluetin_Echo import (GOOD, OUT_OF_RANGE, NOT_READY, CROSSTALK, FAULT,
+                           EDGE)
+from .health import NO_ECHO, STUCK_HIGH
+from .readings import ReadingColumns
+from .units import unit_scale
+
+"""
+Multi-sensor scheduler. EchoArray owns a list of Echo instances and
+reads them a frame at a time. Sensors that do not interfere with each
+other are triggered together and their echoes captured in the same
+polling loop, so a frame costs one measurement cycle per group rather
+than one per sensor.
+
+The crosstalk map is a dict of sensor index to the indices of the
+sensors it interferes with. Interfering sensors are never fired
+together. Without a map every sensor fires at the same time.
+
+filters is an optional function called with each sensor that returns
+a filters.Pipeline for that channel; frames then hold filtered
+distances.
+
+jitter staggers the trigger pulses within a group. A number gives each
+sensor a random offset of up to that many seconds per frame; a list of
+offset sequences, one offset per sensor index, is used in turn as a
+trigger code. Staggered triggers let reject_crosstalk() tell a
+neighbour's ping from a sensor's own echo.
+"""
+class EchoArray(object):
+    def __init__(self, sensors, crosstalk = None, gap = 0.01, filters = None,
+                 jitter = 0.0, seed = None):
+        self._sensors = list(sensors)
+        self._filters = None
+        if filters is not None:
+            self._filters = [filters(sensor) for sensor in self._sensors]
+        self._groups = self._build_groups(crosstalk or {})
+        self._gap = gap # Quiet time between groups
+        self._frame = [0] * len(self._sensors)
+        self._errorCodes = [GOOD] * len(self._sensors)
+        self._frameTimes = deque(maxlen=16)
+        self._jitter = jitter
+        self._codeIndex = 0
+        self._random = random.Random(seed)
+        self._detector = None # Crosstalk detection, when enabled
+        self._mapper = None # Point and grid output, when enabled
+        self._lock = RLock() # Held for a whole frame
+
+    """
+    Split the sensors into groups that can fire together, placing the
+    sensors with the most neighbours first (greedy graph colouring).
+    """
+    def _build_groups(self, crosstalk):
+        conflicts = [set() for sensor in self._sensors]
+        for index, neighbours in crosstalk.items():
+            for neighbour in neighbours:
+                if neighbour != index:
+                    conflicts[index].add(neighbour)
+                    conflicts[neighbour].add(index)
+
+        groups = []
+        order = sorted(range(len(self._sensors)),
+                       key=lambda i: len(conflicts[i]), reverse=True)
+        for index in order:
+            for group in groups:
+                if not conflicts[index].intersection(group):
+                    group.append(index)
+                    break
+            else:
+                groups.append([index])
+
+        return [sorted(group) for group in groups]
+
+    """
+    Take one distance reading from every sensor and return the frame
+    as a list in sensor order. Failed readings are returned as 0 with
+    the reason in error_codes. With record set, the frame is returned
+    as a readings.ReadingColumns, one row per sensor.
+    """
+    def read_frame(self, unit = 'cm', record = False):
+        with self._lock:
+            if record:
+                columns = ReadingColumns()
+                allEchoTimes = {}
+            for count, group in enumerate(self._groups):
+                if count > 0 and self._gap > 0:
+                    sleep(self._gap)
+                echoTimes = self._capture(group)
+                for index in group:
+                    if self._filters is not None:
+                        self._frame[index] = self._filters[index].feed(
+                            echoTimes[index], unit)
+                    else:
+                        self._frame[index] = \
+                            self._sensors[index]._valueToUnit(
+                                echoTimes[index], unit)
+                if record:
+                    allEchoTimes.update(echoTimes)
+
+            self._frameTimes.append(monotonic())
+            if self._mapper is not None:
+                scale = unit_scale(unit)
+                self._mapper.update([distance / scale
+                                     for distance in self._frame])
+            if record:
+                for index, sensor in enumerate(self._sensors):
+                    status = self._errorCodes[index]
+                    columns.append(self._frame[index], allEchoTimes[index],
+                                   status, sensor._last_read_time,
+                                   1 if status == GOOD else 0)
+                return columns
+            return list(self._frame)
+
+    """
+    Generator of frames. Runs forever unless a frame count is given.
+    """
+    def frames(self, count = None, unit = 'cm'):
+        frames = 0
+        while count is None or frames < count:
+            yield self.read_frame(unit)
+            frames += 1
+
+    """
+    Trigger offsets of the sensors in a group, in seconds.
+    """
+    def _offsets(self, group):
+        jitter = self._jitter
+        if not jitter:
+            return [0.0] * len(group)
+        if isinstance(jitter, (int, float)):
+            return [self._random.uniform(0, jitter) for index in group]
+        code = jitter[self._codeIndex % len(jitter)]
+        self._codeIndex += 1
+        return [code[index] for index in group]
+
+    """
+    Wait out the rest period of every sensor in a group, trigger them
+    together, or staggered with jitter, and collect all their echoes in
+    a single polling loop.
+    """
+    def _capture(self, group):
+        sensors = [self._sensors[index] for index in group]
+        # Always lock in the same order, so threads reading groups that
+        # share sensors cannot deadlock.
+        locked = sorted(sensors, key=id)
+        for sensor in locked:
+            sensor._lock.acquire()
+        try:
+            return self._capture_locked(group, sensors)
+        finally:
+            for sensor in locked:
+                sensor._lock.release()
+
+    def _capture_locked(self, group, sensors):
+        echoTimes = {}
+        # Leave out quarantined sensors, so they cost the rest of the
+        # group nothing.
+        if any(sensor._health is not None for sensor in sensors):
+            active = []
+            for index, sensor in zip(group, sensors):
+                health = sensor._health
+                if health is not None and not health.allow():
+                    echoTimes[index] = 0
+                    self._errorCodes[index] = FAULT
+                    sensor._record(0, FAULT)
+                else:
+                    active.append((index, sensor))
+            group = [index for index, sensor in active]
+            sensors = [sensor for index, sensor in active]
+
+        # Rest the sensors
+        for sensor in sensors:
+            for hook in sensor._preHooks:
+                hook(sensor)
+            sensor.wait_until_ready()
+
+        # A sensor whose echo pin is still high, from its last ping or
+        # stuck, cannot time an echo; it is not ready this frame.
+        active = []
+        for index, sensor in zip(group, sensors):
+            if sensor._gpio.input(sensor._echo_pin) == 1:
+                sensor._fault = STUCK_HIGH
+                sensor._last_read_time = monotonic()
+                echoTimes[index] = 0
+                self._errorCodes[index] = NOT_READY
+                sensor._record(0, NOT_READY)
+            else:
+                active.append((index, sensor))
+        if not active:
+            return echoTimes
+        group = [index for index, sensor in active]
+        sensors = [sensor for index, sensor in active]
+
+        for sensor in sensors:
+            if sensor._capture == EDGE:
+                sensor._arm_edges()
+        # Raise every trigger, then end each 10us pulse at its offset,
+        # polling the sensors already fired meanwhile. The sensor pings
+        # on the falling edge.
+        offsets = self._offsets(group)
+        for sensor in sensors:
+            sensor._gpio.output(sensor._trigger_pin, True)
+        sleep(0.00001)
+        start = monotonic()
+        triggerTimes = [0.0] * len(group)
+
+        # [index, sensor, echo timeout, echo start, echo stop, risen,
+        #  trigger time, trigger due, position in group]
+        waiting = []
+        edges = []
+        for i, (index, sensor) in enumerate(zip(group, sensors)):
+            echoTimeout = sensor._maxDistanceTime + sensor._maxDistTimeOffset
+            if sensor._capture == EDGE:
+                edges.append((index, sensor, echoTimeout))
+            waiting.append([index, sensor, echoTimeout, 0.0, 0.0, False,
+                            None, start + offsets[i], i])
+
+        echoEnds = {}
+        while waiting:
+            for item in list(waiting):
+                index, sensor, echoTimeout = item[0], item[1], item[2]
+                now = monotonic()
+                if item[6] is None:
+                    if now < item[7]:
+                        continue
+                    sensor._gpio.output(sensor._trigger_pin, False)
+                    item[3] = item[4] = item[6] = triggerTimes[item[8]] = \
+                        sensor._last_read_time = monotonic()
+                    if sensor._capture == EDGE:
+                        waiting.remove(item)
+                    continue
+                if sensor._gpio.input(sensor._echo_pin) == 1:
+                    item[5] = True
+                    item[4] = now
+                    if (now - item[6]) > echoTimeout:
+                        echoTime = None
+                    else:
+                        continue
+                elif not item[5]:
+                    item[3] = now
+                    if (now - item[6]) > sensor._triggerTimeout:
+                        echoTime = None
+                        sensor._fault = NO_ECHO
+                    else:
+                        continue
+                else:
+                    # Pin fell, echo complete.
+                    echoTime = item[4] - item[3]
+
+                waiting.remove(item)
+                if echoTime is None:
+                    echoTimes[index] = 0
+                    self._errorCodes[index] = OUT_OF_RANGE
+                else:
+                    echoTimes[index] = echoTime
+                    echoEnds[index] = item[4]
+                    self._errorCodes[index] = GOOD
+
+        for index, sensor, echoTimeout in edges:
+            echoTimes[index], self._errorCodes[index] = \
+                sensor._wait_edges(echoTimeout, False)
+            if self._errorCodes[index] == GOOD:
+                echoEnds[index] = sensor._edgeStop
+
+        if self._detector is not None:
+            outcomes = dict((index, (triggerTimes[i], echoEnds.get(index)))
+                            for i, index in enumerate(group))
+            for index in self._detector.check(outcomes):
+                echoTimes[index] = 0
+                self._errorCodes[index] = CROSSTALK
+
+        for index, sensor in zip(group, sensors):
+            sensor._record(echoTimes[index], self._errorCodes[index])
+        return echoTimes
+
+    """
+    Crosstalk rejection. Echoes that line up with a neighbour's trigger
+    rather than their own are dropped from the frame with the CROSSTALK
+    error code. Needs jitter to tell the two apart. Options are passed
+    to crosstalk.CrosstalkDetector; the detector is returned.
+    """
+    def reject_crosstalk(self, enabled = True, **options):
+        self._detector = None
+        if enabled:
+            from .crosstalk import CrosstalkDetector
+            self._detector = CrosstalkDetector(**options)
+        return self._detector
+
+    """
+    Change the crosstalk map, gap, filters, jitter or seed of a running
+    array. Settings left as None keep their current value; filters
+    False removes every filter. The new settings are swapped in between
+    two frames.
+    """
+    def configure(self, crosstalk = None, gap = None, filters = None,
+                  jitter = None, seed = None):
+        groups = self._groups
+        if crosstalk is not None:
+            groups = self._build_groups(crosstalk)
+        pipelines = self._filters
+        if filters is False:
+            pipelines = None
+        elif filters is not None:
+            pipelines = [filters(sensor) for sensor in self._sensors]
+        with self._lock:
+            self._groups = groups
+            self._filters = pipelines
+            if gap is not None:
+                self._gap = gap
+            if jitter is not None:
+                self._jitter = jitter
+                self._codeIndex = 0
+            if seed is not None:
+                self._random.seed(seed)
+
+    """
+    Map every frame read from the array. poses gives the mount pose of
+    each sensor, see mapping.SensorPose; None turns mapping off. Frames
+    are folded into grid, a mapping.OccupancyGrid, when one is given.
+    Options are passed to mapping.ArrayMapper; the mapper is returned
+    and holds the points of the latest frame.
+    """
+    def mapping(self, poses, grid = None, **options):
+        self._mapper = None
+        if poses is not None:
+            from .mapping import ArrayMapper
+            if len(poses) != len(self._sensors):
+                raise RuntimeError("One Pose Needed Per Sensor")
+            self._mapper = ArrayMapper(poses, grid, **options)
+        return self._mapper
+
+    """
+    Stop every sensor in the array.
+    """
+    def stop(self):
+        for sensor in self._sensors:
+            sensor.stop()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def sensors(self):
+        return list(self._sensors)
+
+    """
+    Filter pipeline of each channel, or None when unfiltered.
+    """
+    @property
+    def filters(self):
+        if self._filters is None:
+            return None
+        return list(self._filters)
+
+    """
+    Sensor index groups in firing order. Sensors in a group are
+    triggered at the same time.
+    """
+    @property
+    def groups(self):
+        return [list(group) for group in self._groups]
+
+    """
+    The most recent frame, without taking a new reading.
+    """
+    @property
+    def frame(self):
+        return list(self._frame)
+
+    """
+    Error code of each sensor for the most recent frame.
+    """
+    @property
+    def error_codes(self):
+        return list(self._errorCodes)
+
+    """
+    The crosstalk detector, or None while rejection is off.
+    """
+    @property
+    def crosstalk_detector(self):
+        return self._detector
+
+    """
+    The array mapper, or None while mapping is off.
+    """
+    @property
+    def mapper(self):
+        return self._mapper
+
+    """
+    Frames per second measured over the last few frames.
+    """
+    @property
+    def fps(self):
+        if len(self._frameTimes) < 2:
+            return 0.0
+        elapsed = self._frameTimes[-1] - self._frameTimes[0]
+        if elapsed <= 0:
+            return 0.0
+        return (len(self._frameTimes) - 1) / elapsed
@@ -0,0 +1,128 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Speed of sound compensation for air temperature and humidity.
+"""
+
+from math import pi, sin, sqrt
+from time import monotonic
+
+"""
+Speed of sound in air in m/s for a temperature in degrees Celsius and
+a relative humidity in percent. Accurate to a few tenths of a percent
+over normal outdoor conditions.
+"""
+def speed_of_sound(temperature = 20.0, humidity = 0.0):
+    return 331.3 * sqrt(1 + temperature / 273.15) + 0.0124 * humidity
+
+"""
+Keeps the speed of sound of an Echo sensor in step with the air. The
+source is a function returning a temperature in Celsius, or a
+(temperature, humidity) pair. It is polled at most once per interval
+seconds, and the sensor speed, with every timeout and unit factor
+derived from it, is only recomputed when the temperature has moved by
+at least threshold degrees or the humidity by humidity_threshold
+percent since the last update. After Echo.calibrate() the model is
+rebased on the calibrated speed, so later updates follow the air from
+there rather than undo the calibration.
+"""
+class Environment(object):
+    def __init__(self, source, threshold = 0.5, humidity_threshold = 5.0,
+                 interval = 1.0):
+        self._source = source
+        self._threshold = threshold
+        self._humidityThreshold = humidity_threshold
+        self._interval = interval
+        self._nextPoll = 0.0
+        self.temperature = None
+        self.humidity = None
+        self.correction = 1.0 # Calibrated speed over modelled speed
+
+    def _conditions(self):
+        conditions = self._source()
+        if isinstance(conditions, (tuple, list)):
+            return conditions[0], conditions[1]
+        return conditions, 0.0
+
+    """
+    Poll the source if the interval has passed. Returns the new speed
+    of sound when the sensor needs updating, otherwise None.
+    """
+    def poll(self, now = None):
+        now = monotonic() if now is None else now
+        if now < self._nextPoll:
+            return None
+        self._nextPoll = now + self._interval
+        temperature, humidity = self._conditions()
+        if self.temperature is not None and \
+                abs(temperature - self.temperature) < self._threshold and \
+                abs(humidity - self.humidity) < self._humidityThreshold:
+            return None
+        self.temperature = temperature
+        self.humidity = humidity
+        return speed_of_sound(temperature, humidity) * self.correction
+
+    """
+    Take speed, measured under the conditions right now, as correct and
+    scale every later update to match it.
+    """
+    def rebase(self, speed, now = None):
+        now = monotonic() if now is None else now
+        self._nextPoll = now + self._interval
+        self.temperature, self.humidity = self._conditions()
+        self.correction = speed / speed_of_sound(self.temperature,
+                                                 self.humidity)
+
+    """
+    Pre-read hook. Updates the sensor speed when the air has changed.
+    """
+    def __call__(self, echo):
+        speed = self.poll()
+        if speed is not None:
+            echo.speed = speed
+
+"""
+Simulated temperature and humidity source. The temperature swings
+by amplitude degrees around temperature over period seconds.
+"""
+class SimulatedEnvironment(object):
+    def __init__(self, temperature = 20.0, humidity = 50.0, amplitude = 0.0,
+                 period = 600.0):
+        self.temperature = temperature
+        self.humidity = humidity
+        self.amplitude = amplitude
+        self.period = period
+        self._start = monotonic()
+
+    def __call__(self):
+        t = monotonic() - self._start
+        return (self.temperature +
+                self.amplitude * sin(2 * pi * t / self.period),
+                self.humidity)
+
+    """
+    Speed of sound under the simulated conditions right now.
+    """
+    @property
+    def speed(self):
+        return speed_of_sound(*self())
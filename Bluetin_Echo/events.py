@@ -0,0 +1,243 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Event mode. Rules are checked against every reading as it is recorded,
+in the acquisition path, and an event is delivered only when something
+changes: callbacks are run and the event is queued for get(). Pair it
+with streaming so the sensor is read in the background, and consumers
+sleep in get() while the scene is static.
+
+    events = echo.watch()
+    events.zone(30, hysteresis=2, debounce=2)
+    echo.start_stream()
+    for event in events:
+        print(event.kind, event.distance)
+
+Event kinds:
+    'enter' and 'leave': the distance went inside or back outside a zone.
+    'delta': the distance moved by at least the change asked for since
+        the last delta event.
+    'lost': a run of readings were out of range.
+    'found': the first good reading after a 'lost' event.
+"""
+
+from collections import deque, namedtuple
+from threading import Condition
+from time import monotonic
+
+from .Bluetin_Echo import GOOD, OUT_OF_RANGE
+
+ENTER = 'enter'
+LEAVE = 'leave'
+DELTA = 'delta'
+LOST = 'lost'
+FOUND = 'found'
+
+"""
+One event. name is the zone name for zone events, else None. distance
+is the reading that raised it, 0 for 'lost', and timestamp its trigger
+time.
+"""
+SensorEvent = namedtuple('SensorEvent', 'kind name distance timestamp')
+
+
+"""
+Distance zone, entered at limit or closer and left beyond limit plus
+hysteresis. A change needs debounce readings in a row to take effect.
+"""
+class _Zone(object):
+    def __init__(self, name, limit, hysteresis, debounce):
+        self.name = name
+        self.limit = limit
+        self.hysteresis = hysteresis
+        self.debounce = max(1, debounce)
+        self.inside = False
+        self.count = 0
+
+    def check(self, distance, status):
+        if status == GOOD and distance <= self.limit:
+            changing = not self.inside
+        elif status == OUT_OF_RANGE or \
+                (status == GOOD and distance > self.limit + self.hysteresis):
+            changing = self.inside
+        else:
+            # Inside the hysteresis band, or no answer from the sensor.
+            changing = False
+        if not changing:
+            self.count = 0
+            return None
+        self.count += 1
+        if self.count < self.debounce:
+            return None
+        self.count = 0
+        self.inside = not self.inside
+        return ENTER if self.inside else LEAVE
+
+
+class _Delta(object):
+    def __init__(self, change, debounce):
+        self.change = change
+        self.debounce = max(1, debounce)
+        self.reference = None
+        self.count = 0
+
+    def check(self, distance, status):
+        if status != GOOD:
+            return None
+        if self.reference is None:
+            self.reference = distance
+            return None
+        if abs(distance - self.reference) < self.change:
+            self.count = 0
+            return None
+        self.count += 1
+        if self.count < self.debounce:
+            return None
+        self.count = 0
+        self.reference = distance
+        return DELTA
+
+
+class _Streak(object):
+    def __init__(self, count):
+        self.needed = max(1, count)
+        self.count = 0
+        self.lost = False
+
+    def check(self, distance, status):
+        if status == GOOD:
+            self.count = 0
+            if self.lost:
+                self.lost = False
+                return FOUND
+        elif status == OUT_OF_RANGE:
+            self.count += 1
+            if not self.lost and self.count >= self.needed:
+                self.lost = True
+                return LOST
+        return None
+
+
+"""
+Event rules and delivery for one sensor, installed as a post hook by
+Echo.watch(). Distances are in unit. Up to queue_size undelivered
+events are kept; the oldest are dropped beyond that.
+"""
+class EventWatcher(object):
+    def __init__(self, echo, unit = 'cm', queue_size = 256):
+        self._echo = echo
+        self._unit = unit
+        self._rules = []
+        self._callbacks = []
+        self._queue = deque(maxlen=queue_size)
+        self._ready = Condition()
+        self.dropped = 0
+
+    """
+    Watch a zone from the sensor out to limit. Raises 'enter' when a
+    reading is at limit or closer and 'leave' when one is beyond limit
+    plus hysteresis, or out of range, each after debounce readings in a
+    row.
+    """
+    def zone(self, limit, hysteresis = 0, debounce = 1, name = None):
+        self._rules.append(_Zone(name, limit, hysteresis, debounce))
+        return self
+
+    """
+    Raise 'delta' when the distance has moved by change or more since
+    the last delta event, for debounce readings in a row.
+    """
+    def delta(self, change, debounce = 1):
+        self._rules.append(_Delta(change, debounce))
+        return self
+
+    """
+    Raise 'lost' after count out of range readings in a row, and
+    'found' on the next good reading.
+    """
+    def out_of_range(self, count = 5):
+        self._rules.append(_Streak(count))
+        return self
+
+    """
+    Call callback(event) for every event, on the acquisition thread.
+    Keep it short; the sensor waits for it.
+    """
+    def subscribe(self, callback):
+        self._callbacks.append(callback)
+
+    def unsubscribe(self, callback):
+        self._callbacks.remove(callback)
+
+    def clear(self):
+        self._rules = []
+
+    """
+    Post hook, run for every reading the sensor records.
+    """
+    def __call__(self, echo, echoTime, errorCode):
+        if not self._rules:
+            return
+        distance = echo._valueToUnit(echoTime, self._unit)
+        for rule in self._rules:
+            kind = rule.check(distance, errorCode)
+            if kind is not None:
+                self._emit(SensorEvent(kind, getattr(rule, 'name', None),
+                                       distance, echo._last_read_time))
+
+    def _emit(self, event):
+        for callback in self._callbacks:
+            callback(event)
+        with self._ready:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append(event)
+            self._ready.notify_all()
+
+    """
+    Next event, waiting up to timeout seconds for one; None on a
+    timeout. With no timeout, waits as long as it takes.
+    """
+    def get(self, timeout = None):
+        end = None if timeout is None else monotonic() + timeout
+        with self._ready:
+            while not self._queue:
+                wait = None if end is None else end - monotonic()
+                if wait is not None and wait <= 0:
+                    return None
+                self._ready.wait(wait)
+            return self._queue.popleft()
+
+    """
+    Every queued event, without waiting.
+    """
+    def pending(self):
+        with self._ready:
+            events = list(self._queue)
+            self._queue.clear()
+        return events
+
+    def __iter__(self):
+        while True:
+            yield self.get()
@@ -0,0 +1,201 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Streaming filters for sensor readings. Each stage takes one value at a
+time through update() and returns the filtered value, or None when the
+stage rejects the value. Stages keep a fixed amount of state, so a
+filter never grows with the number of readings.
+
+Stages work in metres. A Pipeline chains stages behind an Echo sensor,
+converting raw echo times to metres on the way in and to the requested
+unit on the way out.
+"""
+
+from bisect import bisect_left, insort
+from collections import deque
+
+"""
+Median of the last window values.
+"""
+class RollingMedian(object):
+    def __init__(self, window = 5):
+        self._window = deque(maxlen=window)
+        self._sorted = []
+
+    def update(self, value):
+        if len(self._window) == self._window.maxlen:
+            del self._sorted[bisect_left(self._sorted, self._window[0])]
+        self._window.append(value)
+        insort(self._sorted, value)
+        count = len(self._sorted)
+        middle = count // 2
+        if count % 2:
+            return self._sorted[middle]
+        return (self._sorted[middle - 1] + self._sorted[middle]) / 2
+
+    def reset(self):
+        self._window.clear()
+        self._sorted = []
+
+"""
+Exponential moving average. A larger alpha follows changes faster, a
+smaller alpha smooths more.
+"""
+class ExponentialAverage(object):
+    def __init__(self, alpha = 0.3):
+        self._alpha = alpha
+        self._value = None
+
+    def update(self, value):
+        if self._value is None:
+            self._value = value
+        else:
+            self._value += self._alpha * (value - self._value)
+        return self._value
+
+    def reset(self):
+        self._value = None
+
+"""
+One dimensional Kalman filter for a distance that drifts slowly.
+process_noise is how much the true distance may change between
+readings and measurement_noise the sensor noise, both as variances in
+metres squared.
+"""
+class Kalman1D(object):
+    def __init__(self, process_noise = 1e-5, measurement_noise = 1e-4):
+        self._q = process_noise
+        self._r = measurement_noise
+        self._value = None
+        self._p = 1.0
+
+    def update(self, value):
+        if self._value is None:
+            self._value = value
+            self._p = self._r
+            return value
+        self._p += self._q
+        gain = self._p / (self._p + self._r)
+        self._value += gain * (value - self._value)
+        self._p *= (1 - gain)
+        return self._value
+
+    def reset(self):
+        self._value = None
+        self._p = 1.0
+
+"""
+Reject values further than threshold standard deviations from the
+recent average, using exponentially weighted mean and variance. After
+max_rejects rejections in a row the value is accepted, so the filter
+follows a real step change instead of locking out.
+"""
+class OutlierReject(object):
+    def __init__(self, threshold = 3.0, alpha = 0.1, min_deviation = 0.01,
+                 max_rejects = 3):
+        self._threshold = threshold
+        self._alpha = alpha
+        self._minDeviation = min_deviation
+        self._maxRejects = max_rejects
+        self.reset()
+
+    def update(self, value):
+        if self._mean is None:
+            self._mean = value
+            return value
+
+        deviation = max(self._variance ** 0.5, self._minDeviation)
+        difference = value - self._mean
+        if abs(difference) > self._threshold * deviation and \
+                self._rejects < self._maxRejects:
+            self._rejects += 1
+            return None
+
+        if self._rejects >= self._maxRejects:
+            # Step change, restart from the new value.
+            self._mean = value
+            self._variance = 0.0
+        else:
+            self._mean += self._alpha * difference
+            self._variance = (1 - self._alpha) * (
+                self._variance + self._alpha * difference * difference)
+        self._rejects = 0
+        return value
+
+    def reset(self):
+        self._mean = None
+        self._variance = 0.0
+        self._rejects = 0
+
+"""
+Chain of filter stages fed with the raw echo times of one Echo sensor.
+Failed readings (echo time 0) and rejected values do not reach the
+later stages; the last good output is returned instead, or 0 before
+the first one.
+"""
+class Pipeline(object):
+    def __init__(self, echo, *stages, **kwargs):
+        self._echo = echo
+        self._stages = stages
+        self._unit = kwargs.get('unit', 'cm')
+        self._value = None # Filtered distance in metres
+
+    """
+    Filter one raw echo time and return the filtered distance.
+    """
+    def feed(self, echoTime, unit = None):
+        if echoTime > 0:
+            value = self._echo._valueToUnit(echoTime, 'm')
+            for stage in self._stages:
+                value = stage.update(value)
+                if value is None:
+                    break
+            else:
+                self._value = value
+        return self.value(unit)
+
+    """
+    Take a new reading from the sensor and return the filtered distance.
+    """
+    def read(self, unit = None):
+        self._echo.wait_until_ready()
+        return self.feed(self._echo._read(), unit)
+
+    """
+    Latest filtered distance.
+    """
+    def value(self, unit = None):
+        if self._value is None:
+            return 0
+        # Back to an echo time so any supported unit can be returned.
+        echoTime = self._value * 2 / self._echo._mPerSecond
+        return self._echo._valueToUnit(echoTime, unit or self._unit)
+
+    def reset(self):
+        self._value = None
+        for stage in self._stages:
+            stage.reset()
+
+    @property
+    def stages(self):
+        return self._stages
@@ -0,0 +1,154 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Sensor health watchdog. A disconnected or failed sensor never raises
+its echo pin, so every read of it spins for the whole trigger timeout;
+a shorted or latched one holds the echo pin high. The watchdog spots
+both, and runs of timeouts if asked, and quarantines the sensor: it is
+no longer triggered, reads of it return straight away with the FAULT
+error code, and an EchoArray leaves it out of its frames so the healthy
+sensors keep their full rate. A quarantined sensor is probed again
+after backoff seconds, doubling up to max_backoff while it stays
+faulty, and returns to service on its first sound read.
+"""
+
+from time import monotonic
+
+HEALTHY = 'healthy'
+SUSPECT = 'suspect'
+QUARANTINED = 'quarantined'
+
+# Faults, as seen on a single read.
+NO_ECHO = 'no_echo' # Echo pin never rose: stuck low or disconnected
+STUCK_HIGH = 'stuck_high' # Echo pin high before the trigger
+TIMEOUT = 'timeout' # Any out of range read, counted when timeouts is set
+
+"""
+Health of one sensor, installed by Echo.watchdog(). failures faulty
+reads in a row put the sensor in quarantine. With timeouts set, that
+many out of range reads in a row count as a fault too; leave it off
+where the sensor may face open space.
+"""
+class HealthMonitor(object):
+    def __init__(self, failures = 3, backoff = 1.0, max_backoff = 60.0,
+                 timeouts = None):
+        self._failuresNeeded = max(1, failures)
+        self._timeouts = timeouts
+        self._firstBackoff = backoff
+        self._maxBackoff = max_backoff
+        self._backoff = backoff
+        self._probeAt = 0.0
+        self._probing = False
+        self.state = HEALTHY
+        self.fault = None # Last fault seen
+        self.failures = 0 # Faulty reads in a row
+        self.misses = 0 # Out of range reads in a row
+        self.quarantines = 0
+        self.probes = 0
+
+    """
+    True if the sensor may be triggered now. While quarantined this is
+    True only when a probe is due.
+    """
+    def allow(self, now = None):
+        if self.state != QUARANTINED:
+            return True
+        now = monotonic() if now is None else now
+        if now < self._probeAt:
+            return False
+        self._probing = True
+        self.probes += 1
+        return True
+
+    """
+    Take the outcome of a read. fault is the fault seen on the read, or
+    None. Returns the new state.
+    """
+    def update(self, good, fault = None, now = None):
+        if good:
+            self.misses = 0
+        elif fault is None:
+            self.misses += 1
+            if self._timeouts and self.misses >= self._timeouts:
+                fault = TIMEOUT
+
+        if fault is None:
+            self.failures = 0
+            if self.state != HEALTHY:
+                self.state = HEALTHY
+                self._backoff = self._firstBackoff
+            self._probing = False
+            return self.state
+
+        self.fault = fault
+        self.failures += 1
+        now = monotonic() if now is None else now
+        if self.state == QUARANTINED:
+            if self._probing:
+                # Probe failed, wait longer before the next one.
+                self._backoff = min(self._backoff * 2, self._maxBackoff)
+                self._probeAt = now + self._backoff
+        elif self.failures >= self._failuresNeeded:
+            self.state = QUARANTINED
+            self.quarantines += 1
+            self._backoff = self._firstBackoff
+            self._probeAt = now + self._backoff
+        else:
+            self.state = SUSPECT
+        self._probing = False
+        return self.state
+
+    """
+    Put the sensor back in service at once.
+    """
+    def reset(self):
+        self.state = HEALTHY
+        self.failures = 0
+        self.misses = 0
+        self._backoff = self._firstBackoff
+        self._probing = False
+
+    """
+    Seconds until the next probe of a quarantined sensor, else 0.
+    """
+    @property
+    def next_probe(self):
+        if self.state != QUARANTINED:
+            return 0.0
+        return max(0.0, self._probeAt - monotonic())
+
+    @property
+    def healthy(self):
+        return self.state != QUARANTINED
+
+    def report(self):
+        return {
+            'state': self.state,
+            'fault': self.fault,
+            'failures': self.failures,
+            'quarantines': self.quarantines,
+            'probes': self.probes,
+            'next_probe': self.next_probe,
+            'backoff': self._backoff,
+        }
@@ -0,0 +1,388 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Obstacle mapping for sensor arrays. Each sensor is given a mount pose
+on the robot; a frame of distances is then turned into 2-D points and
+folded into an occupancy grid.
+
+Everything that depends only on the poses, the direction of every ray
+in each beam and the sample points along them, is worked out once. A
+frame is then converted by slicing those tables and a multiply-add per
+reading, done on whole arrays when numpy is installed (the numpy
+extra, pip install Bluetin_Echo[numpy]). The grid is updated in place,
+touching only the cells the frame covers. Decay is applied lazily:
+each cell keeps the time it was last updated and is decayed when it is
+next touched or read, so an idle grid costs nothing per frame.
+"""
+
+from array import array
+from collections import namedtuple
+from math import ceil, cos, radians, sin
+from time import monotonic
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+"""
+Mount pose of a sensor in the robot frame. x and y are in metres,
+heading is the direction the sensor faces in degrees counterclockwise
+from the robot x axis, and beam the full beam angle in degrees.
+"""
+SensorPose = namedtuple('SensorPose', 'x y heading beam')
+SensorPose.__new__.__defaults__ = (15.0,)
+
+"""
+Converts frames of distances in metres from sensors at the given poses
+to points. rays is the number of rays spread across each beam for the
+grid, resolution the step along them and reach the furthest distance
+to sample, in metres.
+"""
+class Projector(object):
+    def __init__(self, poses, rays = 5, resolution = 0.05, reach = 4.0):
+        self._poses = [SensorPose(*pose) for pose in poses]
+        self._rays = max(1, rays)
+        self._resolution = resolution
+        self._cos = array('d', (cos(radians(pose.heading))
+                                for pose in self._poses))
+        self._sin = array('d', (sin(radians(pose.heading))
+                                for pose in self._poses))
+        # Unit vectors of the rays in each beam, sensor by sensor.
+        self._fan = []
+        for pose in self._poses:
+            spread = radians(pose.beam) / 2
+            angles = [radians(pose.heading) +
+                      (spread * (2.0 * ray / (self._rays - 1) - 1)
+                       if self._rays > 1 else 0.0)
+                      for ray in range(self._rays)]
+            self._fan.append([(cos(angle), sin(angle)) for angle in angles])
+        # Sample points along every ray out to reach, so a frame only
+        # slices these tables.
+        steps = int(ceil(reach / resolution))
+        self._rayX = []
+        self._rayY = []
+        for pose, fan in zip(self._poses, self._fan):
+            self._rayX.append([[pose.x + dx * i * resolution
+                                for i in range(steps)] for dx, dy in fan])
+            self._rayY.append([[pose.y + dy * i * resolution
+                                for i in range(steps)] for dx, dy in fan])
+        if numpy is not None:
+            self._px = numpy.array([pose.x for pose in self._poses])
+            self._py = numpy.array([pose.y for pose in self._poses])
+            self._npCos = numpy.array(self._cos)
+            self._npSin = numpy.array(self._sin)
+            # Sensor by ray by step, masked per frame by the reading.
+            self._npRayX = numpy.array(self._rayX).reshape(
+                len(self._poses), self._rays, steps)
+            self._npRayY = numpy.array(self._rayY).reshape(
+                len(self._poses), self._rays, steps)
+            self._npSteps = numpy.arange(steps)
+            self._fanX = numpy.array([[dx for dx, dy in fan]
+                                      for fan in self._fan])
+            self._fanY = numpy.array([[dy for dx, dy in fan]
+                                      for fan in self._fan])
+
+    """
+    Points on the beam axis of every good reading, as (xs, ys) in the
+    robot frame, or in the world frame when a robot (x, y, heading in
+    degrees) pose is given. Readings of 0 are skipped.
+    """
+    def points(self, distances, robot = None):
+        if numpy is not None:
+            d = numpy.asarray(distances, dtype=float)
+            good = d > 0
+            xs = self._px[good] + d[good] * self._npCos[good]
+            ys = self._py[good] + d[good] * self._npSin[good]
+            if robot is not None:
+                xs, ys = _to_world(robot, xs, ys)
+            return xs, ys
+
+        xs = array('d')
+        ys = array('d')
+        for index, distance in enumerate(distances):
+            if distance > 0:
+                pose = self._poses[index]
+                xs.append(pose.x + distance * self._cos[index])
+                ys.append(pose.y + distance * self._sin[index])
+        if robot is not None:
+            xs, ys = _to_world(robot, xs, ys)
+        return xs, ys
+
+    """
+    Sample points of one frame for a grid update. Returns (free, hit)
+    point lists as (xs, ys): samples along every ray short of the
+    reading, and the ends of the rays. Readings of 0 clear each beam up
+    to clear_range metres when it is set.
+    """
+    def samples(self, distances, robot = None, clear_range = None):
+        step = self._resolution
+        if numpy is not None:
+            d = numpy.asarray(distances, dtype=float)
+            good = d > 0
+            steps = numpy.where(good, d, clear_range or 0.0) / step
+            mask = self._npSteps < steps.astype(int)[:, None, None]
+            mask = numpy.broadcast_to(mask, self._npRayX.shape)
+            free = self._npRayX[mask], self._npRayY[mask]
+            hit = ((self._px[good, None] +
+                    self._fanX[good] * d[good, None]).ravel(),
+                   (self._py[good, None] +
+                    self._fanY[good] * d[good, None]).ravel())
+            if robot is not None:
+                free = _to_world(robot, *free)
+                hit = _to_world(robot, *hit)
+            return free, hit
+
+        freeX = []
+        freeY = []
+        hitX = []
+        hitY = []
+        for index, distance in enumerate(distances):
+            if distance > 0:
+                steps = int(distance / step)
+            elif clear_range:
+                steps = int(clear_range / step)
+            else:
+                continue
+            for rayX in self._rayX[index]:
+                freeX.extend(rayX[:steps])
+            for rayY in self._rayY[index]:
+                freeY.extend(rayY[:steps])
+            if distance > 0:
+                pose = self._poses[index]
+                for dx, dy in self._fan[index]:
+                    hitX.append(pose.x + dx * distance)
+                    hitY.append(pose.y + dy * distance)
+        if robot is not None:
+            freeX, freeY = _to_world(robot, freeX, freeY)
+            hitX, hitY = _to_world(robot, hitX, hitY)
+        return (freeX, freeY), (hitX, hitY)
+
+    @property
+    def poses(self):
+        return list(self._poses)
+
+
+"""
+Move robot frame points to the world frame.
+"""
+def _to_world(robot, xs, ys):
+    rx, ry, heading = robot
+    c = cos(radians(heading))
+    s = sin(radians(heading))
+    if numpy is not None:
+        xs = numpy.asarray(xs, dtype=float)
+        ys = numpy.asarray(ys, dtype=float)
+        return rx + xs * c - ys * s, ry + xs * s + ys * c
+    return (array('d', (rx + x * c - y * s for x, y in zip(xs, ys))),
+            array('d', (ry + x * s + y * c for x, y in zip(xs, ys))))
+
+
+"""
+Log odds occupancy grid of width by height cells of resolution metres,
+with its lower left corner at origin. hit and miss are the log odds
+added when a cell is seen occupied or free, and values are held within
++/- limit. half_life is the time in seconds for evidence to decay to
+half; None keeps it forever.
+"""
+class OccupancyGrid(object):
+    def __init__(self, width, height, resolution = 0.05, origin = (0.0, 0.0),
+                 hit = 0.85, miss = -0.4, limit = 5.0, half_life = 10.0):
+        self.width = width
+        self.height = height
+        self.resolution = resolution
+        self.origin = tuple(origin)
+        self._hit = hit
+        self._miss = miss
+        self._limit = limit
+        self._halfLife = half_life
+        if numpy is not None:
+            self._values = numpy.zeros(width * height)
+            self._stamps = numpy.zeros(width * height)
+        else:
+            self._values = array('d', bytes(8 * width * height))
+            self._stamps = array('d', bytes(8 * width * height))
+
+    """
+    Flat cell indices of the points inside the grid, without repeats.
+    """
+    def _cells(self, xs, ys):
+        ox, oy = self.origin
+        scale = 1.0 / self.resolution
+        width = self.width
+        height = self.height
+        if numpy is not None:
+            cx = numpy.floor((numpy.asarray(xs) - ox) * scale).astype(int)
+            cy = numpy.floor((numpy.asarray(ys) - oy) * scale).astype(int)
+            inside = (cx >= 0) & (cx < width) & (cy >= 0) & (cy < height)
+            return numpy.unique(cy[inside] * width + cx[inside])
+        cells = set()
+        add = cells.add
+        for x, y in zip(xs, ys):
+            cx = (x - ox) * scale
+            cy = (y - oy) * scale
+            # Checked before truncation, which rounds towards zero.
+            if 0 <= cx < width and 0 <= cy < height:
+                add(int(cy) * width + int(cx))
+        return cells
+
+    def _factor(self, age):
+        return 0.5 ** (max(0.0, age) / self._halfLife)
+
+    """
+    Fold in the free and hit points of one frame, from
+    Projector.samples(). A cell seen both free and hit counts as hit.
+    """
+    def update(self, free, hit, now = None):
+        now = monotonic() if now is None else now
+        hitCells = self._cells(*hit)
+        freeCells = self._cells(*free)
+        values = self._values
+        stamps = self._stamps
+        limit = self._limit
+        if numpy is not None:
+            freeCells = numpy.setdiff1d(freeCells, hitCells,
+                                        assume_unique=True)
+            for cells, change in ((freeCells, self._miss),
+                                  (hitCells, self._hit)):
+                if self._halfLife:
+                    values[cells] *= 0.5 ** ((now - stamps[cells]) /
+                                             self._halfLife)
+                values[cells] = numpy.clip(values[cells] + change,
+                                           -limit, limit)
+                stamps[cells] = now
+            return
+
+        rate = 1.0 / self._halfLife if self._halfLife else 0.0
+        for cells, change in ((freeCells - hitCells, self._miss),
+                              (hitCells, self._hit)):
+            for cell in cells:
+                value = values[cell]
+                if value and rate:
+                    value *= 0.5 ** ((now - stamps[cell]) * rate)
+                value += change
+                if value > limit:
+                    value = limit
+                elif value < -limit:
+                    value = -limit
+                values[cell] = value
+                stamps[cell] = now
+
+    """
+    Log odds of the cell at a point, decayed to now. 0 is unknown,
+    positive occupied and negative free.
+    """
+    def value(self, x, y, now = None):
+        cells = list(self._cells((x,), (y,)))
+        if not cells:
+            return 0.0
+        cell = cells[0]
+        value = float(self._values[cell])
+        if self._halfLife and value:
+            now = monotonic() if now is None else now
+            value *= self._factor(now - self._stamps[cell])
+        return value
+
+    """
+    Centres of the cells with log odds above threshold once decayed,
+    as (xs, ys). Decay is brought up to date for the whole grid.
+    """
+    def occupied(self, threshold = 1.0, now = None):
+        self.settle(now)
+        ox, oy = self.origin
+        half = self.resolution / 2
+        if numpy is not None:
+            cells = numpy.nonzero(self._values > threshold)[0]
+            return (ox + (cells % self.width) * self.resolution + half,
+                    oy + (cells // self.width) * self.resolution + half)
+        xs = array('d')
+        ys = array('d')
+        for cell, value in enumerate(self._values):
+            if value > threshold:
+                xs.append(ox + (cell % self.width) * self.resolution + half)
+                ys.append(oy + (cell // self.width) * self.resolution + half)
+        return xs, ys
+
+    """
+    Apply decay up to now to every cell.
+    """
+    def settle(self, now = None):
+        if not self._halfLife:
+            return
+        now = monotonic() if now is None else now
+        values = self._values
+        stamps = self._stamps
+        if numpy is not None:
+            values *= 0.5 ** ((now - stamps) / self._halfLife)
+            stamps[:] = now
+            return
+        for cell, value in enumerate(values):
+            if value:
+                values[cell] = value * self._factor(now - stamps[cell])
+            stamps[cell] = now
+
+    """
+    Log odds of every cell, row by row from the origin, without decay
+    applied; call settle() first for current values.
+    """
+    @property
+    def values(self):
+        return self._values
+
+    def clear(self):
+        for cell in range(len(self._values)):
+            self._values[cell] = 0.0
+            self._stamps[cell] = 0.0
+
+
+"""
+Maps the frames of a sensor array. poses holds a SensorPose, or an
+(x, y, heading[, beam]) tuple, for each sensor. With a grid, every frame
+is folded into it as well. robot is the pose of the robot in the world
+frame, (x, y, heading in degrees), or None to map in the robot frame;
+update it as the robot moves. Options are passed to Projector.
+Installed on an EchoArray with EchoArray.mapping().
+"""
+class ArrayMapper(object):
+    def __init__(self, poses, grid = None, clear_range = None, robot = None,
+                 **options):
+        self.projector = Projector(poses, **options)
+        self.grid = grid
+        self.robot = robot
+        self.points = ([], [])
+        self._clearRange = clear_range
+
+    """
+    Map a frame of distances in metres. Returns its points, which are
+    also kept in points.
+    """
+    def update(self, distances, now = None):
+        if len(distances) != len(self.projector.poses):
+            raise RuntimeError("One Pose Needed Per Sensor")
+        if self.grid is not None:
+            free, hit = self.projector.samples(distances, self.robot,
+                                               self._clearRange)
+            self.grid.update(free, hit, now)
+        self.points = self.projector.points(distances, self.robot)
+        return self.points
@@ -0,0 +1,181 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Per sensor metrics. An Echo only keeps an EchoMetrics object once
+metrics are enabled, so a sensor without metrics pays for a single
+None check per read.
+"""
+
+from array import array
+from bisect import bisect_left
+from time import monotonic
+
+# Echo status codes, in the order of EchoMetrics.outcomes.
+STATUS_NAMES = ('good', 'out_of_range', 'not_ready', 'crosstalk', 'fault')
+
+# Default histogram bucket upper bounds.
+ECHO_TIME_BUCKETS = (0.0003, 0.0006, 0.0012, 0.0024, 0.0048, 0.0096,
+                     0.0175, 0.024, 0.04)
+PHASE_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01,
+                 0.02, 0.04, 0.06)
+POLL_BUCKETS = (1, 10, 100, 1000, 10000, 100000)
+
+"""
+Histogram with fixed bucket bounds. Counts are cumulative only when
+exported, so observe() touches a single bucket.
+"""
+class Histogram(object):
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = array('L', [0]) * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def snapshot(self):
+        return {
+            'buckets': dict(zip([str(bound) for bound in self.bounds] +
+                                ['+Inf'], self.counts)),
+            'sum': self.sum,
+            'count': self.count,
+        }
+
+    """
+    Prometheus sample lines for this histogram.
+    """
+    def _samples(self, name, labels):
+        lines = []
+        total = 0
+        for bound, count in zip(list(self.bounds) + ['+Inf'], self.counts):
+            total += count
+            lines.append('{}_bucket{{{}le="{}"}} {}'.format(
+                name, labels + ',' if labels else '', bound, total))
+        labels = '{' + labels + '}' if labels else ''
+        lines.append('{}_sum{} {}'.format(name, labels, self.sum))
+        lines.append('{}_count{} {}'.format(name, labels, self.count))
+        return lines
+
+
+"""
+Outcome counts, echo time and polling histograms and phase timings of
+one sensor.
+
+trigger is the time spent sending the trigger pulse, wait_rise the time
+from trigger to the echo rising edge, wait_fall the echo pulse itself
+and latency the time from the trigger to the reading being stored.
+"""
+class EchoMetrics(object):
+    def __init__(self):
+        self.outcomes = [0] * len(STATUS_NAMES)
+        self.echo_time = Histogram(ECHO_TIME_BUCKETS)
+        self.poll_iterations = Histogram(POLL_BUCKETS)
+        self.trigger = Histogram(PHASE_BUCKETS)
+        self.wait_rise = Histogram(PHASE_BUCKETS)
+        self.wait_fall = Histogram(PHASE_BUCKETS)
+        self.latency = Histogram(PHASE_BUCKETS)
+
+    def record(self, echoTime, errorCode, triggerTime):
+        if errorCode < len(self.outcomes):
+            self.outcomes[errorCode] += 1
+        if echoTime > 0:
+            self.echo_time.observe(echoTime)
+            self.latency.observe(monotonic() - triggerTime)
+
+    def phases(self, trigger, waitRise, waitFall, polls):
+        self.trigger.observe(trigger)
+        if waitRise > 0:
+            self.wait_rise.observe(waitRise)
+        if waitFall > 0:
+            self.wait_fall.observe(waitFall)
+        if polls:
+            self.poll_iterations.observe(polls)
+
+    def _histograms(self):
+        return (('echo_time_seconds', 'Echo pulse width', self.echo_time),
+                ('poll_iterations', 'Polling loop iterations per read',
+                 self.poll_iterations),
+                ('trigger_seconds', 'Trigger pulse phase', self.trigger),
+                ('wait_rise_seconds', 'Trigger to echo rising edge',
+                 self.wait_rise),
+                ('wait_fall_seconds', 'Echo rising to falling edge',
+                 self.wait_fall),
+                ('latency_seconds', 'Trigger to reading stored',
+                 self.latency))
+
+    def snapshot(self):
+        result = {'outcomes': dict(zip(STATUS_NAMES, self.outcomes))}
+        for name, description, histogram in self._histograms():
+            result[name] = histogram.snapshot()
+        return result
+
+    def reset(self):
+        self.__init__()
+
+    def to_prometheus(self, labels = None, prefix = 'bluetin_echo'):
+        return prometheus_text([(labels or {}, self)], prefix)
+
+"""
+Prometheus text exposition for many sensors. Pass Echo instances, or
+(labels dict, EchoMetrics) pairs. Echo instances are labelled with
+their pins, and sensors without metrics enabled are skipped.
+"""
+def prometheus_text(sensors, prefix = 'bluetin_echo'):
+    families = []
+    samples = {}
+    for sensor in sensors:
+        if isinstance(sensor, tuple):
+            labels, metrics = sensor
+        else:
+            metrics = sensor.metrics
+            labels = {'trigger': sensor._trigger_pin,
+                      'echo': sensor._echo_pin}
+        if metrics is None:
+            continue
+        labelText = ','.join('{}="{}"'.format(key, labels[key])
+                             for key in sorted(labels))
+
+        name = prefix + '_reads_total'
+        if name not in samples:
+            families.append((name, 'counter', 'Sensor reads by status'))
+            samples[name] = []
+        for status, count in zip(STATUS_NAMES, metrics.outcomes):
+            samples[name].append('{}{{{}status="{}"}} {}'.format(
+                name, labelText + ',' if labelText else '', status, count))
+
+        for suffix, description, histogram in metrics._histograms():
+            name = prefix + '_' + suffix
+            if name not in samples:
+                families.append((name, 'histogram', description))
+                samples[name] = []
+            samples[name].extend(histogram._samples(name, labelText))
+
+    lines = []
+    for name, kind, description in families:
+        lines.append('# HELP {} {}'.format(name, description))
+        lines.append('# TYPE {} {}'.format(name, kind))
+        lines.extend(samples[name])
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,377 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Network streaming. FrameServer reads frames from a sensor array and
+sends them to every connected client as compact binary messages over
+TCP, UDP or a Unix socket; FrameClient receives and unpacks them.
+
+    server = FrameServer(array, ('0.0.0.0', 5005))
+    server.start()
+
+    client = FrameClient(('robot.local', 5005))
+    for frame in client.frames():
+        print(frame.sequence, frame.distances('cm'))
+
+Message layout, little endian: a header of magic, version, sensor
+count, frame count and the sequence number of the first frame, then
+for each frame its wall clock time and a 32 bit distance in metres and
+status byte per sensor. A four sensor frame takes 28 bytes, and up to
+batch frames share one header. Over TCP and Unix sockets messages are
+sent back to back and the client splits the byte stream on the
+headers. Over UDP every message is one datagram; clients subscribe by
+sending any datagram to the server and are dropped if they go quiet
+for more than UDP_EXPIRY seconds, so FrameClient resends a hello every
+UDP_HELLO seconds. Sequence numbers let the client count lost frames.
+"""
+
+import os
+import select
+import socket
+import struct
+from collections import namedtuple
+from threading import Thread
+from time import monotonic, time
+
+from .units import unit_scale
+
+MAGIC = b'BE'
+VERSION = 1
+HEADER = struct.Struct('<2sBxHHQ') # magic, version, sensors, frames, sequence
+STAMP = struct.Struct('<d') # frame wall clock time
+READING = struct.Struct('<fB') # distance in metres, status
+
+UDP_EXPIRY = 10.0
+UDP_HELLO = 2.0
+TRANSPORTS = ('tcp', 'udp', 'unix')
+
+"""
+Size in bytes of one frame of readings from the given number of sensors.
+"""
+def frame_size(sensors):
+    return STAMP.size + READING.size * sensors
+
+"""
+Pack frames, each a (timestamp, distances in metres, statuses) tuple,
+into one message.
+"""
+def pack_frames(sequence, frames):
+    sensors = len(frames[0][1])
+    layout = struct.Struct('<d' + 'fB' * sensors)
+    parts = [HEADER.pack(MAGIC, VERSION, sensors, len(frames), sequence)]
+    for timestamp, distances, statuses in frames:
+        values = [timestamp]
+        for distance, status in zip(distances, statuses):
+            values.append(distance)
+            values.append(status)
+        parts.append(layout.pack(*values))
+    return b''.join(parts)
+
+"""
+One received frame. distance holds metres; use distances() for other
+units.
+"""
+class NetFrame(namedtuple('NetFrame', 'sequence timestamp distance status')):
+    __slots__ = ()
+
+    def distances(self, unit = 'cm'):
+        scale = unit_scale(unit)
+        return [distance * scale for distance in self.distance]
+
+"""
+Unpack every frame of one message. Returns a list of NetFrames.
+"""
+def unpack_frames(message):
+    magic, version, sensors, count, sequence = HEADER.unpack_from(message, 0)
+    if magic != MAGIC or version != VERSION:
+        raise RuntimeError("Not A Frame Message")
+    layout = struct.Struct('<d' + 'fB' * sensors)
+    frames = []
+    for index, values in enumerate(layout.iter_unpack(
+            memoryview(message)[HEADER.size:
+                                HEADER.size + layout.size * count])):
+        frames.append(NetFrame(sequence + index, values[0], values[1::2],
+                               values[2::2]))
+    return frames
+
+
+def _socket_family(transport):
+    if transport not in TRANSPORTS:
+        raise RuntimeError("Incorrect Transport: {}".format(transport))
+    if transport == 'unix':
+        return socket.AF_UNIX, socket.SOCK_STREAM
+    if transport == 'udp':
+        return socket.AF_INET, socket.SOCK_DGRAM
+    return socket.AF_INET, socket.SOCK_STREAM
+
+
+"""
+Serves the frames of an EchoArray, or anything with read_frame() and
+error_codes, at address: a (host, port) pair, or a path for a Unix
+socket. batch frames are sent per message; 1 sends each frame as soon
+as it is read. frames is an optional frame source to use instead of
+reading the array, an iterator of (timestamp, distances in metres,
+statuses) tuples.
+"""
+class FrameServer(object):
+    def __init__(self, array, address, transport = 'tcp', batch = 1,
+                 frames = None):
+        family, kind = _socket_family(transport)
+        self._array = array
+        self._transport = transport
+        self._batch = max(1, batch)
+        self._frames = frames
+        self._address = address
+        self._clients = {} # Stream socket, or UDP address, to last seen
+        self._sequence = 0
+        self._running = False
+        self._thread = None
+        self.sent = 0
+        if transport == 'unix' and os.path.exists(address):
+            os.unlink(address)
+        self._socket = socket.socket(family, kind)
+        if transport != 'unix':
+            self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind(address)
+        if kind == socket.SOCK_STREAM:
+            self._socket.listen(8)
+        self._socket.setblocking(False)
+
+    """
+    Address the server is bound to, with the port filled in when 0 was
+    asked for.
+    """
+    @property
+    def address(self):
+        return self._socket.getsockname()
+
+    @property
+    def clients(self):
+        return len(self._clients)
+
+    def _read(self):
+        if self._frames is not None:
+            return next(self._frames)
+        distances = self._array.read_frame('m')
+        return time(), distances, self._array.error_codes
+
+    """
+    Take in new clients and UDP hellos, without waiting.
+    """
+    def _accept(self):
+        now = monotonic()
+        while select.select([self._socket], [], [], 0)[0]:
+            try:
+                if self._transport == 'udp':
+                    data, peer = self._socket.recvfrom(64)
+                    self._clients[peer] = now
+                else:
+                    client, peer = self._socket.accept()
+                    client.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF,
+                                      1 << 16)
+                    if self._transport == 'tcp':
+                        client.setsockopt(socket.IPPROTO_TCP,
+                                          socket.TCP_NODELAY, 1)
+                    # Sends never wait, see _send().
+                    client.setblocking(False)
+                    self._clients[client] = now
+            except (BlockingIOError, InterruptedError):
+                break
+        if self._transport == 'udp':
+            for peer, seen in list(self._clients.items()):
+                if now - seen > UDP_EXPIRY:
+                    del self._clients[peer]
+
+    """
+    Send a message to every client. A stream client whose socket buffer
+    cannot take the whole message is too slow to keep up, and is
+    dropped rather than holding up acquisition.
+    """
+    def _send(self, message):
+        for client in list(self._clients):
+            try:
+                if self._transport == 'udp':
+                    self._socket.sendto(message, client)
+                elif client.send(message) < len(message):
+                    raise BlockingIOError
+            except OSError:
+                if self._transport != 'udp':
+                    client.close()
+                del self._clients[client]
+        self.sent += 1
+
+    """
+    Read and send frames until stop() is called, or count frames when
+    given.
+    """
+    def serve(self, count = None):
+        self._running = True
+        frames = []
+        served = 0
+        try:
+            while self._running and (count is None or served < count):
+                self._accept()
+                try:
+                    frames.append(self._read())
+                except StopIteration:
+                    break
+                served += 1
+                if len(frames) >= self._batch:
+                    if self._clients:
+                        self._send(pack_frames(self._sequence, frames))
+                    self._sequence += len(frames)
+                    frames = []
+            if frames and self._clients:
+                self._send(pack_frames(self._sequence, frames))
+                self._sequence += len(frames)
+        finally:
+            self._running = False
+
+    """
+    Serve from a background thread.
+    """
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = Thread(target=self.serve)
+            self._thread.daemon = True
+            self._thread.start()
+
+    """
+    Stop serving and close every socket.
+    """
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for client in list(self._clients):
+            if self._transport != 'udp':
+                client.close()
+        self._clients = {}
+        self._socket.close()
+        if self._transport == 'unix' and os.path.exists(self._address):
+            os.unlink(self._address)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+"""
+Receives frames from a FrameServer at address, a (host, port) pair or a
+Unix socket path. lost counts frames that never arrived, from gaps in
+the sequence numbers.
+"""
+class FrameClient(object):
+    def __init__(self, address, transport = 'tcp', timeout = 5.0):
+        family, kind = _socket_family(transport)
+        self._transport = transport
+        self._address = address
+        self._socket = socket.socket(family, kind)
+        self._socket.settimeout(timeout)
+        self._buffer = bytearray()
+        self._pending = []
+        self._next = None # Sequence number expected next
+        self._hello = 0.0
+        self.lost = 0
+        self.received = 0
+        if transport == 'udp':
+            self._say_hello()
+        else:
+            self._socket.connect(address)
+            if transport == 'tcp':
+                self._socket.setsockopt(socket.IPPROTO_TCP,
+                                        socket.TCP_NODELAY, 1)
+
+    def _say_hello(self):
+        self._socket.sendto(b'hello', self._address)
+        self._hello = monotonic()
+
+    """
+    Next message from the socket as bytes. Stream transports are
+    reassembled from the byte stream; None means the server closed.
+    """
+    def _message(self):
+        if self._transport == 'udp':
+            if monotonic() - self._hello > UDP_HELLO:
+                self._say_hello()
+            return self._socket.recv(65536)
+        buffer = self._buffer
+        while True:
+            if len(buffer) >= HEADER.size:
+                magic, version, sensors, count, sequence = \
+                    HEADER.unpack_from(buffer, 0)
+                if magic != MAGIC:
+                    raise RuntimeError("Not A Frame Message")
+                size = HEADER.size + frame_size(sensors) * count
+                if len(buffer) >= size:
+                    message = bytes(buffer[:size])
+                    del buffer[:size]
+                    return message
+            data = self._socket.recv(65536)
+            if not data:
+                return None
+            buffer.extend(data)
+
+    """
+    Next frame, waiting up to the timeout given at construction for
+    one; raises socket.timeout if none comes, and returns None once the
+    server has closed the connection.
+    """
+    def recv(self):
+        while not self._pending:
+            message = self._message()
+            if message is None:
+                return None
+            self._pending = unpack_frames(message)
+            self._pending.reverse()
+        frame = self._pending.pop()
+        if self._next is not None and frame.sequence > self._next:
+            self.lost += frame.sequence - self._next
+        self._next = frame.sequence + 1
+        self.received += 1
+        return frame
+
+    """
+    Generator of frames until the server closes, or count frames.
+    """
+    def frames(self, count = None):
+        received = 0
+        while count is None or received < count:
+            frame = self.recv()
+            if frame is None:
+                return
+            yield frame
+            received += 1
+
+    def close(self):
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,163 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+High precision echo timing for poll capture. The polling loop stamps
+every sample of the echo pin with time.perf_counter_ns(), so edges are
+timed in integer nanoseconds with no float rounding, and each edge is
+bracketed between the stamp before the last sample on one side of it
+and a stamp taken after the first sample on the other. The edge is
+taken as the middle of that bracket. A bracket is normally one loop
+iteration wide, but grows when the loop is preempted, so the bracket
+widths give the timing uncertainty of every reading.
+
+The loop is calibrated against the pin at rest when it is set up. The
+time a pin read takes is measured; a bracket always spans one read
+more than the interval the edge can be in, so that much is taken off
+each bracket, and the spread of the sample point within a read is
+carried into the uncertainty.
+"""
+
+from math import sqrt
+from time import monotonic, perf_counter_ns
+
+from .stats import median
+
+"""
+Precise poll timing for one Echo sensor. loops is the number of pin
+reads timed by calibrate(). Averaged reads leave out readings with an
+uncertainty over reject times the resolution, as those were preempted
+and would need many more samples to average out.
+"""
+class PrecisionTiming(object):
+    def __init__(self, echo, loops = 2000, reject = 10.0):
+        self._echo = echo
+        self._loops = loops
+        self._reject = reject
+        self.period = 0 # Loop iteration in ns
+        self.offset = 0 # Stamp to pin sample in ns
+        self.spread = 0.0 # Standard deviation of the sample point in ns
+        self.limit = 0.0 # Uncertainty limit for averages in seconds
+        self.calibrate()
+
+    """
+    Time the polling loop and a pin read against the idle echo pin.
+    Call again after moving the sensor to a different backend or system
+    load.
+    """
+    def calibrate(self):
+        gpio = self._echo._gpio
+        pin = self._echo._echo_pin
+        loops = self._loops
+        clock = perf_counter_ns
+        # The polling loop, as measure() runs it.
+        stamps = [0] * loops
+        for loop in range(loops):
+            now = clock()
+            gpio.input(pin)
+            stamps[loop] = now
+        periods = sorted(stamps[loop + 1] - stamps[loop]
+                         for loop in range(loops - 1))
+        # The pin read on its own.
+        reads = [0] * loops
+        for loop in range(loops):
+            now = clock()
+            gpio.input(pin)
+            reads[loop] = clock() - now
+        reads.sort()
+        self.period = median(periods)
+        read = median(reads)
+        self.offset = int(read // 2)
+        # A pin read samples somewhere within the read, uniformly.
+        self.spread = read / sqrt(12)
+        self.limit = self._reject * self.resolution
+
+    """
+    Time one echo pulse. Call straight after the trigger pulse, with
+    the time.monotonic() time of the trigger when it is known, so an
+    echo that rose before timing started is bracketed from the trigger.
+    Returns the echo period in seconds, True on a timeout, the
+    uncertainty of the echo period in seconds, the delay from the start
+    of the call to the rising edge in seconds, 0 if the echo never rose,
+    and the number of pin reads taken.
+    """
+    def measure(self, echoTimeout, triggerTimeout, triggerTime = None):
+        gpio = self._echo._gpio
+        pin = self._echo._echo_pin
+        clock = perf_counter_ns
+        polls = 0
+        start = before = clock()
+
+        # Rising edge: after the stamp of the last low sample and before
+        # the stamp taken once the first high sample has been read.
+        limit = start + int(triggerTimeout * 1e9)
+        while True:
+            now = clock()
+            if gpio.input(pin) == 1:
+                break
+            polls += 1
+            before = now
+            if now > limit:
+                return 0, True, 0.0, 0.0, polls
+        riseBefore, riseAfter = before, clock()
+        if polls == 0 and triggerTime is not None:
+            # High on the first sample, so the edge came at some point
+            # since the trigger, after a preemption. The wide bracket
+            # keeps the reading out of averages.
+            riseBefore = riseAfter - int((monotonic() - triggerTime) * 1e9)
+
+        # Falling edge, the same way. A timeout here still reports the
+        # rise, which tells it apart from a sensor that never answered.
+        limit = start + int(echoTimeout * 1e9)
+        before = riseAfter
+        while True:
+            now = clock()
+            if gpio.input(pin) == 0:
+                break
+            polls += 1
+            before = now
+            if now > limit:
+                rise = (riseBefore + riseAfter) / 2 - start
+                return 0, True, 0.0, rise / 1e9, polls
+        fallBefore, fallAfter = before, clock()
+
+        # Bracket middles, doubled to stay in integers. Each bracket
+        # holds a pin read at both ends, so the edge is within the
+        # bracket less one read, which is taken off the uncertainty.
+        width2 = fallBefore + fallAfter - riseBefore - riseAfter
+        read = 2 * self.offset
+        riseGap = max(riseAfter - riseBefore - read, 0)
+        fallGap = max(fallAfter - fallBefore - read, 0)
+        variance = (riseGap * riseGap + fallGap * fallGap) / 12 + \
+            2 * self.spread * self.spread
+        rise = (riseBefore + riseAfter) / 2 - start
+        return width2 / 2e9, False, sqrt(variance) / 1e9, rise / 1e9, polls
+
+    """
+    Best case uncertainty of an echo period in seconds, when neither
+    edge is delayed by preemption.
+    """
+    @property
+    def resolution(self):
+        return sqrt(2 * self.period * self.period / 12 +
+                    2 * self.spread * self.spread) / 1e9
@@ -0,0 +1,70 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from array import array
+from collections import namedtuple
+
+"""
+Result of one read. distance is in the unit asked for and 0 on a
+failed read, echo_time the raw echo period in seconds, status the
+error code of the read, timestamp the time.monotonic() trigger time,
+samples the number of good readings the distance is made from and
+uncertainty the standard deviation of the distance when it is known
+(see Echo.precise_timing), otherwise None.
+"""
+Reading = namedtuple('Reading',
+                     'distance echo_time status timestamp samples uncertainty',
+                     defaults=(None,))
+
+"""
+Column oriented store of many readings for bulk APIs and logging.
+Each field is kept in its own array, so appending a reading allocates
+no objects. Index it to get a Reading back.
+"""
+class ReadingColumns(object):
+    __slots__ = ('distance', 'echo_time', 'status', 'timestamp', 'samples')
+
+    def __init__(self):
+        self.distance = array('d')
+        self.echo_time = array('d')
+        self.status = array('b')
+        self.timestamp = array('d')
+        self.samples = array('H')
+
+    def append(self, distance, echoTime, status, timestamp, samples = 1):
+        self.distance.append(distance)
+        self.echo_time.append(echoTime)
+        self.status.append(status)
+        self.timestamp.append(timestamp)
+        self.samples.append(samples)
+
+    def __len__(self):
+        return len(self.status)
+
+    def __getitem__(self, index):
+        return Reading(self.distance[index], self.echo_time[index],
+                       self.status[index], self.timestamp[index],
+                       self.samples[index])
+
+    def __iter__(self):
+        for index in range(len(self.status)):
+            yield self[index]
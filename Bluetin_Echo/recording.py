@@ -0,0 +1,298 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+
+"""
+Binary recording and replay of raw sensor readings.
+
+A Recorder hooks into one or more Echo sensors and appends every raw
+reading to a file as a fixed size record, so a recording is a small
+fraction of the size of printed text and costs one struct pack per
+reading. A Recording maps the file into memory and reads records in
+place. A ReplayBackend plays a recording back through the normal Echo
+API, so field data can be re-run through filters and readers without
+the hardware.
+
+File layout, all little endian:
+
+    header   8s magic b'BECHOREC', H version, H channels,
+             d wall clock time the recording started
+    channel  H trigger pin, H echo pin, d speed of sound, per channel
+    record   d seconds since the start, f echo time in seconds,
+             H channel, b status, 1 pad byte
+
+Records are 16 bytes and start straight after the channel table, so
+the file can also be opened with numpy.memmap and a matching dtype.
+"""
+
+import mmap
+import struct
+from threading import Lock
+from time import monotonic, sleep, time
+
+from .Bluetin_Echo import NOT_READY
+from .backends import SimulatedBackend
+from .readings import ReadingColumns
+from .units import echo_factor
+
+MAGIC = b'BECHOREC'
+VERSION = 1
+HEADER = struct.Struct('<8sHHd')
+CHANNEL = struct.Struct('<HHd')
+RECORD = struct.Struct('<dfHbx')
+
+"""
+Record every reading of the given sensors to path. sensors is an Echo,
+a list of them or an EchoArray; the channel of a record is the index of
+its sensor. Recording starts at once and stops on close(). Records are
+written through a buffer of buffer_size bytes.
+"""
+class Recorder(object):
+    def __init__(self, path, sensors, buffer_size = 65536):
+        if hasattr(sensors, '_record'):
+            sensors = [sensors]
+        self._sensors = list(getattr(sensors, 'sensors', sensors))
+        self._file = open(path, 'wb', buffering=buffer_size)
+        self._lock = Lock()
+        self._start = monotonic()
+        self._count = 0
+        self._file.write(HEADER.pack(MAGIC, VERSION, len(self._sensors),
+                                     time()))
+        for sensor in self._sensors:
+            self._file.write(CHANNEL.pack(sensor._trigger_pin,
+                                          sensor._echo_pin, sensor.speed))
+        self._hooks = []
+        for channel, sensor in enumerate(self._sensors):
+            hook = self._hook(channel)
+            sensor.add_hook(hook)
+            self._hooks.append((sensor, hook))
+
+    def _hook(self, channel):
+        def record(echo, echoTime, errorCode):
+            self.write(channel, echoTime, errorCode, echo._last_read_time)
+        return record
+
+    """
+    Append one record. Readings from hooked sensors arrive here on
+    their own; call it directly to record readings taken elsewhere.
+    """
+    def write(self, channel, echoTime, status, timestamp = None):
+        if timestamp is None:
+            timestamp = monotonic()
+        data = RECORD.pack(timestamp - self._start, echoTime, channel, status)
+        with self._lock:
+            self._file.write(data)
+            self._count += 1
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+    """
+    Unhook the sensors and close the file.
+    """
+    def close(self):
+        for sensor, hook in self._hooks:
+            sensor.remove_hook(hook)
+        self._hooks = []
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    """
+    Number of records written.
+    """
+    @property
+    def count(self):
+        return self._count
+
+
+"""
+Recording file mapped into memory. Index it or iterate over it for
+(timestamp, echo time, channel, status) records.
+"""
+class Recording(object):
+    def __init__(self, path):
+        with open(path, 'rb') as recordFile:
+            self._map = mmap.mmap(recordFile.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        magic, version, channels, self.started = HEADER.unpack_from(
+            self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            self._map.close()
+            raise RuntimeError("Not A Recording: {}".format(path))
+        self.channels = [CHANNEL.unpack_from(self._map,
+                                             HEADER.size + CHANNEL.size * i)
+                         for i in range(channels)]
+        self._offset = HEADER.size + CHANNEL.size * channels
+        # A recording cut short may end in part of a record.
+        self._count = (len(self._map) - self._offset) // RECORD.size
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        return RECORD.unpack_from(self._map,
+                                  self._offset + index * RECORD.size)
+
+    def __iter__(self):
+        end = self._offset + self._count * RECORD.size
+        return RECORD.iter_unpack(memoryview(self._map)[self._offset:end])
+
+    """
+    The records of one channel as a readings.ReadingColumns, with
+    distances in unit at the recorded speed of sound. Timestamps are
+    seconds since the start of the recording.
+    """
+    def columns(self, channel = 0, unit = 'cm'):
+        factor = echo_factor(self.channels[channel][2], unit)
+        columns = ReadingColumns()
+        for timestamp, echoTime, recordChannel, status in self:
+            if recordChannel == channel:
+                columns.append(echoTime * factor, echoTime, status,
+                               timestamp, 1 if echoTime > 0 else 0)
+        return columns
+
+    """
+    Duration of the recording in seconds.
+    """
+    @property
+    def duration(self):
+        if self._count == 0:
+            return 0.0
+        return self[-1][0]
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+"""
+Plays the recorded readings of one channel back as echo pulses. Reads
+that were not taken (Not Ready) are skipped and failed reads play the
+long no-echo pulse. After the last record, the recording starts again
+with loop set, otherwise every ping gets no echo.
+"""
+class RecordedSensor(object):
+    def __init__(self, records, loop = False, latency = 0.00045,
+                 no_echo_pulse = 0.038):
+        self._records = records # [(timestamp, echo time)]
+        self.loop = loop
+        self.latency = latency
+        self.no_echo_pulse = no_echo_pulse
+        self.position = 0
+        self.fault = None # Recorded sensors never break, see SimulatedSensor
+
+    """
+    Time of the next record since the start of the recording, or None
+    at the end.
+    """
+    def next_time(self):
+        if self.position >= len(self._records):
+            if not self.loop or not self._records:
+                return None
+            self.position = 0
+        return self._records[self.position][0]
+
+    def ping(self, t):
+        if self.next_time() is None:
+            return self.latency, self.no_echo_pulse
+        echoTime = self._records[self.position][1]
+        self.position += 1
+        if echoTime > 0:
+            return self.latency, echoTime
+        return self.latency, self.no_echo_pulse
+
+    @property
+    def finished(self):
+        return self.next_time() is None
+
+
+"""
+Backend that replays a recording through Echo. Each channel is played
+on the trigger pin it was recorded on, or on the trigger pins given in
+pins, in channel order. With speed set, pings are held back until the
+recorded time of their reading, scaled by speed, has come, so readings
+arrive at the recorded rate (speed 1.0) or a multiple of it. With speed
+None readings are played as fast as the sensors are read; set the rest
+of the Echo instances low to go faster.
+"""
+class ReplayBackend(SimulatedBackend):
+    name = 'replay'
+
+    def __init__(self, recording, speed = None, loop = False, pins = None):
+        if not isinstance(recording, Recording):
+            recording = Recording(recording)
+        records = [[] for channel in recording.channels]
+        for timestamp, echoTime, channel, status in recording:
+            if status != NOT_READY: # Never triggered the sensor
+                records[channel].append((timestamp, echoTime))
+        if pins is None:
+            pins = [channel[0] for channel in recording.channels]
+        sensors = dict((pin, RecordedSensor(channelRecords, loop))
+                       for pin, channelRecords in zip(pins, records))
+        SimulatedBackend.__init__(self, sensors)
+        self.recording = recording
+        self.speed = speed
+        self._replayStart = None
+        self._warming = set()
+
+    def setup(self, trigger_pin, echo_pin):
+        SimulatedBackend.setup(self, trigger_pin, echo_pin)
+        # Echo sends a warm up pulse that was never recorded.
+        self._warming.add(trigger_pin)
+
+    def output(self, pin, value):
+        if not value and self._levels.get(pin) == 1 and \
+                pin in self._warming:
+            self._warming.discard(pin)
+            self._levels[pin] = 0
+            return
+        if self.speed and not value and self._levels.get(pin) == 1 and \
+                pin in self._sensors:
+            due = self._sensors[pin].next_time()
+            if due is not None:
+                if self._replayStart is None:
+                    self._replayStart = monotonic() - due / self.speed
+                wait = self._replayStart + due / self.speed - monotonic()
+                if wait > 0:
+                    sleep(wait)
+        SimulatedBackend.output(self, pin, value)
+
+    @property
+    def finished(self):
+        return all(sensor.finished for sensor in self._sensors.values())
@@ -0,0 +1,213 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+"""
+Sensor service. Runs sensor acquisition in its own process and
+publishes the latest reading of every sensor in a shared memory table.
+Any number of local processes can attach to the table by name and read
+it directly, with no copies of the table and no round trip to the
+service. Start one service per core to spread a large fleet.
+
+    service = SensorService([(16, 12), (26, 19)])
+    service.start()
+    table = SharedReadings(service.name)
+    print(table.distances())
+
+Table layout: a header of magic, sensor count and frame counter, then
+one slot per sensor. Each slot is guarded by a sequence counter that is
+odd while the slot is being written, so readers retry instead of
+seeing half a reading.
+"""
+
+import multiprocessing
+import struct
+from time import sleep
+from multiprocessing import shared_memory
+
+from .readings import Reading
+
+MAGIC = b'BEcho1\x00\x00'
+HEADER = struct.Struct('<8sIIQ') # magic, sensors, unused, frames
+# Slot: sequence, distance, echo time, timestamp, status, samples.
+SLOT = struct.Struct('<QdddiI')
+
+# Tables created by services in this process.
+_owned = set()
+
+"""
+Process entry point. backend is a backend name or a picklable function
+returning a backend instance.
+"""
+def _serve(name, specs, backend, crosstalk, unit, running):
+    from .Bluetin_Echo import Echo
+    from .echo_array import EchoArray
+
+    if callable(backend):
+        backend = backend()
+    table = shared_memory.SharedMemory(name=name)
+    try:
+        sensors = [Echo(spec[0], spec[1], *spec[2:], backend=backend)
+                   for spec in specs]
+        array = EchoArray(sensors, crosstalk)
+        buffer = table.buf
+        frames = 0
+        sequences = [0] * len(sensors)
+        while running.is_set():
+            frame = array.read_frame(unit, record=True)
+            for index in range(len(frame)):
+                offset = HEADER.size + index * SLOT.size
+                sequence = sequences[index] + 1
+                struct.pack_into('<Q', buffer, offset, sequence)
+                SLOT.pack_into(buffer, offset, sequence,
+                               frame.distance[index], frame.echo_time[index],
+                               frame.timestamp[index], frame.status[index],
+                               frame.samples[index])
+                sequences[index] = sequence + 1
+                struct.pack_into('<Q', buffer, offset, sequence + 1)
+            frames += 1
+            HEADER.pack_into(buffer, 0, MAGIC, len(sensors), 0, frames)
+        array.stop()
+    finally:
+        buffer = None
+        table.close()
+
+
+"""
+Runs a set of sensors in a separate process. sensors is a list of
+(trigger_pin, echo_pin) tuples; any further items are passed on to
+Echo after the pins. backend is a backend name, or a picklable function
+that builds the backend inside the service process, and crosstalk is
+passed to EchoArray.
+"""
+class SensorService(object):
+    def __init__(self, sensors, backend = None, crosstalk = None,
+                 unit = 'cm', name = None):
+        self._specs = [tuple(spec) for spec in sensors]
+        self._backend = backend
+        self._crosstalk = crosstalk
+        self._unit = unit
+        size = HEADER.size + SLOT.size * len(self._specs)
+        self._table = shared_memory.SharedMemory(name=name, create=True,
+                                                 size=size)
+        self._table.buf[:size] = bytes(size)
+        _owned.add(self._table.name)
+        HEADER.pack_into(self._table.buf, 0, MAGIC, len(self._specs), 0, 0)
+        self._running = multiprocessing.Event()
+        self._process = None
+
+    def start(self):
+        if self._process is None:
+            self._running.set()
+            self._process = multiprocessing.Process(
+                target=_serve,
+                args=(self._table.name, self._specs, self._backend,
+                      self._crosstalk, self._unit, self._running))
+            self._process.daemon = True
+            self._process.start()
+
+    """
+    Stop the service process. The shared table is removed as well
+    unless keep is set.
+    """
+    def stop(self, keep = False):
+        if self._process is not None:
+            self._running.clear()
+            self._process.join()
+            self._process = None
+        if not keep and self._table is not None:
+            _owned.discard(self._table.name)
+            self._table.close()
+            self._table.unlink()
+            self._table = None
+
+    """
+    Name of the shared memory table, for SharedReadings.
+    """
+    @property
+    def name(self):
+        return self._table.name
+
+    @property
+    def running(self):
+        return self._process is not None and self._process.is_alive()
+
+    def readings(self):
+        return SharedReadings(self.name)
+
+
+"""
+Read only view of a SensorService table, for use in any local process.
+"""
+class SharedReadings(object):
+    def __init__(self, name):
+        self._table = shared_memory.SharedMemory(name=name)
+        if self._table.name not in _owned:
+            try:
+                # Only the service may remove the table. Its own process
+                # must stay registered, for the unlink in stop().
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(self._table._name,
+                                            'shared_memory')
+            except Exception:
+                pass
+        magic, self._count, unused, frames = HEADER.unpack_from(
+            self._table.buf, 0)
+        if magic != MAGIC:
+            raise RuntimeError("Not A Sensor Service Table: {}".format(name))
+
+    """
+    Latest Reading of one sensor, or None before its first reading.
+    """
+    def read(self, index):
+        if not 0 <= index < self._count:
+            raise IndexError(index)
+        buffer = self._table.buf
+        offset = HEADER.size + index * SLOT.size
+        while True:
+            values = SLOT.unpack_from(buffer, offset)
+            if values[0] % 2 == 0 and \
+                    struct.unpack_from('<Q', buffer, offset)[0] == values[0]:
+                break
+            sleep(0)
+        if values[0] == 0:
+            return None
+        return Reading(values[1], values[2], values[4], values[3], values[5])
+
+    def frame(self):
+        return [self.read(index) for index in range(self._count)]
+
+    def distances(self):
+        return [reading.distance if reading else 0
+                for reading in self.frame()]
+
+    """
+    Number of frames the service has published.
+    """
+    @property
+    def frames(self):
+        return HEADER.unpack_from(self._table.buf, 0)[3]
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        self._table.close()
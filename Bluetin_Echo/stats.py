@@ -0,0 +1,110 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from collections import namedtuple
+from math import sqrt
+
+"""
+Summary of a batch of sensor samples. good is the number of good
+readings the statistics are made from, samples the number of sensor
+reads taken.
+"""
+SampleStats = namedtuple('SampleStats',
+                         'mean median trimmed_mean stddev good samples')
+
+"""
+Running mean and variance (Welford's method), so a batch can be
+checked for stability after every sample at constant cost.
+"""
+class RunningStats(object):
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    @property
+    def stddev(self):
+        if self.count < 2:
+            return 0.0
+        return sqrt(self._m2 / (self.count - 1))
+
+    """
+    Standard error of the mean relative to the mean.
+    """
+    @property
+    def relative_error(self):
+        if self.count < 2 or self.mean == 0:
+            return float('inf')
+        return self.stddev / sqrt(self.count) / abs(self.mean)
+
+"""
+Median of an already sorted sequence.
+"""
+def median(ordered):
+    count = len(ordered)
+    if count == 0:
+        return 0.0
+    middle = count // 2
+    if count % 2:
+        return ordered[middle]
+    return (ordered[middle - 1] + ordered[middle]) / 2
+
+"""
+Mean after dropping the given fraction of values from each end of an
+already sorted sequence.
+"""
+def trimmed_mean(ordered, trim = 0.1):
+    count = len(ordered)
+    if count == 0:
+        return 0.0
+    cut = int(count * trim)
+    if count - 2 * cut < 1:
+        cut = (count - 1) // 2
+    kept = ordered[cut:count - cut]
+    return sum(kept) / len(kept)
+
+"""
+Summarise a buffer of good readings, such as the array('d') filled by
+Echo.batch(). samples defaults to the number of values.
+"""
+def summarize(values, trim = 0.1, samples = None):
+    ordered = sorted(values)
+    count = len(ordered)
+    if samples is None:
+        samples = count
+    if count == 0:
+        return SampleStats(0, 0, 0, 0, 0, samples)
+
+    mean = sum(ordered) / count
+    if count > 1:
+        stddev = sqrt(sum((value - mean) ** 2 for value in ordered)
+                      / (count - 1))
+    else:
+        stddev = 0.0
+    return SampleStats(mean, median(ordered), trimmed_mean(ordered, trim),
+                       stddev, count, samples)
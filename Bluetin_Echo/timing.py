@@ -0,0 +1,102 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from collections import deque
+
+from .Bluetin_Echo import GOOD, OUT_OF_RANGE
+
+"""
+Adaptive timing for one Echo sensor. The echo timeout is shrunk to a
+margin above the longest echo seen in the last few good readings, and
+the rest period to a multiple of that timeout, long enough for the
+ringing of the last ping to die away. Neither goes above the values
+set on the sensor. An out of range reading puts the full rest back, as
+the sensor may still be sending its no echo pulse, and after a streak
+of them the timeout is doubled, back towards the sensor setting, so a
+target that moves away is found again.
+
+The adjusted values are written straight to the sensor, so the read
+paths need no extra work when adaptive timing is on.
+"""
+class AdaptiveTiming(object):
+    def __init__(self, echo, margin = 1.5, window = 8, ring_factor = 3.0,
+                 min_rest = 0.01, backoff = 2):
+        self._echo = echo
+        self._margin = margin
+        self._ringFactor = ring_factor
+        self._minRest = min_rest
+        self._backoff = backoff
+        self._recent = deque(maxlen=window)
+        self._misses = 0
+        self._restNow = None # Values last written to the sensor
+        self._timeoutNow = None
+        self.rebase()
+
+    """
+    Take any sensor setting changed since the last update as the new
+    upper limit and start adapting again from the limits. Called when
+    the rest, echo timeout, speed or max distance settings change.
+    """
+    def rebase(self):
+        echo = self._echo
+        if echo._sensor_rest != self._restNow:
+            self.rest = echo._sensor_rest
+        if echo._maxDistanceTime != self._timeoutNow:
+            self.echo_timeout = echo._maxDistanceTime
+        self.restore()
+        self._recent.clear()
+        self._misses = 0
+
+    """
+    Put the sensor back to its own settings.
+    """
+    def restore(self):
+        self._apply(self.rest, self.echo_timeout)
+
+    def _apply(self, rest, timeout):
+        self._echo._sensor_rest = self._restNow = rest
+        self._echo._maxDistanceTime = self._timeoutNow = timeout
+
+    def update(self, echoTime, errorCode):
+        echo = self._echo
+        if errorCode == GOOD:
+            self._misses = 0
+            self._recent.append(echoTime)
+            timeout = min(self.echo_timeout, max(self._recent) * self._margin)
+        elif errorCode == OUT_OF_RANGE:
+            # The sensor may still be sending its long no echo pulse,
+            # so rest in full before the next trigger.
+            self._misses += 1
+            if self._misses < self._backoff:
+                self._apply(self.rest, echo._maxDistanceTime)
+                return
+            # Back off towards the sensor settings.
+            self._misses = 0
+            self._recent.clear()
+            self._apply(self.rest,
+                        min(self.echo_timeout, echo._maxDistanceTime * 2))
+            return
+        else:
+            return
+
+        rest = (timeout + echo._maxDistTimeOffset) * self._ringFactor
+        self._apply(min(self.rest, max(self._minRest, rest)), timeout)
@@ -0,0 +1,70 @@
+# Copyright (c) 2018 Mark A Heywood
+# Author: Mark A Heywood
+# https://www.bluetin.io/
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+
+from array import array
+
+"""
+Units of measure, as the number of units in one metre. Every unit
+lookup in the library goes through this table.
+"""
+UNITS = {
+    'mm': 1000,
+    'cm': 100,
+    'm': 1,
+    'inch': 39.3701,
+}
+
+"""
+Add a unit of measure, for example register_unit('ft', 3.28084).
+An existing unit cannot be given a different size.
+"""
+def register_unit(name, per_metre):
+    if per_metre <= 0:
+        raise RuntimeError("Unit Size Must Be Positive")
+    if UNITS.get(name, per_metre) != per_metre:
+        raise RuntimeError("Unit Already Registered: {}".format(name))
+    UNITS[name] = per_metre
+
+"""
+Number of units in one metre.
+"""
+def unit_scale(unit):
+    try:
+        return UNITS[unit]
+    except KeyError:
+        raise RuntimeError("Incorrect Unit: {}".format(unit))
+
+"""
+Multiplier that turns an echo time in seconds into a distance in the
+given unit, at the given speed of sound in m/s.
+"""
+def echo_factor(speed, unit):
+    return speed * unit_scale(unit) / 2
+
+"""
+Convert a whole buffer of echo times to distances in one pass. Failed
+readings (echo time 0) stay 0. Returns an array('d').
+"""
+def to_distances(echoTimes, speed, unit = 'cm'):
+    factor = echo_factor(speed, unit)
+    return array('d', [value * factor if value > 0 else 0.0
+                       for value in echoTimes])
@@ -0,0 +1,42 @@
+"""File: bench_adaptive.py"""
+# Measurement rate with fixed and adaptive timing on a simulated
+# sensor. The target sits at 30cm, then jumps out to 2m.
+from time import monotonic
+
+from Bluetin_Echo import Echo
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+
+READINGS = 60
+
+
+def rate(echo, readings = READINGS):
+    start = monotonic()
+    echoTimes, taken, status = echo._collect(readings)
+    return taken / (monotonic() - start), len(echoTimes)
+
+
+def main():
+    backend = SimulatedBackend()
+    sensor = backend.attach(17, SimulatedSensor(distance=0.3, noise=0.002,
+                                                seed=1))
+    echo = Echo(17, 18, backend=backend)
+
+    fixed, good = rate(echo)
+    print('Fixed timing:    {:6.1f} readings/s ({} good)'.format(fixed, good))
+
+    echo.adaptive_timing()
+    adaptive, good = rate(echo)
+    print('Adaptive timing: {:6.1f} readings/s ({} good), '
+          'effective rate {:.1f}/s'.format(adaptive, good,
+                                           echo.effective_rate))
+
+    sensor.distance = 2.0
+    far, good = rate(echo, 20)
+    print('Target at 2m:    {:6.1f} readings/s ({} good), '
+          'echo timeout {:.4f}s'.format(far, good,
+                                        echo.effective_echo_timeout))
+    echo.stop()
+
+
+if __name__ == '__main__':
+    main()
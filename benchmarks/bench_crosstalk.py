@@ -0,0 +1,70 @@
+"""File: bench_crosstalk.py"""
+# Crosstalk on a simulated row of four edge capture sensors whose
+# pings leak to their neighbours off the target. Compares firing every
+# sensor at once, firing with jitter and crosstalk rejection, and
+# keeping neighbours apart with a crosstalk map.
+from Bluetin_Echo import Echo, EchoArray, CROSSTALK, GOOD
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+
+DISTANCES = [1.0, 1.3, 0.8, 1.1] # metres
+FRAMES = 150
+TOLERANCE = 2.0 # cm
+
+
+def build(probability = 0.5):
+    backend = SimulatedBackend(seed=1)
+    pins = []
+    for index, distance in enumerate(DISTANCES):
+        trigger = 2 + index * 2
+        backend.attach(trigger, SimulatedSensor(distance, noise=0.002,
+                                                seed=index))
+        pins.append(trigger)
+    for index in range(len(pins) - 1):
+        path = DISTANCES[index] + DISTANCES[index + 1]
+        backend.leak(pins[index], pins[index + 1], path, probability)
+        backend.leak(pins[index + 1], pins[index], path, probability)
+    sensors = [Echo(pin, pin + 1, capture='edge', backend=backend)
+               for pin in pins]
+    for sensor in sensors:
+        sensor.rest = 0.02
+    return backend, sensors, pins
+
+
+def run(name, options, reject = False):
+    backend, sensors, pins = build()
+    array = EchoArray(sensors, **options)
+    if reject:
+        array.reject_crosstalk()
+    wrong = leaked = caught = dropped = 0
+    for frame in range(FRAMES):
+        distances = array.read_frame('cm')
+        for index, pin in enumerate(pins):
+            status = array.error_codes[index]
+            hit = backend.leaked(pin)
+            leaked += hit
+            if status == CROSSTALK:
+                caught += hit
+                dropped += not hit
+            elif status == GOOD and \
+                    abs(distances[index] - DISTANCES[index] * 100) > TOLERANCE:
+                wrong += 1
+    readings = FRAMES * len(pins)
+    print('{:26} {:5.1f} fps  wrong {:5.1%}  leaked {:4}  caught {:4}  '
+          'good dropped {:4}'.format(name, array.fps, wrong / readings,
+                                     leaked, caught, dropped))
+    array.stop()
+
+
+def main():
+    run('All at once', {'gap': 0})
+    run('Jitter + rejection', {'gap': 0, 'jitter': 0.002, 'seed': 1},
+        reject=True)
+    run('Coded jitter + rejection', {'gap': 0, 'jitter': [
+        (0.0, 0.0015, 0.0005, 0.002), (0.002, 0.0, 0.0015, 0.0005),
+        (0.0005, 0.002, 0.0, 0.0015), (0.0015, 0.0005, 0.002, 0.0)]},
+        reject=True)
+    run('Crosstalk map', {'crosstalk': {0: [1], 1: [2], 2: [3]}})
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""File: bench_health.py"""
+# Frame rate of a simulated four sensor array with one dead sensor,
+# with and without the health watchdog, against an array with every
+# sensor healthy. A dead sensor never raises its echo pin, so without
+# the watchdog every frame waits out its trigger timeout.
+from Bluetin_Echo import Echo, EchoArray
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+
+SENSORS = 4
+FRAMES = 100
+
+
+def run(name, fault = None, watchdog = False):
+    backend = SimulatedBackend(seed=1)
+    sensors = []
+    for index in range(SENSORS):
+        trigger = 2 + index * 2
+        backend.attach(trigger, SimulatedSensor(
+            0.5 + 0.2 * index, seed=index,
+            fault=fault if index == 1 else None))
+        sensor = Echo(trigger, trigger + 1, backend=backend)
+        sensor.rest = 0.01
+        sensor.max_distance(1.5, 'm')
+        if watchdog:
+            sensor.watchdog(backoff=1.0, max_backoff=30.0)
+        sensors.append(sensor)
+    array = EchoArray(sensors, gap=0)
+    for frame in range(FRAMES):
+        array.read_frame('cm')
+    health = sensors[1].health
+    state = '{} ({}), {} probes'.format(health.state, health.fault,
+                                        health.probes) if health else ''
+    print('{:28} {:6.1f} fps  {}'.format(name, array.fps, state))
+    array.stop()
+
+
+def main():
+    run('All healthy')
+    run('Dead sensor', 'dead')
+    run('Dead sensor + watchdog', 'dead', True)
+    run('Stuck high + watchdog', 'stuck_high', True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""File: bench_mapping.py"""
+# Mapping throughput on simulated sensor rings. Frames are read once
+# from the simulated array, then converted to points and folded into an
+# occupancy grid as fast as possible, so the figures are the mapping
+# cost alone, in frames per second.
+from math import cos, radians
+from time import perf_counter
+
+from Bluetin_Echo import Echo, EchoArray, OccupancyGrid, SensorPose
+from Bluetin_Echo import mapping
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+
+FRAMES = 200
+REPEAT = 3
+
+
+def ring(count):
+    backend = SimulatedBackend(seed=1)
+    sensors = []
+    poses = []
+    for index in range(count):
+        heading = 360.0 * index / count
+        trigger = 2 + index * 2
+        # A sensor ring in a room, walls 0.5 m to 2 m away.
+        distance = 0.5 + 1.5 * abs(cos(radians(heading)))
+        backend.attach(trigger, SimulatedSensor(distance, noise=0.005,
+                                                seed=index))
+        sensor = Echo(trigger, trigger + 1, backend=backend)
+        sensor.rest = 0
+        sensors.append(sensor)
+        poses.append(SensorPose(0.1 * cos(radians(heading)),
+                                0.1 * cos(radians(heading - 90)), heading))
+    return EchoArray(sensors, gap=0), poses
+
+
+def rate(work, frames):
+    best = None
+    for repeat in range(REPEAT):
+        start = perf_counter()
+        for frame in frames:
+            work(frame)
+        elapsed = perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(frames) / best
+
+
+def main():
+    print('numpy: {}'.format('yes' if mapping.numpy is not None else 'no'))
+    for count in (4, 8, 16):
+        array, poses = ring(count)
+        frames = [array.read_frame('m') for frame in range(FRAMES)]
+        array.stop()
+
+        projector = mapping.Projector(poses)
+        grid = OccupancyGrid(100, 100, 0.05, origin=(-2.5, -2.5))
+        points = rate(projector.points, frames)
+        mapper = mapping.ArrayMapper(poses, grid)
+        gridRate = rate(mapper.update, frames)
+        grid.settle()
+        occupied = len(grid.occupied()[0])
+        print('{:2} sensors  points {:9.0f} fps  points + grid {:7.0f} fps  '
+              '({} occupied cells)'.format(count, points, gridRate, occupied))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""File: bench_multi_sensor.py"""
+# Compare reading eight simulated sensors one after another with
+# reading them as an EchoArray. Runs on any machine.
+from time import monotonic
+
+from Bluetin_Echo import Echo, EchoArray
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+
+SENSORS = 8
+FRAMES = 10
+
+
+def build():
+    backend = SimulatedBackend()
+    sensors = []
+    for index in range(SENSORS):
+        trigger, echo = 2 * index + 2, 2 * index + 3
+        backend.attach(trigger, SimulatedSensor(distance=0.3 + 0.2 * index,
+                                                noise=0.002, seed=index))
+        sensors.append(Echo(trigger, echo, backend=backend))
+    return sensors
+
+
+def main():
+    sensors = build()
+
+    start = monotonic()
+    for frame in range(FRAMES):
+        for sensor in sensors:
+            sensor.read('cm', 3)
+    sequential = FRAMES / (monotonic() - start)
+
+    # Neighbouring sensors interfere, so alternate sensors fire together.
+    crosstalk = dict((i, [i - 1, i + 1][:1 if i == SENSORS - 1 else 2])
+                     for i in range(SENSORS))
+    array = EchoArray(sensors, crosstalk)
+    start = monotonic()
+    for frame in array.frames(FRAMES):
+        pass
+    concurrent = FRAMES / (monotonic() - start)
+
+    print('Sequential read(cm, 3): {:.2f} frames/s'.format(sequential))
+    print('EchoArray groups {}: {:.2f} frames/s (last {:.2f})'.format(
+        array.groups, concurrent, array.fps))
+    print('Last frame: {}'.format([round(d, 1) for d in array.frame]))
+    array.stop()
+
+
+if __name__ == '__main__':
+    main()
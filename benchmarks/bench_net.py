@@ -0,0 +1,86 @@
+"""File: bench_net.py"""
+# Frame streaming over loopback. A FrameServer reads a simulated four
+# sensor array and a FrameClient in the same process receives the
+# frames, over TCP, UDP and a Unix socket, sending every frame on its
+# own and in batches of eight. Latency is from the end of a frame read
+# to its arrival at the client.
+import json
+import os
+import tempfile
+from time import sleep, time
+
+from Bluetin_Echo import Echo, EchoArray, FrameClient, FrameServer
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+from Bluetin_Echo.net import frame_size, HEADER
+
+SENSORS = 4
+FRAMES = 400
+
+
+def build():
+    backend = SimulatedBackend(seed=1)
+    sensors = []
+    for index in range(SENSORS):
+        trigger = 2 + index * 2
+        backend.attach(trigger, SimulatedSensor(0.3 + 0.1 * index,
+                                                seed=index))
+        sensor = Echo(trigger, trigger + 1, backend=backend)
+        sensor.rest = 0.001
+        sensor.max_distance(1, 'm')
+        sensors.append(sensor)
+    return EchoArray(sensors, gap=0)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def run(transport, batch):
+    array = build()
+    if transport == 'unix':
+        address = os.path.join(tempfile.mkdtemp(), 'echo.sock')
+    else:
+        address = ('127.0.0.1', 0)
+    server = FrameServer(array, address, transport, batch)
+    address = server.address
+    if transport != 'unix':
+        address = ('127.0.0.1', address[1])
+    server.start()
+    client = FrameClient(address, transport)
+    while server.clients == 0:
+        sleep(0.001)
+
+    latencies = []
+    start = None
+    for frame in client.frames(FRAMES):
+        now = time()
+        if start is None:
+            start = now
+            first = frame.sequence
+        latencies.append(now - frame.timestamp)
+    elapsed = now - start
+    server.stop()
+    client.close()
+    array.stop()
+    print('{:4} batch {}  {:6.0f} fps  latency p50 {:6.2f} ms  '
+          'p99 {:6.2f} ms  lost {}'.format(
+              transport, batch, (frame.sequence - first) / elapsed,
+              1000 * percentile(latencies, 0.5),
+              1000 * percentile(latencies, 0.99), client.lost))
+
+
+def main():
+    reading = {'distance': 123.45, 'status': 0, 'timestamp': time()}
+    print('Bytes per {} sensor frame: {} binary, {} batched by 8, '
+          '{} as one JSON document per reading'.format(
+              SENSORS, HEADER.size + frame_size(SENSORS),
+              (HEADER.size + 8 * frame_size(SENSORS)) // 8,
+              SENSORS * len(json.dumps(reading))))
+    for transport in ('tcp', 'udp', 'unix'):
+        for batch in (1, 8):
+            run(transport, batch)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""File: bench_precision.py"""
+# Accuracy of the default poll loop against precision timing, on a
+# simulated sensor with a known, noiseless pulse width. Errors are in
+# mm of distance. Averaged reads show how precision timing leaves out
+# preempted readings instead of averaging them in.
+from Bluetin_Echo import Echo, GOOD
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+
+READINGS = 200
+AVERAGES = 40
+SAMPLES = 5
+DISTANCE = 1000.0 # mm
+
+
+def percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def run(echo, readings, samples):
+    errors = []
+    covered = 0
+    for reading in range(readings):
+        echo.wait_until_ready()
+        result = echo.read('mm', samples, record=True)
+        if result.status != GOOD:
+            continue
+        error = abs(result.distance - DISTANCE)
+        errors.append(error)
+        if result.uncertainty is not None and \
+                error <= 2 * result.uncertainty:
+            covered += 1
+    return sorted(errors), covered
+
+
+def report(name, echo, readings, samples = 1):
+    errors, covered = run(echo, readings, samples)
+    line = '{:22} error p50 {:7.3f}mm  p90 {:7.3f}mm  max {:8.3f}mm'.format(
+        name, percentile(errors, 0.5), percentile(errors, 0.9), errors[-1])
+    if echo._precise is not None:
+        line += '  within 2 sigma {:.0%}'.format(covered / len(errors))
+    print(line)
+
+
+def main():
+    backend = SimulatedBackend()
+    backend.attach(17, SimulatedSensor(distance=DISTANCE / 1000, seed=1))
+    echo = Echo(17, 18, backend=backend)
+    echo.rest = 0.01
+
+    report('Default', echo, READINGS)
+    report('Default, {} samples'.format(SAMPLES), echo, AVERAGES, SAMPLES)
+    precise = echo.precise_timing()
+    resolution = echo._valueToUnit(precise.resolution, 'mm')
+    print('Calibrated loop {:.0f}ns, pin read {}ns, resolution {:.3f}mm'
+          .format(precise.period, 2 * precise.offset, resolution))
+    report('Precision', echo, READINGS)
+    report('Precision, {} samples'.format(SAMPLES), echo, AVERAGES, SAMPLES)
+    echo.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""File: bench_startup.py"""
+# Package import time in a fresh interpreter, and the time to construct
+# a 12 sensor robot and get its first frame of readings.
+import subprocess
+import sys
+from time import monotonic
+
+from Bluetin_Echo import Echo, EchoArray, WARM_UP
+from Bluetin_Echo.backends import SimulatedBackend
+
+SENSORS = 12
+REPEATS = 5
+
+IMPORT = ('from time import perf_counter; start = perf_counter(); '
+          'import {}; print(perf_counter() - start)')
+
+
+def import_time(modules):
+    times = sorted(float(subprocess.check_output(
+        [sys.executable, '-c', IMPORT.format(modules)]))
+                   for repeat in range(REPEATS))
+    return times[len(times) // 2]
+
+
+def main():
+    print('import Bluetin_Echo:        {:6.1f} ms'.format(
+        import_time('Bluetin_Echo') * 1000))
+    print('import every module:        {:6.1f} ms'.format(
+        import_time('Bluetin_Echo, Bluetin_Echo.aio, Bluetin_Echo.service, '
+                    'Bluetin_Echo.recording, Bluetin_Echo.metrics') * 1000))
+
+    backend = SimulatedBackend()
+    start = monotonic()
+    sensors = [Echo(pin, pin + 1, backend=backend)
+               for pin in range(2, 2 + 2 * SENSORS, 2)]
+    built = monotonic()
+    array = EchoArray(sensors)
+    array.read_frame()
+    first = monotonic()
+    print('Construct {} sensors:       {:6.1f} ms'.format(
+        SENSORS, (built - start) * 1000))
+    print('First frame:                {:6.1f} ms '
+          '(one at a time warm up {:.1f} s)'.format(
+              (first - start) * 1000, SENSORS * WARM_UP))
+    array.stop()
+
+
+if __name__ == '__main__':
+    main()
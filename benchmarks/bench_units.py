@@ -0,0 +1,64 @@
+"""File: bench_units.py"""
+# Microbenchmark of echo time to distance conversion. The string
+# dispatch used before the unit registry is kept here for comparison.
+# The library rows call read() and send() on an Echo whose sensor read
+# returns a stored reading, so they time the conversion path alone.
+from array import array
+from timeit import timeit
+
+from Bluetin_Echo import Echo, GOOD
+from Bluetin_Echo.backends import SimulatedBackend
+
+LOOPS = 200000
+
+
+def value_to_unit(value, mPerSecond, unit = 'cm'):
+    # Conversion as it was before the unit registry.
+    if value > 0:
+        if unit == 'mm':
+            distance = (value * mPerSecond * 1000) / 2
+        elif unit == 'cm':
+            distance = (value * mPerSecond * 100) / 2
+        elif unit == 'm':
+            distance = (value * mPerSecond) / 2
+        elif unit == 'inch':
+            distance = (value * mPerSecond * 39.3701) / 2
+    else:
+        distance = 0
+    return distance
+
+
+def main():
+    echo = Echo(17, 18, backend=SimulatedBackend())
+    echoTime = 0.0029
+    echo._measure = lambda: (echoTime, GOOD, 0.0)
+    echo._read = lambda: echoTime
+
+    results = [
+        ('string dispatch, inch',
+         lambda: value_to_unit(echoTime, 343, 'inch')),
+        ('_valueToUnit, inch', lambda: echo._valueToUnit(echoTime, 'inch')),
+        ("read('inch')", lambda: echo.read('inch')),
+        ("read('cm')", lambda: echo.read('cm')),
+        ('send()', echo.send),
+    ]
+    for name, function in results:
+        seconds = timeit(function, number=LOOPS)
+        print('{:28} {:7.1f} ns/call'.format(name, seconds / LOOPS * 1e9))
+
+    echoTimes = array('d', [echoTime] * 10000)
+    loops = 50
+    seconds = timeit(
+        lambda: [value_to_unit(v, 343, 'inch') for v in echoTimes],
+        number=loops)
+    print('{:28} {:7.1f} ns/value'.format('string dispatch, 10k buffer',
+                                          seconds / loops / 1e4 * 1e9))
+    seconds = timeit(lambda: echo.to_distances(echoTimes, 'inch'),
+                     number=loops)
+    print('{:28} {:7.1f} ns/value'.format('to_distances, 10k buffer',
+                                          seconds / loops / 1e4 * 1e9))
+    echo.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""File: run.py"""
+# Benchmark suite for the measurement hot path. Runs against the
+# simulated GPIO backend, so it works on any Linux box, and writes the
+# results to JSON so releases can be compared.
+#
+#   python benchmarks/run.py --output results.json
+from __future__ import print_function
+
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime
+from math import sqrt
+from time import monotonic
+from time import process_time
+from time import sleep
+
+from Bluetin_Echo import Echo, EchoArray
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+
+DISTANCE = 0.5 # Simulated target, metres
+
+
+def percentile(ordered, fraction):
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summary(values):
+    ordered = sorted(values)
+    count = len(ordered)
+    mean = sum(ordered) / count if count else 0.0
+    stddev = sqrt(sum((v - mean) ** 2 for v in ordered) / (count - 1)) \
+        if count > 1 else 0.0
+    return {
+        'count': count,
+        'mean': mean,
+        'stddev': stddev,
+        'p50': percentile(ordered, 0.5),
+        'p99': percentile(ordered, 0.99),
+        'max': ordered[-1] if ordered else 0.0,
+    }
+
+
+def make_sensor(backend, trigger, capture = 'poll', distance = DISTANCE):
+    backend.attach(trigger, SimulatedSensor(distance=distance, seed=trigger))
+    return Echo(trigger, trigger + 1, capture=capture, backend=backend)
+
+
+"""
+Latency, CPU time and rate of one call, repeated. The sensor is rested
+before each call so only the call itself is timed.
+"""
+def bench_call(echo, call, repeats):
+    latencies = []
+    cpu = []
+    start = monotonic()
+    for repeat in range(repeats):
+        echo.wait_until_ready()
+        began = monotonic()
+        cpuBegan = process_time()
+        call()
+        cpu.append(process_time() - cpuBegan)
+        latencies.append(monotonic() - began)
+    elapsed = monotonic() - start
+    return {
+        'latency_s': summary(latencies),
+        'cpu_s': summary(cpu),
+        'calls_per_s': repeats / elapsed,
+    }
+
+
+"""
+Error of the measured echo time against the simulated pulse width.
+"""
+def bench_pulse_jitter(echo, repeats):
+    expected = DISTANCE * 2 / 343
+    errors = []
+    for repeat in range(repeats):
+        echo.wait_until_ready()
+        echoTime = echo._read()
+        if echoTime > 0:
+            errors.append(echoTime - expected)
+    return summary(errors)
+
+
+"""
+Spread of the trigger timestamps of a streaming sensor around the rest
+period.
+"""
+def bench_stream_jitter(echo, seconds):
+    echo.start_stream(1024)
+    sleep(seconds)
+    echo.stop_stream()
+    readings = echo.drain()
+    intervals = [b[0] - a[0] for a, b in zip(readings, readings[1:])]
+    result = summary(intervals)
+    result['rest_s'] = echo.rest
+    return result
+
+
+def bench_array(sensors, frames):
+    array = EchoArray(sensors)
+    latencies = []
+    start = monotonic()
+    for frame in range(frames):
+        began = monotonic()
+        array.read_frame()
+        latencies.append(monotonic() - began)
+    return {
+        'sensors': len(sensors),
+        'latency_s': summary(latencies),
+        'frames_per_s': frames / (monotonic() - start),
+    }
+
+
+def run(repeats):
+    backend = SimulatedBackend()
+    results = {}
+    for capture in ('poll', 'edge'):
+        echo = make_sensor(backend, 2 if capture == 'poll' else 4, capture)
+        results[capture] = {
+            'send': bench_call(echo, echo.send, repeats),
+            'read': bench_call(echo, lambda: echo.read('cm'), repeats),
+            'read_3': bench_call(echo, lambda: echo.read('cm', 3),
+                                 max(1, repeats // 5)),
+            'samples_3': bench_call(echo, lambda: echo.samples(3),
+                                    max(1, repeats // 5)),
+            'pulse_error_s': bench_pulse_jitter(echo, repeats),
+            'stream_interval_s': bench_stream_jitter(echo, repeats * 0.06),
+        }
+        echo.stop()
+
+    sensors = [make_sensor(backend, 10 + 2 * index, 'poll',
+                           0.3 + 0.1 * index) for index in range(8)]
+    results['array_8'] = bench_array(sensors, max(1, repeats // 2))
+    return results
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(
+        description='Bluetin_Echo hot path benchmarks (simulated backend).')
+    parser.add_argument('--repeats', type=int, default=50,
+                        help='calls per single sensor benchmark')
+    parser.add_argument('--output', help='write JSON results to this file')
+    args = parser.parse_args(argv)
+
+    report = {
+        'created': datetime.utcnow().isoformat() + 'Z',
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': 'sim',
+        'repeats': args.repeats,
+        'results': run(args.repeats),
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as output:
+            output.write(text + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
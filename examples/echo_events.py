@@ -0,0 +1,26 @@
+"""File: echo_events.py"""
+# Import necessary libraries.
+from Bluetin_Echo import Echo
+
+# Define pin constants
+TRIGGER_PIN_1 = 16
+ECHO_PIN_1 = 12
+
+def main():
+    with Echo(TRIGGER_PIN_1, ECHO_PIN_1) as echo:
+        # Report when something comes within 30 cm, moves by 10 cm or
+        # more, or the sensor sees nothing for 5 reads in a row.
+        events = echo.watch(unit='cm')
+        events.zone(30, hysteresis=3, debounce=2, name='near')
+        events.delta(10, debounce=2)
+        events.out_of_range(5)
+        # Read the sensor in the background. This thread sleeps until
+        # an event arrives.
+        echo.start_stream()
+        for counter in range(20):
+            event = events.get()
+            print('{} {} - {} cm'.format(event.kind, event.name or '',
+                                         round(event.distance, 2)))
+
+if __name__ == '__main__':
+    main()
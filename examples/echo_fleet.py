@@ -0,0 +1,30 @@
+"""File: echo_fleet.py"""
+# Import necessary libraries.
+from time import sleep
+
+from Bluetin_Echo import Fleet
+
+# The same settings can be kept in a JSON or TOML file and passed to
+# Fleet by path.
+CONFIG = {
+    'defaults': {'max_distance': 2.5, 'default_unit': 'cm'},
+    'sensors': [
+        {'name': 'front', 'trigger': 16, 'echo': 12,
+         'filters': [{'type': 'RollingMedian', 'window': 5}]},
+        {'name': 'rear', 'trigger': 26, 'echo': 19},
+    ],
+    'array': {'groups': [['front'], ['rear']]},
+}
+
+def main():
+    with Fleet(CONFIG) as fleet:
+        for counter in range(5):
+            print(dict(zip(fleet.names, fleet.array.read_frame('cm'))))
+            sleep(0.1)
+        # Shorten the range while running; nothing is rebuilt.
+        CONFIG['defaults']['max_distance'] = 1.0
+        fleet.apply(CONFIG)
+        print('front echo timeout {} s'.format(fleet['front'].echo_timeout))
+
+if __name__ == '__main__':
+    main()
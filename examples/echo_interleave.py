@@ -0,0 +1,35 @@
+"""File: echo_interleave.py"""
+# Import necessary libraries.
+from time import monotonic, sleep
+
+from Bluetin_Echo import Echo
+
+# Define pin constants
+TRIGGER_PIN_1 = 16
+ECHO_PIN_1 = 12
+TRIGGER_PIN_2 = 26
+ECHO_PIN_2 = 19
+
+# Initialise two sensors. Edge capture timestamps each echo for us.
+echo = [Echo(TRIGGER_PIN_1, ECHO_PIN_1, capture='edge')
+        , Echo(TRIGGER_PIN_2, ECHO_PIN_2, capture='edge')]
+
+def main():
+    # Keep both sensors busy from one thread for five seconds.
+    stop = monotonic() + 5
+    while monotonic() < stop:
+        for counter, sensor in enumerate(echo):
+            sensor.trigger()
+            reading = sensor.collect('cm')
+            if reading is not None:
+                print('Sensor {} - {} cm, Error: {}'.format(
+                    counter, round(reading.distance, 2), reading.status))
+        # Sleep until the first sensor is ready again.
+        sleep(max(0, min(sensor.next_ready_at for sensor in echo)
+                  - monotonic()))
+
+    for sensor in echo:
+        sensor.stop()
+
+if __name__ == '__main__':
+    main()
@@ -1,7 +1,5 @@
 """File: echo_multi_sensor.py"""
 # Import necessary libraries.
-from time import sleep
-
 from Bluetin_Echo import Echo
 
 # Define pin constants
@@ -10,18 +8,19 @@ ECHO_PIN_1 = 12
 TRIGGER_PIN_2 = 26
 ECHO_PIN_2 = 19
 
-# Initialise two sensors.
-echo = [Echo(TRIGGER_PIN_1, ECHO_PIN_1)
-        , Echo(TRIGGER_PIN_2, ECHO_PIN_2)]
-
 def main():
-    sleep(0.1)
-    for counter in range(1, 6):
-        for counter2 in range(0, len(echo)):
-            result = echo[counter2].read('cm', 3)
-            print('Sensor {} - {} cm'.format(counter2, round(result,2)))
-
-    echo[0].stop()
+    # Initialise two sensors. Each one releases only its own pins when
+    # the with block ends.
+    with Echo(TRIGGER_PIN_1, ECHO_PIN_1) as echo1, \
+            Echo(TRIGGER_PIN_2, ECHO_PIN_2) as echo2:
+        echo = [echo1, echo2]
+        # Read the sensors one after the other, so one sensor's ping is
+        # never taken for the other's echo. See EchoArray for firing
+        # sensors together with a crosstalk map.
+        for counter in range(1, 6):
+            for counter2 in range(0, len(echo)):
+                result = echo[counter2].read('cm', 3)
+                print('Sensor {} - {} cm'.format(counter2, round(result,2)))
 
 if __name__ == '__main__':
     main()
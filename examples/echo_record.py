@@ -0,0 +1,36 @@
+"""File: echo_record.py"""
+# Import necessary libraries.
+from Bluetin_Echo import Echo, Recorder, Recording, ReplayBackend
+
+# Define pin constants
+TRIGGER_PIN_1 = 16
+ECHO_PIN_1 = 12
+
+RECORDING = 'echo_recording.bin'
+
+def main():
+    # Record 50 readings to a binary file.
+    echo = Echo(TRIGGER_PIN_1, ECHO_PIN_1)
+    with Recorder(RECORDING, echo) as recorder:
+        for counter in range(50):
+            echo.wait_until_ready()
+            echo.read('cm')
+    echo.stop()
+
+    # Look through the recording.
+    with Recording(RECORDING) as recording:
+        print('{} readings over {:.1f} seconds'.format(
+            len(recording), recording.duration))
+        readings = recording.columns(0, 'cm')
+        print('First distance: {} cm'.format(round(readings.distance[0], 2)))
+
+    # Replay the recording through Echo at the recorded rate.
+    echo = Echo(TRIGGER_PIN_1, ECHO_PIN_1,
+                backend=ReplayBackend(RECORDING, speed=1.0))
+    for counter in range(50):
+        echo.wait_until_ready()
+        print('Replay {} - {} cm'.format(counter, round(echo.read('cm'), 2)))
+    echo.stop()
+
+if __name__ == '__main__':
+    main()
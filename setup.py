@@ -19,9 +19,11 @@ setup(
         'Topic :: Home Automation',
         'Topic :: Software Development :: Libraries :: Python Modules',
         'License :: OSI Approved :: MIT License',
-        'Programming Language :: Python :: 2.7',
         'Programming Language :: Python :: 3',
     ],
     keywords=['RPI', 'GPIO', 'Raspberry Pi', 'Ultrasonic', 'HC-SR04', 'Transducer', 'Distance Measuring', 'Sensor'],
-    install_requires=['RPi.GPIO'],
+    python_requires='>=3.8',
+    install_requires=[],
+    extras_require={'rpi': ['RPi.GPIO'], 'lgpio': ['lgpio'],
+                    'numpy': ['numpy']},
 )
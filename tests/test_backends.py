@@ -0,0 +1,63 @@
+import pytest
+
+from Bluetin_Echo import Echo
+from Bluetin_Echo.backends import SimulatedBackend, get_backend
+
+
+class CountingBackend(SimulatedBackend):
+    def __init__(self):
+        SimulatedBackend.__init__(self, seed=1)
+        self.setups = []
+        self.cleanups = []
+
+    def setup(self, trigger_pin, echo_pin):
+        self.setups.append((trigger_pin, echo_pin))
+        SimulatedBackend.setup(self, trigger_pin, echo_pin)
+
+    def cleanup(self, pins = None):
+        self.cleanups.append(sorted(pins))
+        SimulatedBackend.cleanup(self, pins)
+
+
+def test_acquire_counts_users():
+    backend = CountingBackend()
+    backend.acquire(5, 6)
+    backend.acquire(5, 6)
+    assert backend.setups == [(5, 6)]
+    assert backend.users(5) == backend.users(6) == 2
+    assert backend.release(5, 6) == []
+    assert backend.cleanups == []
+    assert backend.release(5, 6) == [5, 6]
+    assert backend.cleanups == [[5, 6]]
+    assert backend.users(5) == 0
+
+
+def test_shared_trigger_released_last():
+    backend = CountingBackend()
+    backend.acquire(5, 6)
+    backend.acquire(5, 7)
+    # The second sensor brings a new echo pin, so it is set up too.
+    assert backend.setups == [(5, 6), (5, 7)]
+    assert backend.users(5) == 2
+    assert backend.release(5, 6) == [6]
+    assert backend.users(5) == 1
+    assert backend.release(5, 7) == [5, 7]
+    assert backend.cleanups == [[6], [5, 7]]
+
+
+def test_echo_stop_releases_its_pins():
+    backend = CountingBackend()
+    first = Echo(5, 6, backend=backend)
+    second = Echo(5, 7, backend=backend)
+    first.stop()
+    first.stop()
+    assert backend.users(5) == 1
+    assert backend.users(6) == 0
+    second.stop()
+    assert backend.users(5) == 0
+    assert backend.cleanups == [[6], [5, 7]]
+
+
+def test_unknown_backend():
+    with pytest.raises(RuntimeError):
+        get_backend('nosuch')
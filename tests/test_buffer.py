@@ -0,0 +1,37 @@
+import pytest
+
+from Bluetin_Echo.buffer import RingBuffer
+
+
+def test_drain_in_order():
+    buffer = RingBuffer(4)
+    assert buffer.latest is None
+    for count in range(3):
+        buffer.append(count * 0.1, count, 0)
+    assert len(buffer) == 3
+    assert buffer.latest == (0.2, 2, 0)
+    assert buffer.drain() == [(0.0, 0, 0), (0.1, 1, 0), (0.2, 2, 0)]
+    assert len(buffer) == 0
+    assert buffer.drain() == []
+
+
+def test_drain_limit():
+    buffer = RingBuffer(8)
+    for count in range(5):
+        buffer.append(count, count, 0)
+    assert [row[1] for row in buffer.drain(2)] == [0, 1]
+    assert [row[1] for row in buffer.drain()] == [2, 3, 4]
+
+
+def test_overwrite_counts_dropped():
+    buffer = RingBuffer(4)
+    for count in range(10):
+        buffer.append(count, count, count % 3)
+    assert len(buffer) == 4
+    assert [row[1] for row in buffer.drain()] == [6, 7, 8, 9]
+    assert buffer.dropped == 6
+
+
+def test_size_must_be_positive():
+    with pytest.raises(RuntimeError):
+        RingBuffer(0)
@@ -0,0 +1,108 @@
+import json
+
+import pytest
+
+from Bluetin_Echo import GOOD, Fleet, load_config
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+from Bluetin_Echo.config import sensor_settings
+
+
+def sensors(*pins, **settings):
+    return [dict(settings, name=str(index), trigger=trigger, echo=echo)
+            for index, (trigger, echo) in enumerate(pins)]
+
+
+def fleet(config):
+    return Fleet(config, backend=SimulatedBackend(seed=1))
+
+
+def test_sensor_settings_table():
+    table = sensor_settings(speed=340, max_distance=[2, 'm'],
+                            default_unit='mm')
+    assert table.max_distance == 2
+    assert abs(table.echo_timeout - 2 * 2 / 340.0) < 1e-9
+    assert table.factors['mm'] == 340 * 1000 / 2
+    assert table.unit == 'mm'
+
+
+@pytest.mark.parametrize('settings', [
+    {'colour': 'red'},
+    {'speed': 0},
+    {'default_unit': 'furlong'},
+])
+def test_bad_sensor_settings(settings):
+    with pytest.raises(RuntimeError):
+        sensor_settings(**settings)
+
+
+@pytest.mark.parametrize('config', [
+    {'sensors': sensors((2, 3), (4, 3))},
+    {'sensors': sensors((2, 3), (3, 4))},
+    {'sensors': sensors((2, 2))},
+    {'sensors': [{'name': 'a', 'trigger': 2}]},
+    {'sensors': sensors((2, 3), (4, 5), capture='fast')},
+    {'sensors': sensors((2, 3), filters=[{'type': 'Nope'}])},
+    {'sensors': sensors((2, 3)), 'array': {'colour': 'red'}},
+    {'sensors': sensors((2, 3), (4, 5)), 'array': {'groups': [['0']]}},
+    {'sensors': sensors((2, 3), (2, 5)),
+     'array': {'groups': [['0'], ['1']]}},
+])
+def test_bad_configs_fail_before_building(config):
+    backend = SimulatedBackend(seed=1)
+    with pytest.raises(RuntimeError):
+        Fleet(config, backend=backend)
+    assert not backend._pinUsers
+
+
+def test_shared_trigger():
+    backend = SimulatedBackend(seed=1)
+    backend.attach(2, SimulatedSensor(0.5), echo_pin=3)
+    backend.attach(2, SimulatedSensor(1.0), echo_pin=5)
+    config = {'defaults': {'rest': 0.01, 'capture': 'edge'},
+              'sensors': sensors((2, 3), (2, 5))}
+    with Fleet(config, backend=backend) as sensorFleet:
+        assert sensorFleet.array.groups == [[0, 1]]
+        for frame in range(3):
+            distances = sensorFleet.array.read_frame('m')
+            assert sensorFleet.array.error_codes == [GOOD, GOOD]
+            assert abs(distances[0] - 0.5) < 0.001
+            assert abs(distances[1] - 1.0) < 0.001
+
+
+def test_apply_resets_array_settings():
+    config = {'sensors': sensors((2, 3), (4, 5)),
+              'array': {'gap': 0.05, 'jitter': 0.002}}
+    with fleet(config) as sensorFleet:
+        assert sensorFleet.array._gap == 0.05
+        del config['array']
+        sensorFleet.apply(config)
+        assert sensorFleet.array._gap == 0.01
+        assert sensorFleet.array._jitter == 0.0
+
+
+def test_load_and_apply(tmp_path):
+    config = {
+        'defaults': {'rest': 0.01, 'capture': 'edge'},
+        'sensors': sensors((2, 3), (4, 5),
+                           filters=[{'type': 'RollingMedian', 'window': 3}]),
+        'array': {'groups': [['0'], ['1']], 'gap': 0},
+    }
+    path = tmp_path / 'fleet.json'
+    path.write_text(json.dumps(config))
+    assert load_config(str(path)) == config
+    with Fleet(str(path), backend=SimulatedBackend(seed=1)) as sensorFleet:
+        assert sensorFleet.names == ['0', '1']
+        assert sensorFleet['1'].rest == 0.01
+        assert sensorFleet.array.filters is not None
+        sensorFleet.array.read_frame('m')
+
+        config['defaults']['rest'] = 0.02
+        for spec in config['sensors']:
+            del spec['filters']
+        sensorFleet.apply(config)
+        assert sensorFleet['0'].rest == 0.02
+        assert sensorFleet.array.filters is None
+
+        config['sensors'][1]['echo'] = 7
+        with pytest.raises(RuntimeError):
+            sensorFleet.apply(config)
@@ -0,0 +1,77 @@
+from Bluetin_Echo import CROSSTALK, Echo, EchoArray
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+from Bluetin_Echo.crosstalk import CrosstalkDetector
+
+
+def test_detector_flags_neighbour_timing():
+    detector = CrosstalkDetector(window=0.0001, history=4)
+    # Sensor 1 hears sensor 0: its echo keeps a fixed time of flight from
+    # sensor 0's trigger while the trigger offsets change.
+    flagged = set()
+    for frame, offset in enumerate([0.0, 0.001, 0.0005, 0.0015, 0.0008]):
+        flagged = detector.check({0: (0.0, 0.006), 1: (offset, 0.007)})
+    assert flagged == {1}
+    assert detector.flagged >= 1
+    assert 0 < detector.rejection_rate < 1
+    detector.reset()
+    assert detector.checked == 0
+
+
+def test_detector_keeps_true_echoes():
+    detector = CrosstalkDetector(window=0.0001)
+    for frame, offset in enumerate([0.0, 0.001, 0.0005, 0.0015, 0.0008]):
+        flagged = detector.check({0: (0.0, 0.006),
+                                  1: (offset, offset + 0.004),
+                                  2: (0.0, None)})
+        assert flagged == set()
+    assert detector.checked == 10
+
+
+def test_detector_neighbours():
+    detector = CrosstalkDetector(window=0.0001, neighbours={0: [2]})
+    for offset in [0.0, 0.001, 0.0005, 0.0015, 0.0008]:
+        flagged = detector.check({0: (0.0, 0.006), 1: (offset, 0.007)})
+    # 1 is not a neighbour of 0, so it cannot have heard it.
+    assert flagged == set()
+
+
+def build(probability):
+    backend = SimulatedBackend(seed=1)
+    sensors = []
+    for pin, distance in ((2, 1.0), (4, 1.3)):
+        backend.attach(pin, SimulatedSensor(distance, seed=pin))
+        sensor = Echo(pin, pin + 1, capture='edge', backend=backend)
+        sensor.rest = 0.02
+        sensors.append(sensor)
+    backend.leak(2, 4, 2.3, probability)
+    backend.leak(4, 2, 2.3, probability)
+    return backend, sensors
+
+
+def test_crosstalk_map_keeps_sensors_apart():
+    backend, sensors = build(1.0)
+    # The gap between groups lets a stray ping die out.
+    array = EchoArray(sensors, {0: [1]})
+    assert array.groups == [[0], [1]]
+    for frame in range(5):
+        distances = array.read_frame('m')
+        assert not backend.leaked(2) and not backend.leaked(4)
+        assert abs(distances[0] - 1.0) < 0.001
+        assert abs(distances[1] - 1.3) < 0.001
+    array.stop()
+
+
+def test_jitter_rejection_catches_leaks():
+    backend, sensors = build(1.0)
+    array = EchoArray(sensors, gap=0, jitter=0.002, seed=1)
+    array.reject_crosstalk()
+    leaked = caught = 0
+    for frame in range(40):
+        array.read_frame('m')
+        for index, pin in enumerate((2, 4)):
+            hit = backend.leaked(pin)
+            leaked += hit
+            caught += hit and array.error_codes[index] == CROSSTALK
+    array.stop()
+    assert leaked > 0
+    assert caught >= leaked // 2
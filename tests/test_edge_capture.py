@@ -0,0 +1,92 @@
+import asyncio
+from time import monotonic, sleep
+
+from Bluetin_Echo import Echo, GOOD, NOT_READY, OUT_OF_RANGE
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+
+
+def sensor(distance, **options):
+    backend = SimulatedBackend(seed=1)
+    backend.attach(2, SimulatedSensor(distance, seed=1, **options))
+    echo = Echo(2, 3, capture='edge', backend=backend)
+    echo.rest = 0.01
+    return echo
+
+
+def read(echo, unit = 'm'):
+    echo.wait_until_ready()
+    return echo.read(unit)
+
+
+def test_edge_times_are_exact():
+    # The warm up pulse takes the first distance.
+    echo = sensor([0.3, 0.5, 1.0, 2.0, 2.8])
+    assert echo.capture == 'edge'
+    distances = [read(echo) for count in range(5)]
+    echo.stop()
+    for distance, expected in zip(distances, [0.5, 1.0, 2.0, 2.8, 0.3]):
+        assert abs(distance - expected) < 1e-6
+    assert echo.error_code == GOOD
+
+
+def test_out_of_range_and_not_ready():
+    echo = sensor(1.0)
+    echo.max_distance(0.5, 'm')
+    assert read(echo) == 0
+    assert echo.error_code == OUT_OF_RANGE
+    # The sensor is still resting from the last read.
+    sleep(0.04)
+    echo.read('m')
+    assert echo.read('m') == 0
+    assert echo.error_code == NOT_READY
+    echo.stop()
+
+
+def test_trigger_and_collect():
+    echo = sensor(1.5)
+    echo.wait_until_ready()
+    assert echo.trigger()
+    reading = None
+    while reading is None:
+        reading = echo.collect('cm')
+    echo.stop()
+    assert reading.status == GOOD
+    assert abs(reading.distance - 150) < 1e-4
+
+
+def test_samples_and_batch():
+    echo = sensor([1.0, 1.1, 0.9, 1.0], noise=0.0)
+    assert abs(echo.read('m', 4) - 1.0) < 1e-6
+    stats = echo.batch(4, 'cm')
+    echo.stop()
+    assert (stats.good, stats.samples) == (4, 4)
+    assert abs(stats.mean - 100) < 1e-4
+    assert abs(stats.median - 100) < 1e-4
+
+
+def test_stream_drain():
+    echo = sensor(0.8)
+    stream = echo.start_stream(16)
+    # The first reading waits for the warm up pulse.
+    end = monotonic() + 2.0
+    while len(stream) < 3 and monotonic() < end:
+        sleep(0.01)
+    echo.stop_stream()
+    readings = echo.drain('cm')
+    echo.stop()
+    assert len(readings) >= 3
+    for timestamp, distance, code in readings:
+        assert code == GOOD
+        assert abs(distance - 80) < 1e-4
+
+
+def test_async_read():
+    echo = sensor(1.2)
+
+    async def main():
+        return [await echo.aread('m') for count in range(3)]
+
+    distances = asyncio.run(main())
+    echo.stop()
+    for distance in distances:
+        assert abs(distance - 1.2) < 1e-6
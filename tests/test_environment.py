@@ -0,0 +1,107 @@
+import pytest
+
+from Bluetin_Echo import Echo, GOOD, speed_of_sound
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+from Bluetin_Echo.environment import Environment, SimulatedEnvironment
+
+
+def sensor(distance, speed = 343, **options):
+    backend = SimulatedBackend(seed=1)
+    target = backend.attach(2, SimulatedSensor(distance, seed=1, **options))
+    echo = Echo(2, 3, speed, capture='edge', backend=backend)
+    echo.rest = 0.01
+    return echo, target
+
+
+def read(echo, unit = 'm'):
+    echo.wait_until_ready()
+    return echo.read(unit)
+
+
+def test_speed_of_sound():
+    assert speed_of_sound(0.0) == pytest.approx(331.3)
+    assert speed_of_sound(20.0) == pytest.approx(343.2, abs=0.1)
+    assert speed_of_sound(20.0, 50.0) > speed_of_sound(20.0)
+
+
+def test_calibrate():
+    echo, target = sensor(0.2, speed=300)
+    assert echo.calibrate(20, 'cm', 5) == pytest.approx(343, abs=0.01)
+    assert echo.speed == pytest.approx(343, abs=0.01)
+    assert read(echo) == pytest.approx(0.2, abs=1e-5)
+    with pytest.raises(RuntimeError):
+        echo.calibrate(20, 'furlong')
+    echo.stop()
+
+
+def test_environment_polls_on_change():
+    conditions = [20.0]
+    environment = Environment(lambda: conditions[0], threshold=0.5,
+                              interval=1.0)
+    assert environment.poll(0.0) == pytest.approx(speed_of_sound(20.0))
+    conditions[0] = 30.0
+    # Not polled again until the interval has passed.
+    assert environment.poll(0.5) is None
+    assert environment.poll(1.0) == pytest.approx(speed_of_sound(30.0))
+    conditions[0] = 30.2
+    assert environment.poll(2.0) is None
+    assert environment.temperature == 30.0
+
+
+def test_rebase_keeps_calibration():
+    conditions = [(20.0, 50.0)]
+    environment = Environment(lambda: conditions[0], interval=0.0)
+    modelled = speed_of_sound(20.0, 50.0)
+    environment.rebase(modelled * 1.01, now=0.0)
+    assert environment.correction == pytest.approx(1.01)
+    conditions[0] = (30.0, 50.0)
+    assert environment.poll(1.0) == \
+        pytest.approx(speed_of_sound(30.0, 50.0) * 1.01)
+
+
+def test_compensate_follows_the_air():
+    air = SimulatedEnvironment(temperature=0.0, humidity=0.0)
+    echo, target = sensor(1.0, environment=air)
+    assert echo.compensate(air, interval=0.0) is not None
+    assert echo.speed == pytest.approx(331.3)
+    assert read(echo) == pytest.approx(1.0, abs=1e-5)
+    air.temperature = 35.0
+    assert read(echo) == pytest.approx(1.0, abs=1e-5)
+    assert echo.speed == pytest.approx(speed_of_sound(35.0))
+    # Calibration rebases the model rather than being undone by it.
+    echo.speed = 340
+    assert echo.calibrate(1, 'm', 3) == pytest.approx(air.speed, abs=0.01)
+    assert read(echo) == pytest.approx(1.0, abs=1e-5)
+    assert echo.compensate() is None
+    air.temperature = 0.0
+    read(echo)
+    assert echo.speed == pytest.approx(speed_of_sound(35.0), abs=0.01)
+    echo.stop()
+
+
+def test_speed_scales_echo_timeout():
+    echo, target = sensor(1.0)
+    echo.echo_timeout = 0.01
+    echo.speed = 300
+    assert echo.echo_timeout == pytest.approx(0.01 * 343 / 300)
+    echo.max_distance(2, 'm')
+    echo.speed = 343
+    assert echo.echo_timeout == pytest.approx(4.0 / 343)
+    echo.stop()
+
+
+def test_speed_change_with_adaptive_timing():
+    echo, target = sensor(0.3)
+    echo.adaptive_timing()
+    for count in range(5):
+        read(echo)
+    assert echo.effective_echo_timeout < echo.echo_timeout
+    limit = echo.echo_timeout
+    # The setting is scaled, not the timeout adaptive timing shrank.
+    echo.speed = 340
+    assert echo.echo_timeout == pytest.approx(limit * 343 / 340)
+    target.distance = 2.5
+    distances = [read(echo) for count in range(6)]
+    echo.stop()
+    assert distances[-1] == pytest.approx(2.5 * 340 / 343, abs=0.01)
+    assert echo.error_code == GOOD
@@ -0,0 +1,67 @@
+from Bluetin_Echo import Echo, GOOD, OUT_OF_RANGE
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+from Bluetin_Echo.events import DELTA, ENTER, FOUND, LEAVE, LOST
+
+
+def sensor(distances):
+    backend = SimulatedBackend(seed=1)
+    backend.attach(2, SimulatedSensor(distances, seed=1))
+    echo = Echo(2, 3, capture='edge', backend=backend)
+    echo.rest = 0.01
+    return echo
+
+
+def replay(echo, watcher, readings):
+    for distance, status in readings:
+        watcher(echo, distance * 2 / 34300.0 if distance else 0, status)
+
+
+def test_zone_hysteresis_and_debounce():
+    echo = sensor(1.0)
+    watcher = echo.watch(unit='cm')
+    watcher.zone(30, hysteresis=5, debounce=2, name='near')
+    replay(echo, watcher, [(50, GOOD), (25, GOOD), (50, GOOD), (25, GOOD),
+                           (20, GOOD), (32, GOOD), (34, GOOD), (40, GOOD),
+                           (0, OUT_OF_RANGE), (0, OUT_OF_RANGE)])
+    events = watcher.pending()
+    echo.stop()
+    # One reading inside is not enough, the hysteresis band holds the
+    # zone, and out of range counts as leaving.
+    assert [(event.kind, event.name) for event in events] == \
+        [(ENTER, 'near'), (LEAVE, 'near')]
+    assert abs(events[0].distance - 20) < 1e-6
+
+
+def test_delta_and_lost_found():
+    echo = sensor(1.0)
+    watcher = echo.watch(unit='cm').delta(10).out_of_range(2)
+    seen = []
+    watcher.subscribe(seen.append)
+    replay(echo, watcher, [(100, GOOD), (105, GOOD), (112, GOOD),
+                           (0, OUT_OF_RANGE), (0, OUT_OF_RANGE),
+                           (0, OUT_OF_RANGE), (90, GOOD)])
+    echo.stop()
+    # Rules are checked in the order they were added.
+    assert [event.kind for event in seen] == [DELTA, LOST, DELTA, FOUND]
+    assert [event.kind for event in watcher.pending()] == \
+        [DELTA, LOST, DELTA, FOUND]
+    assert watcher.get(timeout=0.01) is None
+
+
+def test_queue_drops_oldest():
+    echo = sensor(1.0)
+    watcher = echo.watch(unit='cm', queue_size=2).delta(1)
+    replay(echo, watcher, [(10, GOOD), (20, GOOD), (30, GOOD), (40, GOOD)])
+    echo.stop()
+    assert watcher.dropped == 1
+    assert [round(event.distance) for event in watcher.pending()] == [30, 40]
+
+
+def test_events_from_simulated_reads():
+    echo = sensor([1.0, 0.2, 0.2, 1.0, 1.0])
+    watcher = echo.watch(unit='cm').zone(50)
+    for count in range(5):
+        echo.wait_until_ready()
+        echo.read('cm')
+    echo.stop()
+    assert [event.kind for event in watcher.pending()] == [ENTER, LEAVE]
@@ -0,0 +1,53 @@
+from Bluetin_Echo import Echo
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+from Bluetin_Echo.filters import (ExponentialAverage, Kalman1D, OutlierReject,
+                                  Pipeline, RollingMedian)
+
+
+def feed(stage, values):
+    return [stage.update(value) for value in values]
+
+
+def test_rolling_median():
+    stage = RollingMedian(3)
+    assert feed(stage, [1, 9, 2, 8, 3]) == [1, 5, 2, 8, 3]
+    stage.reset()
+    assert stage.update(4) == 4
+
+
+def test_exponential_average():
+    stage = ExponentialAverage(0.5)
+    assert feed(stage, [2.0, 4.0, 4.0]) == [2.0, 3.0, 3.5]
+
+
+def test_kalman_settles_on_constant():
+    stage = Kalman1D(process_noise=1e-6, measurement_noise=1e-2)
+    values = feed(stage, [1.0, 1.2, 0.8] * 20)
+    assert abs(values[-1] - 1.0) < 0.05
+
+
+def test_outlier_reject_follows_step():
+    stage = OutlierReject(threshold=3, max_rejects=2)
+    assert feed(stage, [1.0, 1.0, 1.0]) == [1.0, 1.0, 1.0]
+    # A lone spike is dropped, a lasting step is taken up.
+    assert stage.update(5.0) is None
+    assert stage.update(1.0) == 1.0
+    assert feed(stage, [3.0, 3.0, 3.0]) == [None, None, 3.0]
+
+
+def test_pipeline_on_simulated_sensor():
+    backend = SimulatedBackend(seed=1)
+    backend.attach(2, SimulatedSensor([1.0, 1.0, 3.0, 1.0], seed=1))
+    echo = Echo(2, 3, capture='edge', backend=backend)
+    echo.rest = 0.01
+    pipeline = Pipeline(echo, RollingMedian(3), unit='m')
+    values = [pipeline.read() for count in range(8)]
+    echo.stop()
+    # The median hides the single 3 m reading in every window.
+    for value in values[2:]:
+        assert abs(value - 1.0) < 0.001
+    assert abs(pipeline.value('cm') - 100) < 0.1
+    # Failed readings keep the last good output.
+    assert pipeline.feed(0) == pipeline.value()
+    pipeline.reset()
+    assert pipeline.value() == 0
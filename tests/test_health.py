@@ -0,0 +1,78 @@
+from time import sleep
+
+from Bluetin_Echo import Echo, FAULT, GOOD
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+from Bluetin_Echo.health import (HEALTHY, NO_ECHO, QUARANTINED, STUCK_HIGH,
+                                 SUSPECT, TIMEOUT, HealthMonitor)
+
+
+def test_quarantine_and_backoff():
+    monitor = HealthMonitor(failures=2, backoff=1.0, max_backoff=3.0)
+    assert monitor.update(False, NO_ECHO, now=0.0) == SUSPECT
+    assert monitor.update(False, NO_ECHO, now=0.1) == QUARANTINED
+    assert not monitor.healthy
+    assert not monitor.allow(now=0.5)
+    # A failed probe doubles the wait, up to max_backoff.
+    assert monitor.allow(now=1.1)
+    monitor.update(False, NO_ECHO, now=1.1)
+    assert not monitor.allow(now=3.0)
+    assert monitor.allow(now=3.2)
+    monitor.update(False, NO_ECHO, now=3.2)
+    assert not monitor.allow(now=6.1)
+    assert monitor.allow(now=6.3)
+    assert monitor.update(True, now=6.3) == HEALTHY
+    assert (monitor.quarantines, monitor.probes) == (1, 3)
+
+
+def test_timeouts_count_only_when_asked():
+    monitor = HealthMonitor(failures=1)
+    for count in range(5):
+        assert monitor.update(False) == HEALTHY
+    monitor = HealthMonitor(failures=1, timeouts=3)
+    monitor.update(False)
+    monitor.update(False)
+    assert monitor.update(False) == QUARANTINED
+    assert monitor.fault == TIMEOUT
+    monitor.reset()
+    assert monitor.healthy and monitor.failures == 0
+
+
+def watched(fault):
+    backend = SimulatedBackend(seed=1)
+    sensor = backend.attach(2, SimulatedSensor(1.0, fault=fault))
+    echo = Echo(2, 3, capture='edge', backend=backend)
+    echo.rest = 0.01
+    echo.echo_timeout = 0.02
+    return echo, sensor, echo.watchdog(failures=2, backoff=0.05)
+
+
+def read(echo):
+    echo.wait_until_ready()
+    return echo.read('m')
+
+
+def test_dead_sensor_quarantined_and_probed():
+    echo, sensor, monitor = watched('dead')
+    read(echo)
+    read(echo)
+    assert monitor.state == QUARANTINED
+    assert monitor.fault == NO_ECHO
+    # No trigger while quarantined, until the probe is due.
+    assert read(echo) == 0
+    assert echo.error_code == FAULT
+    sensor.fault = None
+    sleep(0.06)
+    assert abs(read(echo) - 1.0) < 0.001
+    assert echo.error_code == GOOD
+    assert monitor.state == HEALTHY
+    assert monitor.probes == 1
+    echo.stop()
+
+
+def test_stuck_high_sensor():
+    echo, sensor, monitor = watched('stuck_high')
+    for count in range(3):
+        read(echo)
+    echo.stop()
+    assert monitor.state == QUARANTINED
+    assert monitor.fault == STUCK_HIGH
@@ -0,0 +1,116 @@
+import random
+
+import pytest
+
+from Bluetin_Echo import mapping
+from Bluetin_Echo.mapping import (ArrayMapper, OccupancyGrid, Projector,
+                                  SensorPose)
+
+POSES = [(0.1, 0.0, 0.0), (0.0, 0.1, 90.0, 30.0), (-0.1, 0.0, 180.0),
+         (0.0, -0.1, 270.0)]
+
+
+def close(a, b):
+    a = list(a)
+    b = list(b)
+    return len(a) == len(b) and all(abs(x - y) < 1e-9 for x, y in zip(a, b))
+
+
+def test_points_skip_zero_readings():
+    projector = Projector(POSES)
+    xs, ys = projector.points([1.0, 0, 0.5, 0])
+    assert close(xs, [1.1, -0.6])
+    assert close(ys, [0.0, 0.0])
+
+
+def test_points_in_world_frame():
+    projector = Projector([(0.0, 0.0, 0.0)])
+    xs, ys = projector.points([1.0], robot=(2.0, 3.0, 90.0))
+    assert close(xs, [2.0])
+    assert close(ys, [4.0])
+
+
+def test_samples_along_rays():
+    projector = Projector([(0.0, 0.0, 0.0, 20.0)], rays=3, resolution=0.1)
+    (freeX, freeY), (hitX, hitY) = projector.samples([0.5])
+    # Five steps short of the reading on each of three rays.
+    assert len(freeX) == len(freeY) == 15
+    assert len(hitX) == 3
+    assert max(hitX) == pytest.approx(0.5)
+    assert max(hitY) > 0 > min(hitY)
+
+
+def test_samples_clear_range():
+    projector = Projector(POSES, rays=2, resolution=0.1)
+    free, hit = projector.samples([0, 0, 0, 0])
+    assert len(free[0]) == 0 and len(hit[0]) == 0
+    free, hit = projector.samples([0, 0, 0, 0], clear_range=0.35)
+    assert len(free[0]) == 4 * 2 * 3
+    assert len(hit[0]) == 0
+
+
+def test_grid_update_and_decay():
+    grid = OccupancyGrid(20, 20, resolution=0.1, origin=(-1.0, -1.0),
+                         half_life=1.0)
+    projector = Projector([(0.0, 0.0, 0.0, 0.0)], rays=1, resolution=0.1)
+    grid.update(*projector.samples([0.55]), now=0.0)
+    assert grid.value(0.55, 0.0, now=0.0) == pytest.approx(0.85)
+    assert grid.value(0.25, 0.0, now=0.0) == pytest.approx(-0.4)
+    assert grid.value(-0.5, 0.5, now=0.0) == 0.0
+    assert grid.value(5.0, 5.0, now=0.0) == 0.0
+    assert grid.value(0.55, 0.0, now=1.0) == pytest.approx(0.425)
+    for frame in range(10):
+        grid.update(*projector.samples([0.55]), now=0.0)
+    assert grid.value(0.55, 0.0, now=0.0) == pytest.approx(5.0)
+    xs, ys = grid.occupied(now=0.0)
+    assert close(xs, [0.55]) and close(ys, [0.05])
+    grid.clear()
+    assert grid.value(0.55, 0.0, now=0.0) == 0.0
+    assert len(grid.occupied(now=0.0)[0]) == 0
+
+
+def test_mapper_needs_a_pose_per_sensor():
+    grid = OccupancyGrid(40, 40, resolution=0.1, origin=(-2.0, -2.0))
+    mapper = ArrayMapper(POSES, grid, rays=3)
+    assert mapper.projector.poses[0] == SensorPose(0.1, 0.0, 0.0, 15.0)
+    xs, ys = mapper.update([1.0, 0, 0, 0], now=0.0)
+    assert close(xs, [1.1]) and mapper.points == (xs, ys)
+    assert grid.value(1.1, 0.0, now=0.0) > 0
+    with pytest.raises(RuntimeError):
+        mapper.update([1.0])
+
+
+def test_numpy_matches_pure_python(monkeypatch):
+    numpy = pytest.importorskip('numpy')
+    projector = Projector(POSES, rays=4, resolution=0.05)
+    rng = random.Random(1)
+    frames = []
+    for trial in range(50):
+        frames.append(([rng.choice([0, 0.3, 1.2, 3.9, 5.0, rng.random() * 4])
+                        for pose in POSES],
+                       rng.choice([None, (1.0, 2.0, 30.0)]),
+                       rng.choice([None, 0.5])))
+    fast = [(projector.points(d, robot),
+             projector.samples(d, robot, clear)) for d, robot, clear in frames]
+    fastGrid = OccupancyGrid(200, 200, origin=(-4.0, -4.0), half_life=2.0)
+    for now, (d, robot, clear) in enumerate(frames):
+        fastGrid.update(*projector.samples(d, robot, clear), now=now * 0.1)
+
+    monkeypatch.setattr(mapping, 'numpy', None)
+    pure = [(projector.points(d, robot),
+             projector.samples(d, robot, clear)) for d, robot, clear in frames]
+    pureGrid = OccupancyGrid(200, 200, origin=(-4.0, -4.0), half_life=2.0)
+    for now, (d, robot, clear) in enumerate(frames):
+        pureGrid.update(*projector.samples(d, robot, clear), now=now * 0.1)
+
+    for (fastPoints, fastSamples), (purePoints, pureSamples) in \
+            zip(fast, pure):
+        for a, b in zip(fastPoints, purePoints):
+            assert close(a, b)
+        for fastSet, pureSet in zip(fastSamples, pureSamples):
+            for a, b in zip(fastSet, pureSet):
+                assert close(a, b)
+    fastGrid.settle(5.0)
+    pureGrid.settle(5.0)
+    assert close(fastGrid.values, pureGrid.values)
+    assert isinstance(fastGrid.values, numpy.ndarray)
@@ -0,0 +1,85 @@
+from Bluetin_Echo import Echo, prometheus_text
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+from Bluetin_Echo.metrics import EchoMetrics, Histogram
+
+
+def sensor(distance, capture = 'edge'):
+    backend = SimulatedBackend(seed=1)
+    backend.attach(2, SimulatedSensor(distance, seed=1))
+    echo = Echo(2, 3, capture=capture, backend=backend)
+    echo.rest = 0.01
+    return echo
+
+
+def test_histogram_buckets():
+    histogram = Histogram((1, 10))
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    assert list(histogram.counts) == [2, 1, 1]
+    assert histogram.snapshot() == {
+        'buckets': {'1': 2, '10': 1, '+Inf': 1}, 'sum': 56.5, 'count': 4}
+    assert histogram._samples('h', 'pin="2"') == [
+        'h_bucket{pin="2",le="1"} 2', 'h_bucket{pin="2",le="10"} 3',
+        'h_bucket{pin="2",le="+Inf"} 4', 'h_sum{pin="2"} 56.5',
+        'h_count{pin="2"} 4']
+
+
+def test_metrics_are_off_by_default():
+    echo = sensor(1.0)
+    assert echo.metrics is None
+    metrics = echo.enable_metrics()
+    assert echo.enable_metrics() is metrics
+    assert echo.enable_metrics(False) is None
+    assert echo.metrics is None
+    echo.stop()
+
+
+def test_reads_are_counted():
+    echo = sensor([1.0, 1.0, 1.0, 9.0])
+    metrics = echo.enable_metrics()
+    for count in range(3):
+        echo.wait_until_ready()
+        echo.read('m')
+    echo.stop()
+    snapshot = metrics.snapshot()
+    assert snapshot['outcomes']['good'] == 2
+    assert snapshot['outcomes']['out_of_range'] == 1
+    assert snapshot['echo_time_seconds']['count'] == 2
+    assert snapshot['trigger_seconds']['count'] == 3
+    assert snapshot['wait_fall_seconds']['count'] == 2
+    # Edge capture does not poll.
+    assert snapshot['poll_iterations']['count'] == 0
+    metrics.reset()
+    assert metrics.outcomes == [0, 0, 0, 0, 0]
+
+
+def test_polls_are_counted():
+    echo = sensor(0.5, capture='poll')
+    metrics = echo.enable_metrics()
+    echo.wait_until_ready()
+    echo.read('m')
+    echo.stop()
+    assert metrics.poll_iterations.count == 1
+    assert metrics.poll_iterations.sum > 0
+
+
+def test_prometheus_text():
+    echo = sensor(1.0)
+    quiet = sensor(1.0)
+    echo.enable_metrics()
+    echo.wait_until_ready()
+    echo.read('m')
+    echo.stop()
+    quiet.stop()
+    text = prometheus_text([echo, quiet])
+    assert text.endswith('\n')
+    lines = text.splitlines()
+    assert '# TYPE bluetin_echo_reads_total counter' in lines
+    assert 'bluetin_echo_reads_total{echo="3",trigger="2",status="good"} 1' \
+        in lines
+    assert 'bluetin_echo_echo_time_seconds_count{echo="3",trigger="2"} 1' \
+        in lines
+    # Sensors without metrics are skipped.
+    assert sum(1 for line in lines if line.startswith('# TYPE')) == 7
+    single = EchoMetrics().to_prometheus({'name': 'front'}, prefix='robot')
+    assert 'robot_reads_total{name="front",status="fault"} 0' in single
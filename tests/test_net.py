@@ -0,0 +1,107 @@
+import socket
+from threading import Thread
+
+import pytest
+
+from Bluetin_Echo import Echo, EchoArray, FrameClient, FrameServer, GOOD
+from Bluetin_Echo.__main__ import _arguments
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+from Bluetin_Echo.net import HEADER, frame_size, pack_frames, unpack_frames
+
+FRAMES = [
+    (1000.25, [0.5, 1.25, 0.0], [0, 0, 1]),
+    (1000.5, [0.75, 2.5, 3.0], [0, 3, 0]),
+    (1000.75, [1.0, 0.125, 0.0], [0, 0, 4]),
+]
+
+
+def check(frames, first = 0):
+    for index, frame in enumerate(frames):
+        timestamp, distances, statuses = FRAMES[index % len(FRAMES)]
+        assert frame.sequence == first + index
+        assert frame.timestamp == timestamp
+        assert list(frame.distance) == distances
+        assert list(frame.status) == statuses
+
+
+def test_pack_unpack_round_trip():
+    message = pack_frames(7, FRAMES)
+    assert len(message) == HEADER.size + 3 * frame_size(3)
+    frames = unpack_frames(message)
+    check(frames, 7)
+    assert frames[0].distances('cm') == [50.0, 125.0, 0.0]
+
+
+def test_unpack_rejects_other_data():
+    with pytest.raises(RuntimeError):
+        unpack_frames(b'XX' + pack_frames(0, FRAMES)[2:])
+
+
+@pytest.mark.parametrize('transport', ['tcp', 'unix'])
+def test_stream_server_to_client(tmp_path, transport):
+    if transport == 'unix':
+        address = str(tmp_path / 'echo.sock')
+    else:
+        address = ('127.0.0.1', 0)
+    frames = iter(FRAMES * 3)
+    with FrameServer(None, address, transport, batch=2,
+                     frames=frames) as server:
+        client = FrameClient(server.address, transport, timeout=5.0)
+        thread = Thread(target=server.serve)
+        thread.start()
+        received = list(client.frames(9))
+        thread.join()
+        client.close()
+    check(received)
+    assert client.lost == 0
+    assert client.received == 9
+
+
+def test_serve_simulated_array():
+    backend = SimulatedBackend(seed=1)
+    sensors = []
+    for pin, distance in ((2, 0.5), (4, 1.5)):
+        backend.attach(pin, SimulatedSensor(distance, seed=pin))
+        sensor = Echo(pin, pin + 1, capture='edge', backend=backend)
+        sensor.rest = 0.01
+        sensors.append(sensor)
+    array = EchoArray(sensors, gap=0)
+    with FrameServer(array, ('127.0.0.1', 0)) as server:
+        client = FrameClient(server.address, timeout=5.0)
+        thread = Thread(target=server.serve, args=(4,))
+        thread.start()
+        received = list(client.frames(4))
+        thread.join()
+        client.close()
+    array.stop()
+    assert [frame.sequence for frame in received] == [0, 1, 2, 3]
+    for frame in received:
+        assert list(frame.status) == [GOOD, GOOD]
+        assert abs(frame.distance[0] - 0.5) < 0.001
+        assert abs(frame.distance[1] - 1.5) < 0.001
+
+
+def test_slow_client_is_dropped():
+    # Frames far larger than the socket buffers of a client that never
+    # reads; sends must not block the server.
+    big = (1000.0, [0.5] * 8000, [0] * 8000)
+    with FrameServer(None, ('127.0.0.1', 0), frames=iter([big] * 400)) \
+            as server:
+        client = socket.create_connection(server.address)
+        thread = Thread(target=server.serve)
+        thread.start()
+        thread.join(10.0)
+        assert not thread.is_alive()
+        client.close()
+    assert server.clients == 0
+    assert server.sent < 400
+
+
+def test_gap_needs_sensor_pins():
+    with pytest.raises(SystemExit):
+        _arguments(['serve', '--config', 'fleet.toml', '--gap', '0.02',
+                    '--tcp', ':5005'])
+    arguments = _arguments(['serve', '--sensor', '16:12', '--gap', '0.02',
+                            '--tcp', ':5005'])
+    assert arguments.gap == 0.02
+    assert arguments.sensor == [(16, 12)]
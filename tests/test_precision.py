@@ -0,0 +1,95 @@
+from time import monotonic
+
+import pytest
+
+from Bluetin_Echo import Echo, GOOD, OUT_OF_RANGE
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+from Bluetin_Echo.precision import PrecisionTiming
+
+
+class ScriptedPin(object):
+    def __init__(self):
+        self.levels = []
+
+    def input(self, pin):
+        return self.levels.pop(0) if self.levels else 0
+
+
+class FakeEcho(object):
+    def __init__(self):
+        self._gpio = ScriptedPin()
+        self._echo_pin = 3
+
+
+def sensor(distance):
+    backend = SimulatedBackend(seed=1)
+    target = backend.attach(2, SimulatedSensor(distance, seed=1))
+    echo = Echo(2, 3, backend=backend)
+    echo.rest = 0.01
+    return echo, target
+
+
+def test_calibration():
+    timing = PrecisionTiming(FakeEcho(), loops=500, reject=4.0)
+    assert timing.period > 0
+    assert timing.spread > 0
+    assert timing.resolution > 0
+    assert timing.limit == pytest.approx(4.0 * timing.resolution)
+
+
+def test_measure_brackets_edges():
+    echo = FakeEcho()
+    timing = PrecisionTiming(echo, loops=100)
+    echo._gpio.levels = [0, 0, 0, 1, 1, 1, 1, 1, 0]
+    echoTime, timeout, uncertainty, rise, polls = timing.measure(0.1, 0.1)
+    assert not timeout
+    assert echoTime > 0
+    assert uncertainty > 0
+    assert rise > 0
+    assert polls == 7
+
+
+def test_measure_timeouts():
+    echo = FakeEcho()
+    timing = PrecisionTiming(echo, loops=100)
+    # No echo at all.
+    echoTime, timeout, uncertainty, rise, polls = timing.measure(0.01, 0.001)
+    assert timeout and echoTime == 0 and rise == 0
+    # An echo that never ends still reports when it rose.
+    echo._gpio.input = lambda pin: 1
+    echoTime, timeout, uncertainty, rise, polls = timing.measure(0.001, 0.01)
+    assert timeout and echoTime == 0 and rise > 0
+
+
+def test_echo_high_before_timing():
+    echo = FakeEcho()
+    timing = PrecisionTiming(echo, loops=100)
+    # Preempted past the rising edge: the echo is high from the start,
+    # and could have risen at any time in the last millisecond.
+    echo._gpio.levels = [1, 1, 1, 0]
+    echoTime, timeout, uncertainty, rise, polls = timing.measure(
+        0.1, 0.1, monotonic() - 0.001)
+    assert not timeout
+    assert uncertainty > 0.0002
+    assert uncertainty > timing.limit
+
+
+def test_precise_reads():
+    echo, target = sensor(1.0)
+    assert echo.uncertainty() is None
+    timing = echo.precise_timing()
+    assert isinstance(timing, PrecisionTiming)
+    echo.wait_until_ready()
+    distance = echo.read('m', 5)
+    assert echo.error_code == GOOD
+    assert distance == pytest.approx(1.0, abs=0.02)
+    assert echo.uncertainty('m') > 0
+    assert echo.uncertainty('mm') == pytest.approx(
+        echo.uncertainty('m') * 1000)
+    target.distance = 9.0
+    echo.wait_until_ready()
+    assert echo.read('m') == 0
+    assert echo.error_code == OUT_OF_RANGE
+    assert echo.uncertainty() is None
+    assert echo.precise_timing(False) is None
+    echo.stop()
@@ -0,0 +1,68 @@
+import pytest
+
+from Bluetin_Echo import (Echo, EchoArray, GOOD, OUT_OF_RANGE, Reading,
+                          ReadingColumns)
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+
+
+def sensor(distance, trigger_pin = 2, backend = None):
+    backend = backend or SimulatedBackend(seed=1)
+    backend.attach(trigger_pin, SimulatedSensor(distance, seed=1))
+    echo = Echo(trigger_pin, trigger_pin + 1, capture='edge',
+                backend=backend)
+    echo.rest = 0.01
+    return echo
+
+
+def test_columns_append_and_index():
+    columns = ReadingColumns()
+    columns.append(50.0, 0.0029, GOOD, 10.0)
+    columns.append(0.0, 0.0, OUT_OF_RANGE, 10.1, 0)
+    assert len(columns) == 2
+    assert columns[0] == Reading(50.0, 0.0029, GOOD, 10.0, 1, None)
+    assert columns[-1].status == OUT_OF_RANGE
+    assert [reading.samples for reading in columns] == [1, 0]
+    assert list(columns.distance) == [50.0, 0.0]
+
+
+def test_read_record():
+    echo = sensor(1.0)
+    echo.wait_until_ready()
+    reading = echo.read('m', record=True)
+    assert isinstance(reading, Reading)
+    assert reading.distance == pytest.approx(1.0, abs=1e-6)
+    assert reading.echo_time == pytest.approx(2.0 / 343, abs=1e-8)
+    assert reading.status == GOOD
+    assert reading.samples == 1
+    assert reading.uncertainty is None
+    reading = echo.read('cm', 3, record=True)
+    echo.stop()
+    assert reading.distance == pytest.approx(100.0, abs=1e-4)
+    assert reading.samples == 3
+
+
+def test_read_many():
+    # The warm up pulse takes the first distance.
+    echo = sensor([0.3, 0.5, 9.0, 1.5])
+    # Long enough for the no echo pulse to end.
+    echo.rest = 0.06
+    columns = echo.read_many(3, 'm')
+    echo.stop()
+    assert len(columns) == 3
+    assert list(columns.status) == [GOOD, OUT_OF_RANGE, GOOD]
+    assert list(columns.samples) == [1, 0, 1]
+    assert columns.distance[0] == pytest.approx(0.5, abs=1e-6)
+    assert columns.distance[1] == 0
+    assert columns[2].distance == pytest.approx(1.5, abs=1e-6)
+    assert list(columns.timestamp) == sorted(columns.timestamp)
+
+
+def test_frame_record():
+    backend = SimulatedBackend(seed=1)
+    array = EchoArray([sensor(0.5, 2, backend), sensor(1.5, 4, backend)])
+    columns = array.read_frame('m', record=True)
+    array.stop()
+    assert len(columns) == 2
+    assert list(columns.status) == [GOOD, GOOD]
+    assert columns[0].distance == pytest.approx(0.5, abs=1e-6)
+    assert columns[1].distance == pytest.approx(1.5, abs=1e-6)
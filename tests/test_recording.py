@@ -0,0 +1,46 @@
+from array import array
+
+from Bluetin_Echo import Echo, Recorder, Recording, ReplayBackend, GOOD
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+
+
+def record(path, distances):
+    backend = SimulatedBackend(seed=1)
+    backend.attach(2, SimulatedSensor(distances, seed=1))
+    echo = Echo(2, 3, capture='edge', backend=backend)
+    echo.rest = 0.02
+    echoTimes = []
+    with Recorder(path, echo):
+        for distance in distances:
+            echo.wait_until_ready()
+            echoTimes.append(echo._measure()[0])
+    echo.stop()
+    return echoTimes
+
+
+def test_record_replay_round_trip(tmp_path):
+    path = str(tmp_path / 'echo.bin')
+    # The warm up pulse takes the first distance.
+    distances = [1.0, 0.5, 1.5, 0.8, 0.3, 2.0]
+    echoTimes = record(path, distances)
+    measured = [value * 343 / 2 for value in echoTimes]
+    for distance, expected in zip(measured, distances[1:] + distances[:1]):
+        assert abs(distance - expected) < 0.001
+
+    with Recording(path) as recording:
+        assert len(recording) == len(echoTimes)
+        assert recording.channels[0][:2] == (2, 3)
+        assert [row[1] for row in recording] == \
+            list(array('f', echoTimes))
+
+    echo = Echo(2, 3, capture='edge', backend=ReplayBackend(path))
+    echo.rest = 0.02
+    replayed = []
+    for value in echoTimes:
+        echo.wait_until_ready()
+        replayed.append(echo.read('m'))
+        assert echo.error_code == GOOD
+    echo.stop()
+    for distance, expected in zip(replayed, measured):
+        assert abs(distance - expected) < 0.01
+
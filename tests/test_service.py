@@ -0,0 +1,66 @@
+from multiprocessing import shared_memory
+from time import monotonic, sleep
+
+import pytest
+
+from Bluetin_Echo import GOOD, SensorService, SharedReadings
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+
+
+def backend():
+    backend = SimulatedBackend(seed=1)
+    backend.attach(2, SimulatedSensor(0.5, seed=1))
+    backend.attach(4, SimulatedSensor(1.5, seed=2))
+    return backend
+
+
+def test_table_before_start():
+    service = SensorService([(2, 3), (4, 5)], backend)
+    try:
+        table = service.readings()
+        assert len(table) == 2
+        assert table.frames == 0
+        assert table.frame() == [None, None]
+        assert table.distances() == [0, 0]
+        with pytest.raises(IndexError):
+            table.read(2)
+        table.close()
+        assert not service.running
+    finally:
+        service.stop()
+
+
+def test_service_publishes_readings():
+    service = SensorService([(2, 3, 343, 'edge'), (4, 5, 343, 'edge')],
+                            backend)
+    name = service.name
+    service.start()
+    try:
+        table = SharedReadings(name)
+        deadline = monotonic() + 10.0
+        while table.frames < 2 and monotonic() < deadline:
+            sleep(0.05)
+        assert service.running
+        readings = table.frame()
+        assert [reading.status for reading in readings] == [GOOD, GOOD]
+        assert readings[0].distance == pytest.approx(50.0, abs=0.1)
+        assert readings[1].distance == pytest.approx(150.0, abs=0.1)
+        assert readings[1].echo_time == pytest.approx(3.0 / 343, abs=1e-6)
+        assert readings[0].samples == 1
+        table.close()
+    finally:
+        service.stop()
+    assert not service.running
+    # The table is removed with the service.
+    with pytest.raises(FileNotFoundError):
+        SharedReadings(name)
+
+
+def test_other_shared_memory_is_rejected():
+    other = shared_memory.SharedMemory(create=True, size=64)
+    try:
+        with pytest.raises(RuntimeError):
+            SharedReadings(other.name)
+    finally:
+        other.close()
+        other.unlink()
@@ -0,0 +1,41 @@
+from math import sqrt
+
+from Bluetin_Echo.stats import RunningStats, median, summarize, trimmed_mean
+
+
+def test_running_stats_match_batch():
+    values = [1.0, 2.0, 4.0, 8.0]
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    mean = sum(values) / len(values)
+    stddev = sqrt(sum((value - mean) ** 2 for value in values) / 3)
+    assert stats.count == 4
+    assert abs(stats.mean - mean) < 1e-12
+    assert abs(stats.stddev - stddev) < 1e-12
+    assert abs(stats.relative_error - stddev / 2 / mean) < 1e-12
+
+
+def test_running_stats_need_two_values():
+    stats = RunningStats()
+    stats.add(5.0)
+    assert stats.stddev == 0.0
+    assert stats.relative_error == float('inf')
+
+
+def test_median_and_trimmed_mean():
+    assert median([]) == 0.0
+    assert median([1, 2, 3]) == 2
+    assert median([1, 2, 3, 4]) == 2.5
+    assert trimmed_mean([0, 1, 2, 3, 4, 5, 6, 7, 8, 100], 0.1) == 4.5
+    # Trimming never removes every value.
+    assert trimmed_mean([1, 2], 0.5) == 1.5
+
+
+def test_summarize():
+    stats = summarize([3.0, 1.0, 2.0], samples=5)
+    assert stats.mean == 2.0
+    assert stats.median == 2.0
+    assert stats.stddev == 1.0
+    assert (stats.good, stats.samples) == (3, 5)
+    assert summarize([]).good == 0
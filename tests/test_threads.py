@@ -0,0 +1,82 @@
+from threading import Thread
+from time import monotonic
+
+import pytest
+
+from Bluetin_Echo import Echo, EchoArray
+from Bluetin_Echo import backends
+from Bluetin_Echo.backends import (SimulatedBackend, SimulatedSensor,
+                                   get_backend, set_default_backend)
+
+
+class OverlapBackend(SimulatedBackend):
+    def __init__(self):
+        SimulatedBackend.__init__(self, seed=1)
+        self.pings = 0
+        self.overlaps = 0
+
+    def output(self, pin, value):
+        if not value and self._levels.get(pin) == 1:
+            self.pings += 1
+            # A ping while the last echo pulse is still playing.
+            for echoPin in self._echoPins.get(pin, ()):
+                rise, fall = self._pulses.get(echoPin, (0.0, 0.0))
+                if fall > monotonic():
+                    self.overlaps += 1
+        SimulatedBackend.output(self, pin, value)
+
+
+def test_threads_share_a_sensor():
+    backend = OverlapBackend()
+    backend.attach(2, SimulatedSensor(1.0, seed=1))
+    echo = Echo(2, 3, capture='edge', backend=backend)
+    echo.rest = 0.01
+    results = []
+
+    def reader():
+        for count in range(5):
+            results.append(echo.read('m', 2))
+
+    threads = [Thread(target=reader) for count in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    echo.stop()
+    assert len(results) == 20
+    for distance in results:
+        assert distance == pytest.approx(1.0, abs=1e-6)
+    assert backend.overlaps == 0
+    # The warm up pulse, then two pings per read.
+    assert backend.pings == 41
+
+
+def test_context_managers_release_pins():
+    backend = SimulatedBackend(seed=1)
+    with EchoArray([Echo(2, 3, backend=backend),
+                    Echo(2, 4, backend=backend)]) as array:
+        assert backend.users(2) == 2
+        with Echo(5, 6, backend=backend) as echo:
+            assert backend.users(5) == 1
+        assert backend.users(5) == 0
+        echo.stop()
+    assert [backend.users(pin) for pin in (2, 3, 4)] == [0, 0, 0]
+    array.stop()
+
+
+def test_one_backend_per_name(monkeypatch):
+    monkeypatch.setattr(backends, '_named', {})
+    monkeypatch.setattr(backends, '_default_backend', None)
+    monkeypatch.setenv('BLUETIN_ECHO_BACKEND', 'sim')
+    backend = get_backend('sim')
+    assert get_backend('sim') is backend
+    assert get_backend(None) is backend
+    assert get_backend(backend) is backend
+    first = Echo(2, 3)
+    second = Echo(2, 4, backend='sim')
+    assert backend.users(2) == 2
+    first.stop()
+    second.stop()
+    other = SimulatedBackend()
+    assert set_default_backend(other) is other
+    assert get_backend() is other
@@ -0,0 +1,46 @@
+from Bluetin_Echo import Echo, GOOD, NOT_READY, OUT_OF_RANGE
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+
+
+def sensor(distance, **options):
+    backend = SimulatedBackend(seed=1)
+    target = backend.attach(2, SimulatedSensor(distance, seed=1))
+    echo = Echo(2, 3, backend=backend, **options)
+    return echo, target
+
+
+def read(echo):
+    echo.wait_until_ready()
+    return echo.read('m')
+
+
+def test_adaptive_timing_shrinks_and_restores():
+    echo, target = sensor(0.3, capture='edge')
+    echo.adaptive_timing()
+    for count in range(5):
+        read(echo)
+    assert echo.effective_rest < echo.rest
+    assert echo.effective_echo_timeout < echo.echo_timeout
+    # The long no echo pulse is waited out in full.
+    target.distance = 9.0
+    assert read(echo) == 0
+    assert echo.error_code == OUT_OF_RANGE
+    assert echo.effective_rest == echo.rest
+    # Backing off finds a target that moved away.
+    target.distance = 2.5
+    distances = [read(echo) for count in range(6)]
+    echo.stop()
+    assert abs(distances[-1] - 2.5) < 0.01
+    assert echo.error_code == GOOD
+
+
+def test_echo_pin_high_at_trigger_is_not_ready():
+    echo, target = sensor(0.5, capture='edge')
+    assert abs(read(echo) - 0.5) < 0.001
+    target.fault = 'stuck_high'
+    read(echo)
+    # No watchdog; the pin is still high when the next read starts.
+    assert read(echo) == 0
+    assert echo.error_code == NOT_READY
+    target.fault = None
+    echo.stop()
@@ -0,0 +1,54 @@
+import pytest
+
+from Bluetin_Echo import Echo
+from Bluetin_Echo.backends import SimulatedBackend, SimulatedSensor
+from Bluetin_Echo.units import (UNITS, echo_factor, register_unit,
+                                to_distances, unit_scale)
+
+
+def test_unit_scale():
+    assert unit_scale('m') == 1
+    assert unit_scale('mm') == 1000
+    with pytest.raises(RuntimeError):
+        unit_scale('furlong')
+
+
+def test_register_unit():
+    register_unit('ft', 3.28084)
+    try:
+        assert unit_scale('ft') == 3.28084
+        # Registering the same size again is fine, another size is not.
+        register_unit('ft', 3.28084)
+        with pytest.raises(RuntimeError):
+            register_unit('ft', 3.0)
+        with pytest.raises(RuntimeError):
+            register_unit('bad', 0)
+    finally:
+        del UNITS['ft']
+
+
+def test_echo_times_to_distances():
+    assert echo_factor(343, 'cm') == 343 * 100 / 2
+    distances = to_distances([0.01, 0.0, 0.002], 343, 'm')
+    assert list(distances) == [0.01 * 343 / 2, 0.0, 0.002 * 343 / 2]
+
+
+def test_read_in_every_unit():
+    backend = SimulatedBackend(seed=1)
+    backend.attach(2, SimulatedSensor(1.0, seed=1))
+    echo = Echo(2, 3, capture='edge', backend=backend)
+    echo.rest = 0.01
+    # Units registered after the sensor was made work too.
+    register_unit('ft', 3.28084)
+    try:
+        for unit in ('m', 'cm', 'inch', 'ft'):
+            echo.wait_until_ready()
+            assert abs(echo.read(unit) - unit_scale(unit)) < 1e-6
+        echo.wait_until_ready()
+        assert abs(echo.send() - 100) < 1e-6
+        with pytest.raises(RuntimeError):
+            echo.wait_until_ready()
+            echo.read('furlong')
+    finally:
+        del UNITS['ft']
+        echo.stop()